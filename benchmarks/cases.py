@@ -0,0 +1,212 @@
+import random
+
+import numpy
+
+from harness import benchmark
+
+import renderer
+import stub_gl
+import text
+
+# Draw paths run against a counting stub instead of a real GL context
+stub_gl.install(renderer, text)
+
+from animation_scheduler import AnimationScheduler
+from animations import FadeOut, Flash
+from collision import SpatialHash, find_contacts, swept_aabb, swept_bounds
+from color import Color
+from display.headless_dm import DisplayManager as HeadlessDM
+from entities import Ball, Pad
+from entity_store import EntityStore
+from hud import Hud
+from particles import ParticleSystem
+from scenes import SinglePlayerScene
+from scripted_keyboard import ScriptedKeyboardManager
+from vec_env import VecEnv
+
+WIDTH = 1280
+HEIGHT = 720
+
+
+def make_balls(n: int):
+    random.seed(n)
+    balls = []
+    for _ in range(n):
+        ball = Ball(random.randint(0, WIDTH), random.randint(0, HEIGHT), 20, 20, Color(255, 255, 255))
+        ball.set_speed(random.choice((-180, 180)), random.choice((-180, 180)))
+        balls.append(ball)
+    return balls
+
+
+@benchmark('scene_update', scaled=False)
+def scene_update(n: int):
+    """ SinglePlayerScene ticks through the headless display manager, ticks/s (game logic only, no particles) """
+    dm = HeadlessDM(WIDTH, HEIGHT, "bench")
+    keyboard = ScriptedKeyboardManager()
+    scene = SinglePlayerScene(keyboard)
+    # Particles are off without a window anyway, and have their own case
+    scene.particles.set_spawn_rate(0)
+    dm.set_scene(scene)
+    ticks = 1000
+
+    def run():
+        keyboard.tap('r')  # restart whenever the ball got missed, so we keep measuring live gameplay
+        dm.step(ticks)
+
+    return run, ticks
+
+
+@benchmark('hud_update', scaled=False)
+def hud_update(n: int):
+    """ Changing the HUD text and drawing it (stubbed GL), like a per-frame FPS counter """
+    hud = Hud()
+    hud.reshape(WIDTH, HEIGHT)
+    frame = [0]
+
+    def run():
+        frame[0] += 1
+        hud.update({'text': f"{60 + frame[0] % 100 / 100:.2f} FPS"})
+        hud.draw()
+
+    return run, 1
+
+
+@benchmark('animate')
+def animate(n: int):
+    """ AnimationScheduler tick with a fade-out and a flash running on every one of n entities """
+    balls = make_balls(n)
+    scheduler = AnimationScheduler(2 * n)
+    dt = 1 / 120
+
+    def restart(ball):
+        # Restart the animations once they're done so every call does the same amount of work
+        # (the flash is always over by the time the fade-out finishes)
+        ball.set_color(Color(255, 255, 255))
+        scheduler.add(ball, FadeOut(Color(255, 150, 150)), on_complete=restart)
+        scheduler.add(ball, Flash(Color(64, 128, 255)))
+
+    for ball in balls:
+        restart(ball)
+
+    def run():
+        scheduler.update(dt)
+
+    return run, n
+
+
+@benchmark('move')
+def move(n: int):
+    """ Snapshot + move of n balls for one tick """
+    balls = make_balls(n)
+    dt = 1 / 120
+
+    def run():
+        for ball in balls:
+            ball.snapshot()
+            ball.move(dt)
+
+    return run, n
+
+
+@benchmark('store_step')
+def store_step(n: int):
+    """ EntityStore tick for n balls: snapshot, move, wall bounces and pad check in vectorized passes """
+    store = EntityStore(n)
+    for ball in make_balls(n):
+        store.add(ball.x, ball.y, ball.width, ball.height, ball.color, ball.speed_x, ball.speed_y)
+    pad = Pad(5, HEIGHT / 2 - 50, 10, 100)
+    dt = 1 / 120
+
+    def run():
+        store.snapshot()
+        store.move(dt)
+        store.bounce_walls(WIDTH, HEIGHT, left=True)
+        store.collide_pad(pad)
+
+    return run, n
+
+
+@benchmark('collision')
+def collision(n: int):
+    """ The scene's swept wall and pad checks (SinglePlayerScene.move_ball()), done for n balls against one pad """
+    balls = make_balls(n)
+    pad = Pad(5, HEIGHT / 2 - 50, 10, 100)
+    dt = 1 / 120
+
+    def run():
+        hits = 0
+        for ball in balls:
+            dx, dy = ball.speed_x * dt, ball.speed_y * dt
+            if swept_bounds(ball.x, ball.y, ball.width, ball.height, dx, dy, WIDTH, HEIGHT, left=False) is not None:
+                hits += 1
+            if swept_aabb(ball.x, ball.y, ball.width, ball.height, dx, dy, pad.x, pad.y, pad.width,
+                          pad.height) is not None:
+                hits += 1
+        return hits
+
+    return run, n
+
+
+@benchmark('spatial_hash')
+def spatial_hash(n: int):
+    """ Broad phase rebuild + candidate pairs + narrow phase contacts for n balls at constant density """
+    # The arena grows with n, otherwise the number of actual contacts (not the hashing) dominates
+    random.seed(n)
+    side = 60 * n ** 0.5
+    store = EntityStore(n)
+    for _ in range(n):
+        store.add(random.uniform(0, side), random.uniform(0, side), 20, 20, Color(255, 255, 255))
+    grid = SpatialHash(40)
+    x, y, width, height = store.x[:n], store.y[:n], store.width[:n], store.height[:n]
+
+    def run():
+        grid.rebuild(x, y, width, height)
+        return find_contacts(x, y, width, height, grid.candidate_pairs())
+
+    return run, n
+
+
+@benchmark('draw_submit')
+def draw_submit(n: int):
+    """ Queue n rectangles into a QuadBatch and flush it through the stubbed GL layer """
+    balls = make_balls(n)
+    batch = renderer.QuadBatch()
+
+    def run():
+        batch.begin()
+        for ball in balls:
+            ball.draw(batch, 0.5)
+        batch.flush(WIDTH, HEIGHT)
+
+    return run, n
+
+
+@benchmark('particles')
+def particles(n: int):
+    """ ParticleSystem tick and draw of n live particles, flushed through the stubbed GL layer """
+    system = ParticleSystem(capacity=n, spawn_rate=n * 10, seed=n)
+    # Long-lived, so every call does the same amount of work
+    system.emit(WIDTH / 2, HEIGHT / 2, n, 200, 3600, Color(255, 200, 64), accel_y=-300)
+    batch = renderer.QuadBatch()
+    dt = 1 / 120
+
+    def run():
+        system.update(dt)
+        batch.begin()
+        system.draw(batch, 0.5)
+        batch.flush(WIDTH, HEIGHT)
+
+    return run, n
+
+
+@benchmark('vec_env')
+def vec_env(n: int):
+    """ One VecEnv step of n games with random actions, game steps/s """
+    env = VecEnv(n, seed=n)
+    env.reset()
+    actions = numpy.random.default_rng(n).integers(0, 3, n)
+
+    def run():
+        env.step(actions)
+
+    return run, n
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+""" Measure cold start: from launching poing.py to the first frame on screen, checked against a time budget
+
+Every run is a fresh process started with --exit-after-first-frame, so the measured time covers the interpreter
+start, imports, virtualenv activation, window and GL setup, scene construction and drawing the first frame.
+The display managers quit right after the first buffer swap, so little else gets counted.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+POING = os.path.join(APP_DIR, "poing.py")
+
+# Median seconds to the first frame we don't want to get over (headless draws nothing, it stops after one tick)
+BUDGETS = {
+    'headless': 0.6,
+    'glfw': 1.0,
+    'glut': 1.0,
+}
+
+# How many of the slowest imports to show with --imports
+IMPORT_REPORT_SIZE = 15
+
+
+def measure(display: str, extra_args: list) -> float:
+    command = [sys.executable, POING, '--display', display, '--exit-after-first-frame', '--log-level', 'warning']
+    start = time.perf_counter()
+    subprocess.run(command + extra_args, check=True, cwd=APP_DIR)
+    return time.perf_counter() - start
+
+
+def slowest_imports(display: str, extra_args: list) -> list:
+    """ (cumulative microseconds, module) of the slowest imports of one run, from python -X importtime """
+    command = [sys.executable, '-X', 'importtime', POING, '--display', display, '--exit-after-first-frame',
+               '--log-level', 'warning']
+    output = subprocess.run(command + extra_args, check=True, cwd=APP_DIR, capture_output=True, text=True).stderr
+
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line[len("import time:"):].split("|")
+        imports.append((int(cumulative), module.rstrip()))
+    return sorted(imports, reverse=True)[:IMPORT_REPORT_SIZE]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Poing cold start benchmark")
+    parser.add_argument('--display',
+                        type=str,
+                        choices=list(BUDGETS),
+                        default='headless',
+                        help="Display manager to start")
+    parser.add_argument('--runs',
+                        type=int,
+                        default=5,
+                        help="Number of process starts to measure")
+    parser.add_argument('--budget',
+                        type=float,
+                        default=None,
+                        help="Median seconds to the first frame allowed (default depends on the display manager)")
+    parser.add_argument('--imports',
+                        action='store_true',
+                        help="Also show the slowest imports")
+    args, poing_args = parser.parse_known_args()
+
+    budget = args.budget if args.budget is not None else BUDGETS[args.display]
+
+    # The first start warms up the OS file cache (and writes the virtualenv cache), it's not counted
+    measure(args.display, poing_args)
+    times = [measure(args.display, poing_args) for _ in range(args.runs)]
+    median = statistics.median(times)
+
+    print(f"{args.display:<10} first frame after {median * 1000:8.1f} ms median "
+          f"({min(times) * 1000:.1f} - {max(times) * 1000:.1f} ms, {args.runs} runs), budget {budget * 1000:.0f} ms")
+
+    if args.imports:
+        for cumulative, module in slowest_imports(args.display, poing_args):
+            print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+    if median > budget:
+        print("Over budget!")
+        sys.exit(1)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+""" Per-instance memory of the entity classes, measured with tracemalloc over many instances """
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import harness  # noqa: F401 (puts the game modules on the path)
+
+from color import Color
+from entities import Ball, Pad
+from entity_store import EntityStore
+
+COUNT = 100000
+
+
+def bytes_per_instance(create, count: int = COUNT) -> float:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    instances = [create(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # The list holding them costs one pointer per instance, that's not the instance's
+    return (after - before) / len(instances) - 8
+
+
+def cases():
+    white = Color(255, 255, 255)
+    store = EntityStore(1)
+    store.add(0, 0, 20, 20, white)
+
+    # Float coordinates, as they are after the first move()
+    return {
+        'Ball': lambda i: Ball(i + 0.5, i + 0.5, 20, 20, white),
+        'Pad': lambda i: Pad(5, i + 0.5, 10, 100, white),
+        'EntityHandle': lambda i: store.handle(0),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Entity memory per instance")
+    parser.add_argument('--count',
+                        type=int,
+                        default=COUNT,
+                        help="Instances to create per class")
+    args = parser.parse_args()
+
+    for name, create in cases().items():
+        print(f"{name:<16} {bytes_per_instance(create, args.count):8.1f} bytes/instance")
@@ -0,0 +1,134 @@
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+# Benchmarks import the game modules the same way poing.py does
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(os.path.join(APP_DIR, "game"))
+
+DEFAULT_COUNTS = [1, 10, 100, 1000, 10000, 100000]
+
+_benchmarks = dict()
+
+
+def benchmark(name: str, scaled: bool = True):
+    """ Register a benchmark case
+
+    The decorated function gets the entity count and does its setup, then returns a zero argument callable to be
+    timed plus how many operations (ticks, entities, strings...) one call of it performs. Cases with scaled=False
+    don't depend on the entity count and are only run once, with n=1.
+    """
+
+    def register(func):
+        _benchmarks[name] = (func, scaled)
+        return func
+
+    return register
+
+
+def get_benchmarks():
+    return dict(_benchmarks)
+
+
+def measure(run, min_time: float = 0.2, repeat: int = 5):
+    """ Time run() in batches lasting at least min_time, returns the best and median seconds per call """
+    # Find how many calls make up a batch, so timer resolution doesn't matter
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time / repeat or calls >= 1 << 20:
+            break
+        calls *= 2
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        timings.append((time.perf_counter() - start) / calls)
+
+    timings.sort()
+    return timings[0], timings[len(timings) // 2]
+
+
+def run_benchmarks(names=None, counts=None, min_time: float = 0.2, repeat: int = 5, max_seconds_per_call=2.0):
+    """ Run the selected benchmarks across the given entity counts, returns the result dict that gets saved """
+    counts = counts or DEFAULT_COUNTS
+    results = dict()
+
+    for name, (func, scaled) in _benchmarks.items():
+        if names and name not in names:
+            continue
+
+        results[name] = dict()
+        for n in (counts if scaled else [1]):
+            run, ops = func(n)
+
+            # Skip absurdly slow combinations (e.g. 100k Python objects in a slow path) instead of hanging
+            start = time.perf_counter()
+            run()
+            if time.perf_counter() - start > max_seconds_per_call:
+                print(f"{name:<28} n={n:<7} skipped, a single call takes over {max_seconds_per_call}s")
+                continue
+
+            best, median = measure(run, min_time, repeat)
+            results[name][str(n)] = {
+                'seconds_per_call': median,
+                'best_seconds_per_call': best,
+                'ops_per_second': ops / median if median > 0 else 0,
+            }
+            print(f"{name:<28} n={n:<7} {median * 1e6:12.2f} us/call {ops / median:14.0f} ops/s")
+
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR, capture_output=True,
+                                text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def save(results: dict, filename: str):
+    with open(filename, 'w') as f:
+        json.dump({'metadata': metadata(), 'results': results}, f, indent=2)
+    print(f"Results saved to {filename}")
+
+
+def compare(results: dict, baseline_filename: str, threshold: float = 0.10):
+    """ Print the change against a previous run, returns the list of regressions over the threshold """
+    with open(baseline_filename) as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    for name, by_count in results.items():
+        for n, result in by_count.items():
+            previous = baseline.get(name, {}).get(n)
+            if not previous:
+                continue
+
+            change = result['seconds_per_call'] / previous['seconds_per_call'] - 1
+            marker = ""
+            if change > threshold:
+                marker = "  <-- REGRESSION"
+                regressions.append((name, n, change))
+            print(f"{name:<28} n={n:<7} {change * 100:+8.1f}%{marker}")
+
+    return regressions
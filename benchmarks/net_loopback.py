@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+""" A network game over loopback: a server and two bot clients in one process, with simulated latency and loss
+
+Reports what the snapshots cost (bytes on the wire against full state, encoding and decoding time) and how well
+the clients' prediction held up (how often and how far their own pad had to be corrected).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import harness  # noqa: F401 (puts the game modules on the path)
+
+from clock import FixedStepClock
+from netplay import LossyChannel, NetClient, NetKeyboard, NetServer, open_socket, pack_state, encode_delta, \
+    decode_delta, PACKET, SNAPSHOT_BODY, STATE
+from scenes import NetClientScene, PadAI, VersusScene
+from scripted_keyboard import ScriptedKeyboardManager
+
+WIDTH = 1280
+HEIGHT = 720
+
+
+class Bot:
+    """ Plays a client with a PadAI, through the keys a human would press """
+
+    def __init__(self, scene: NetClientScene, keyboard: ScriptedKeyboardManager, seed: int):
+        self.scene = scene
+        self.keyboard = keyboard
+        self.random = random.Random(seed)
+        self.ai = None
+
+    def update(self, dt: float):
+        scene = self.scene
+        if scene.ball is None:
+            return
+        if self.ai is None:
+            self.ai = PadAI(scene.own_pad, self.random)
+        pad_move = self.ai.update(dt, scene.ball, WIDTH, HEIGHT)
+        for key, move in (('q', -1), ('a', 1)):
+            if pad_move == move:
+                self.keyboard.press(key)
+            else:
+                self.keyboard.release(key)
+
+
+def codec_cost(scene: VersusScene, repeat: int = 10000) -> tuple:
+    """ Microseconds to encode and to decode one snapshot delta """
+    baseline = pack_state(scene)
+    scene.ball.move(1 / 120)
+    state = pack_state(scene)
+    mask, changed = encode_delta(state, baseline)
+    encode = timeit.timeit(lambda: encode_delta(pack_state(scene), baseline), number=repeat)
+    decode = timeit.timeit(lambda: decode_delta(mask, changed, baseline), number=repeat)
+    return encode / repeat * 1e6, decode / repeat * 1e6
+
+
+def run(duration: float, latency: float, jitter: float, loss: float, seed: int):
+    keyboard = NetKeyboard((VersusScene.LEFT_KEYS, VersusScene.RIGHT_KEYS))
+    scene = VersusScene(keyboard, seed=seed, left=VersusScene.HUMAN, right=VersusScene.HUMAN)
+    server = NetServer(scene, keyboard, LossyChannel(open_socket('127.0.0.1'), latency, jitter, loss, seed), WIDTH,
+                       HEIGHT)
+
+    clients = []
+    for index in range(2):
+        client_keyboard = ScriptedKeyboardManager()
+        client = NetClient(LossyChannel(open_socket('127.0.0.1'), latency, jitter, loss, seed + 1 + index),
+                           server.channel.sock.getsockname())
+        client_scene = NetClientScene(client_keyboard, client)
+        client_scene.set_display_dimensions(WIDTH, HEIGHT)
+        clients.append((client_scene, Bot(client_scene, client_keyboard, seed + 1 + index)))
+
+    clock = FixedStepClock()
+    start = last = time.perf_counter()
+    while last - start < duration:
+        now = time.perf_counter()
+        for _ in range(clock.advance(now - last)):
+            for client_scene, bot in clients:
+                bot.update(clock.tick_time)
+                client_scene.update(clock.tick_time)
+            server.poll()
+            server.step()
+        server.channel.pump()
+        last = now
+        time.sleep(clock.tick_time / 4)
+
+    full_size = PACKET.size + SNAPSHOT_BODY.size + STATE.size
+    average = server.snapshot_bytes / server.snapshots_sent if server.snapshots_sent else 0
+    print(f"latency {latency * 1000:.0f} ms (+{jitter * 1000:.0f}), loss {loss * 100:.0f}% each way, "
+          f"{duration:.0f} s, {server.tick} server ticks")
+    print(f"snapshots: {server.snapshots_sent} sent, {average:.1f} bytes on average, {full_size} without deltas "
+          f"({server.snapshot_bytes / duration / 1024:.1f} KiB/s to both clients)")
+    print("encode %.2f us, decode %.2f us per snapshot" % codec_cost(scene))
+    for client_scene, _ in clients:
+        client = client_scene.client
+        print(f"{client}: {client.snapshots_received} snapshots received, {client.snapshots_dropped} dropped, "
+              f"rtt {client.rtt * 1000:.0f} ms, {client_scene.corrections} pad corrections "
+              f"(max {client_scene.max_correction:.1f} px)")
+    print(f"score {scene.scores[0]} : {scene.scores[1]}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Network game over loopback")
+    parser.add_argument('--duration',
+                        type=float,
+                        default=5,
+                        help="Seconds to play")
+    parser.add_argument('--latency',
+                        type=float,
+                        default=50,
+                        help="Simulated one way latency in milliseconds")
+    parser.add_argument('--jitter',
+                        type=float,
+                        default=10,
+                        help="Simulated random extra latency, up to this many milliseconds")
+    parser.add_argument('--loss',
+                        type=float,
+                        default=0.05,
+                        help="Simulated packet loss, 0..1")
+    parser.add_argument('--seed',
+                        type=int,
+                        default=1,
+                        help="Game and network simulation seed")
+    args = parser.parse_args()
+
+    run(args.duration, args.latency / 1000, args.jitter / 1000, args.loss, args.seed)
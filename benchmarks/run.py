@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+""" Run the performance benchmarks, save the results as JSON and optionally compare them to a previous run """
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import harness
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Poing performance benchmarks")
+    parser.add_argument('names',
+                        nargs='*',
+                        help="Benchmarks to run (default: all)")
+    parser.add_argument('--counts',
+                        type=str,
+                        default=",".join(str(n) for n in harness.DEFAULT_COUNTS),
+                        help="Comma separated entity counts")
+    parser.add_argument('--quick',
+                        action='store_true',
+                        help="Only run entity counts up to 1000 with shorter timings")
+    parser.add_argument('--output',
+                        type=str,
+                        default='bench_results.json',
+                        help="Where to save the results")
+    parser.add_argument('--compare',
+                        type=str,
+                        default=None,
+                        help="Previous results file to compare against")
+    parser.add_argument('--threshold',
+                        type=float,
+                        default=0.10,
+                        help="Relative slowdown that counts as a regression")
+    parser.add_argument('--list',
+                        action='store_true',
+                        help="List the available benchmarks and exit")
+
+    args = parser.parse_args()
+
+    import cases  # noqa: F401 (registers the benchmarks)
+
+    if args.list:
+        for name, (func, scaled) in harness.get_benchmarks().items():
+            print(f"{name:<28} {func.__doc__.strip()}")
+        sys.exit(0)
+
+    counts = [int(n) for n in args.counts.split(',')]
+    min_time = 0.2
+    if args.quick:
+        counts = [n for n in counts if n <= 1000]
+        min_time = 0.05
+
+    results = harness.run_benchmarks(args.names, counts, min_time=min_time)
+    harness.save(results, args.output)
+
+    if args.compare:
+        regressions = harness.compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold * 100:.0f}%")
+            sys.exit(1)
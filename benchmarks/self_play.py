@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+""" Self-play parameter sweep: thousands of windowless games over a grid of balance constants, on every core
+
+    ./benchmarks/self_play.py --games 1000 --set BALL_SPEED_X=120,180,240 --set PAD_YSIZE=60,100
+
+Prints the rally length distribution (pad hits before the miss) and mean time to miss per parameter set, then
+the simulation throughput of each worker process and in total.
+"""
+
+import argparse
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import harness  # noqa: F401 (puts the game modules on the path)
+
+import log
+from selfplay import CONTROLLER_PARAMETERS, CONTROLLERS, MAX_TICKS, PARAMETERS, grid, run_sweep, summarize
+
+
+def parse_set(text: str) -> tuple:
+    name, _, values = text.partition('=')
+    if name not in PARAMETERS and name not in CONTROLLER_PARAMETERS:
+        raise argparse.ArgumentTypeError(f"unknown parameter {name}, "
+                                         f"one of {', '.join(list(PARAMETERS) + list(CONTROLLER_PARAMETERS))}")
+    return name, [float(value) if '.' in value else int(value) for value in values.split(',')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Poing self-play parameter sweep")
+    parser.add_argument('--set',
+                        type=parse_set,
+                        action='append',
+                        default=[],
+                        metavar='NAME=V1,V2,...',
+                        help="Values of one parameter to sweep, can be given many times")
+    parser.add_argument('--games',
+                        type=int,
+                        default=200,
+                        help="Games per parameter set")
+    parser.add_argument('--controller',
+                        type=str,
+                        choices=list(CONTROLLERS),
+                        default='ai',
+                        help="What plays the pad")
+    parser.add_argument('--workers',
+                        type=int,
+                        default=None,
+                        help="Worker processes (default: one per core)")
+    parser.add_argument('--max-ticks',
+                        type=int,
+                        default=MAX_TICKS,
+                        help="Stop a game nobody missed after this many ticks")
+    parser.add_argument('--seed',
+                        type=int,
+                        default=0,
+                        help="First game seed")
+    parser.add_argument('--csv',
+                        type=str,
+                        default=None,
+                        help="Also write every game to this file")
+    args = parser.parse_args()
+
+    log.setup("WARNING")
+
+    param_sets = grid(dict(args.set))
+    results, worker_stats, elapsed = run_sweep(param_sets, args.games, args.controller, args.workers, args.seed,
+                                               args.max_ticks)
+
+    names = [name for (name, _) in args.set]
+    header = " ".join(f"{name:>15}" for name in names)
+    print(f"{header} {'games':>6} {'hits':>7} {'p10':>5} {'p50':>5} {'p90':>5} {'max':>5} {'missed':>7} "
+          f"{'to miss':>8}")
+    for params, games in zip(param_sets, results):
+        stats = summarize(games)
+        values = " ".join(f"{params[name]:>15}" for name in names)
+        to_miss = f"{stats['time_to_miss']:>7.1f}s" if stats['miss_rate'] else f"{'-':>8}"
+        print(f"{values} {stats['games']:>6} {stats['hits_mean']:>7.1f} {stats['hits_p10']:>5.0f} "
+              f"{stats['hits_p50']:>5.0f} {stats['hits_p90']:>5.0f} {stats['hits_max']:>5} "
+              f"{stats['miss_rate'] * 100:>6.1f}% {to_miss}")
+
+    print()
+    total_ticks = 0
+    for worker, (ticks, cpu_time) in sorted(worker_stats.items()):
+        total_ticks += ticks
+        print(f"worker {worker:>7}: {ticks:>10} ticks, {ticks / cpu_time if cpu_time else 0:>10.0f} ticks/s")
+    print(f"total: {total_ticks} ticks in {elapsed:.2f}s, {total_ticks / elapsed:.0f} ticks/s "
+          f"on {len(worker_stats)} workers")
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(names + ['hits', 'seconds', 'missed'])
+            for params, games in zip(param_sets, results):
+                for hits, seconds, missed in games:
+                    writer.writerow([params[name] for name in names] + [hits, f"{seconds:.4f}", int(missed)])
@@ -0,0 +1,28 @@
+class StubGL:
+    """ Stands in for OpenGL.GL (and OpenGL.GL.shaders): every gl* call is accepted and counted, nothing is drawn
+
+    Lets the draw submission path (batching, vertex building, call counts) be measured without a context.
+    """
+
+    def __init__(self):
+        self.calls = 0
+
+    def __getattr__(self, name: str):
+        if name.startswith('GL_'):
+            return 0
+
+        def call(*args, **kwargs):
+            self.calls += 1
+            return 1
+
+        return call
+
+
+def install(*modules):
+    """ Replace the gl/shaders references of the given modules with one StubGL, returns it """
+    stub = StubGL()
+    for module in modules:
+        for attr in ('gl', 'shaders'):
+            if hasattr(module, attr):
+                setattr(module, attr, stub)
+    return stub
@@ -0,0 +1,230 @@
+import math
+
+import numpy
+
+from color import Color, Gradient
+from interfaces import IAnimation
+
+
+# Easing functions work on whole arrays of 0..1 progress values
+
+def linear(t: numpy.ndarray) -> numpy.ndarray:
+    return t
+
+
+def ease_in(t: numpy.ndarray) -> numpy.ndarray:
+    return t * t
+
+
+def ease_out(t: numpy.ndarray) -> numpy.ndarray:
+    return t * (2 - t)
+
+
+def ease_in_out(t: numpy.ndarray) -> numpy.ndarray:
+    return numpy.where(t < 0.5, 2 * t * t, -1 + (4 - 2 * t) * t)
+
+
+EASINGS = [linear, ease_in, ease_out, ease_in_out]
+
+
+class AnimationScheduler:
+    """ Runs all animations of a scene from one place
+
+    Tweens live in preallocated arrays (a pool that only grows): every tick all of them are advanced with a few
+    vectorized operations, then the results are written to their targets. Finished tweens are swap-removed in
+    O(1) and their completion callbacks called. Three kinds are supported:
+
+    - color: step the target's color along a precomputed Gradient over a duration, with easing
+    - velocity: set the target's speed from a start velocity plus constant acceleration, until a duration passes
+      or the target goes below a given y
+    - custom: any IAnimation object, updated through Python as before
+    """
+
+    INITIAL_CAPACITY = 32
+
+    COLOR = 0
+    VELOCITY = 1
+    CUSTOM = 2
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.count = 0
+        self.capacity = 0
+
+        self.kinds = numpy.zeros(0, dtype=numpy.int8)
+        self.easings = numpy.zeros(0, dtype=numpy.int8)
+        self.elapsed = numpy.zeros(0, dtype=numpy.float64)
+        self.durations = numpy.zeros(0, dtype=numpy.float64)
+        self.limits_y = numpy.zeros(0, dtype=numpy.float64)
+        self.starts = numpy.zeros((0, 3), dtype=numpy.float64)
+        self.ends = numpy.zeros((0, 3), dtype=numpy.float64)
+
+        # Scratch buffers, so update() doesn't allocate arrays either
+        self.progress = numpy.zeros(0, dtype=numpy.float64)
+        self.values = numpy.zeros((0, 3), dtype=numpy.float64)
+        self.scaled = numpy.zeros(0, dtype=numpy.float64)
+        self.steps = numpy.zeros(0, dtype=numpy.intp)
+
+        self.targets = []
+        self.callbacks = []
+        self.customs = []
+        self.gradients = []
+
+        self.resize(capacity)
+
+    def resize(self, capacity: int):
+        for name in ('kinds', 'easings', 'elapsed', 'durations', 'limits_y', 'starts', 'ends', 'progress', 'values',
+                     'scaled', 'steps'):
+            old = getattr(self, name)
+            new = numpy.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def allocate(self, kind: int, target, duration: float, on_complete, custom: IAnimation = None) -> int:
+        if self.count == self.capacity:
+            self.resize(self.capacity * 2)
+
+        index = self.count
+        self.count += 1
+
+        self.kinds[index] = kind
+        self.easings[index] = 0
+        self.elapsed[index] = 0
+        self.durations[index] = duration
+        self.limits_y[index] = math.inf
+
+        self.targets.append(target)
+        self.callbacks.append(on_complete)
+        self.customs.append(custom)
+        self.gradients.append(None)
+
+        return index
+
+    def tween_color(self, target, from_color: Color, to_color: Color, duration: float, easing=linear,
+                    on_complete=None):
+        """ Animate target's color (set_color()) from one color to another """
+        index = self.allocate(AnimationScheduler.COLOR, target, max(duration, 1e-9), on_complete)
+        self.easings[index] = EASINGS.index(easing)
+        self.starts[index] = self.ends[index] = 0
+        self.gradients[index] = Gradient.get(from_color, to_color)
+        target.set_color(from_color)
+
+    def tween_velocity(self, target, speed_x: float, speed_y: float, accel_x: float = 0, accel_y: float = 0,
+                       duration: float = math.inf, until_y: float = math.inf, on_complete=None):
+        """ Drive target's speed (set_speed()) along speed + accel * t """
+        index = self.allocate(AnimationScheduler.VELOCITY, target, duration, on_complete)
+        # Stored as the speed one second later, the speed is then start + (end - start) * elapsed
+        self.starts[index] = (speed_x, speed_y, 0)
+        self.ends[index] = (speed_x + accel_x, speed_y + accel_y, 0)
+        self.limits_y[index] = until_y
+        target.set_speed(speed_x, speed_y)
+
+    def add(self, target, animation, on_complete=None):
+        """ Start an animation on target: a tween description from the animations module or any IAnimation """
+        if isinstance(animation, IAnimation):
+            animation.set_target(target)
+            self.allocate(AnimationScheduler.CUSTOM, target, math.inf, on_complete, animation)
+        else:
+            animation.start(self, target, on_complete)
+
+    def remove(self, index: int):
+        """ Swap-remove: the last tween takes the freed slot """
+        last = self.count - 1
+        if index != last:
+            for array in (self.kinds, self.easings, self.elapsed, self.durations, self.limits_y, self.starts,
+                          self.ends):
+                array[index] = array[last]
+            self.targets[index] = self.targets[last]
+            self.callbacks[index] = self.callbacks[last]
+            self.customs[index] = self.customs[last]
+            self.gradients[index] = self.gradients[last]
+
+        self.targets.pop()
+        self.callbacks.pop()
+        self.customs.pop()
+        self.gradients.pop()
+        self.count = last
+
+    def cancel(self, target):
+        """ Stop every animation running on target, without calling their callbacks """
+        for index in range(self.count - 1, -1, -1):
+            if self.targets[index] is target:
+                self.remove(index)
+
+    def clear(self):
+        while self.count:
+            self.remove(self.count - 1)
+
+    def is_animating(self, target) -> bool:
+        return any(t is target for t in self.targets)
+
+    def update(self, dt: float):
+        n = self.count
+        if not n:
+            return
+
+        elapsed = self.elapsed[:n]
+        elapsed += dt
+
+        progress = self.progress[:n]
+        numpy.divide(elapsed, self.durations[:n], out=progress)
+        numpy.clip(progress, 0, 1, out=progress)
+
+        easings = self.easings[:n]
+        for easing_id in range(1, len(EASINGS)):
+            selected = easings == easing_id
+            if selected.any():
+                progress[selected] = EASINGS[easing_id](progress[selected])
+
+        # Colors: position in their gradient table for the eased progress
+        scaled, steps = self.scaled[:n], self.steps[:n]
+        numpy.multiply(progress, Gradient.STEPS - 1, out=scaled)
+        scaled += 0.5
+        numpy.copyto(steps, scaled, casting='unsafe')
+
+        # Velocities: start + accel * elapsed
+        values = self.values[:n]
+        starts, ends = self.starts[:n], self.ends[:n]
+        numpy.subtract(ends, starts, out=values)
+        values *= elapsed[:, numpy.newaxis]
+        values += starts
+
+        finished = []
+        kinds = self.kinds[:n].tolist()
+        rows = values.tolist()
+        color_steps = steps.tolist()
+        for index in range(n):
+            kind = kinds[index]
+            target = self.targets[index]
+            if kind == AnimationScheduler.COLOR:
+                target.set_color(self.gradients[index].colors[color_steps[index]])
+                done = progress[index] >= 1
+            elif kind == AnimationScheduler.VELOCITY:
+                speed_x, speed_y, _ = rows[index]
+                target.set_speed(speed_x, speed_y)
+                done = elapsed[index] >= self.durations[index] or target.y >= self.limits_y[index]
+            else:
+                animation = self.customs[index]
+                animation.update(dt)
+                done = animation.is_finished()
+
+            if done:
+                finished.append(index)
+
+        # Remove everything first (highest index first, so swaps don't move anything we still need to remove),
+        # then call back: callbacks are free to start or cancel animations
+        callbacks = []
+        for index in reversed(finished):
+            if self.callbacks[index] is not None:
+                callbacks.append((self.callbacks[index], self.targets[index]))
+            self.remove(index)
+
+        for callback, target in callbacks:
+            callback(target)
+
+    def __repr__(self):
+        return f"<AnimationScheduler active={self.count} capacity={self.capacity}>"
@@ -0,0 +1,43 @@
+class FixedStepClock:
+    """ Fixed rate simulation clock driven by an accumulator, decoupled from the render rate
+
+    The display manager feeds the measured frame time into advance() and runs the returned number
+    of simulation ticks, each exactly tick_time long. Whatever is left in the accumulator is exposed
+    as alpha, the fraction of a tick the renderer should interpolate entity positions by.
+    """
+
+    TICK_RATE = 120
+
+    # Never simulate more than this much time in one frame (e.g. after a breakpoint or a window drag),
+    # otherwise a slow frame would schedule even more ticks for the next one ("spiral of death")
+    MAX_FRAME_TIME = 0.25
+
+    def __init__(self, tick_rate: int = TICK_RATE):
+        self.tick_rate = tick_rate
+        self.tick_time = 1 / tick_rate
+        self.accumulator = 0.0
+        self.ticks = 0
+
+    def advance(self, frame_time: float) -> int:
+        """ Add frame_time seconds to the accumulator, return the number of whole ticks to simulate """
+        self.accumulator += min(frame_time, FixedStepClock.MAX_FRAME_TIME)
+
+        steps = int(self.accumulator * self.tick_rate)
+        self.accumulator -= steps * self.tick_time
+        if self.accumulator < 0:
+            self.accumulator = 0.0
+
+        self.ticks += steps
+        return steps
+
+    @property
+    def alpha(self) -> float:
+        """ How far (0..1) we are between the last simulated tick and the next one """
+        return min(self.accumulator * self.tick_rate, 1.0)
+
+    def reset(self):
+        self.accumulator = 0.0
+        self.ticks = 0
+
+    def __repr__(self):
+        return f"<FixedStepClock rate={self.tick_rate}Hz ticks={self.ticks}>"
@@ -0,0 +1,235 @@
+import math
+
+import numpy
+
+
+class Contacts:
+    """ Result of a narrow phase pass: overlapping pairs (a, b) and for every pair the contact normal
+    (unit vector along x or y, pointing from b towards a, i.e. the way a has to be pushed out) and depth
+    """
+
+    def __init__(self, pairs: numpy.ndarray, normals: numpy.ndarray, depths: numpy.ndarray):
+        self.pairs = pairs
+        self.normals = normals
+        self.depths = depths
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def __iter__(self):
+        for (a, b), (nx, ny), depth in zip(self.pairs, self.normals, self.depths):
+            yield int(a), int(b), (int(nx), int(ny)), float(depth)
+
+    def __repr__(self):
+        return f"<Contacts count={len(self)}>"
+
+
+class SpatialHash:
+    """ Uniform grid broad phase for axis aligned rectangles
+
+    rebuild() hashes every rectangle into all the cells it covers (vectorized, rebuilt from scratch every tick,
+    which costs about the same as an incremental update for things that all move anyway). Only rectangles
+    sharing a cell become candidate pairs, so the cost stays roughly linear in the entity count as long as the
+    cell size is in the order of the typical entity size.
+    """
+
+    CELL_SIZE = 64
+
+    # Cell coordinates are packed into one int64 key, offset so negative coordinates work too
+    KEY_OFFSET = 1 << 20
+    KEY_STRIDE = 1 << 21
+
+    def __init__(self, cell_size: float = CELL_SIZE):
+        self.cell_size = cell_size
+        self.count = 0
+        self.keys = numpy.zeros(0, dtype=numpy.int64)
+        self.ids = numpy.zeros(0, dtype=numpy.int64)
+
+    def cell_ranges(self, x, y, width, height):
+        cs = self.cell_size
+        return (numpy.floor_divide(x, cs).astype(numpy.int64), numpy.floor_divide(y, cs).astype(numpy.int64),
+                numpy.floor_divide(x + width, cs).astype(numpy.int64),
+                numpy.floor_divide(y + height, cs).astype(numpy.int64))
+
+    def cell_keys(self, cx, cy):
+        return (cx + SpatialHash.KEY_OFFSET) * SpatialHash.KEY_STRIDE + (cy + SpatialHash.KEY_OFFSET)
+
+    def rebuild(self, x: numpy.ndarray, y: numpy.ndarray, width: numpy.ndarray, height: numpy.ndarray,
+                mask: numpy.ndarray = None):
+        """ Hash all rectangles (or the ones selected by mask), entity ids are the array indices """
+        ids = numpy.arange(len(x)) if mask is None else numpy.flatnonzero(mask)
+        self.count = len(x)
+
+        cx0, cy0, cx1, cy1 = self.cell_ranges(x[ids], y[ids], width[ids], height[ids])
+        span_x = cx1 - cx0 + 1
+        cells = span_x * (cy1 - cy0 + 1)
+
+        # One entry per (entity, covered cell)
+        entry_ids = numpy.repeat(ids, cells)
+        local = numpy.arange(len(entry_ids)) - numpy.repeat(numpy.cumsum(cells) - cells, cells)
+        span_x = numpy.repeat(span_x, cells)
+        entry_cx = numpy.repeat(cx0, cells) + local % span_x
+        entry_cy = numpy.repeat(cy0, cells) + local // span_x
+
+        keys = self.cell_keys(entry_cx, entry_cy)
+        order = numpy.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = entry_ids[order]
+
+    def candidate_pairs(self) -> numpy.ndarray:
+        """ Unique (a, b) index pairs with a < b of rectangles sharing at least one cell, shape (N, 2) """
+        keys, ids = self.keys, self.ids
+        firsts = []
+        seconds = []
+
+        # Entries are sorted by cell, so entry i and i + k are in the same cell while their keys match.
+        # k only goes up to the busiest cell's occupancy, every step is one vectorized comparison.
+        k = 1
+        while k < len(keys):
+            same = keys[k:] == keys[:-k]
+            if not same.any():
+                break
+            firsts.append(ids[:-k][same])
+            seconds.append(ids[k:][same])
+            k += 1
+
+        if not firsts:
+            return numpy.zeros((0, 2), dtype=numpy.int64)
+
+        a = numpy.concatenate(firsts)
+        b = numpy.concatenate(seconds)
+        low, high = numpy.minimum(a, b), numpy.maximum(a, b)
+
+        # Rectangles covering several cells together show up once per shared cell. Sort + compare neighbours,
+        # which is a lot faster than numpy.unique() for arrays this size
+        stride = max(self.count, 1)
+        encoded = numpy.sort(low * stride + high)
+        encoded = encoded[numpy.concatenate(([True], encoded[1:] != encoded[:-1]))]
+        return numpy.stack((encoded // stride, encoded % stride), axis=1)
+
+    def query(self, x: float, y: float, width: float, height: float) -> numpy.ndarray:
+        """ Ids of the rectangles sharing a cell with the given one """
+        cx0, cy0, cx1, cy1 = self.cell_ranges(numpy.array([x]), numpy.array([y]), numpy.array([width]),
+                                              numpy.array([height]))
+        found = []
+        for cx in range(int(cx0[0]), int(cx1[0]) + 1):
+            for cy in range(int(cy0[0]), int(cy1[0]) + 1):
+                key = self.cell_keys(cx, cy)
+                start, end = numpy.searchsorted(self.keys, [key, key + 1])
+                found.append(self.ids[start:end])
+
+        return numpy.unique(numpy.concatenate(found)) if found else numpy.zeros(0, dtype=numpy.int64)
+
+    def __repr__(self):
+        return f"<SpatialHash cell_size={self.cell_size} entries={len(self.keys)}>"
+
+
+def find_contacts(x: numpy.ndarray, y: numpy.ndarray, width: numpy.ndarray, height: numpy.ndarray,
+                  pairs: numpy.ndarray) -> Contacts:
+    """ Narrow phase: AABB test on the candidate pairs, with normal and depth along the axis of least overlap """
+    a, b = pairs[:, 0], pairs[:, 1]
+
+    overlap_x = numpy.minimum(x[a] + width[a], x[b] + width[b]) - numpy.maximum(x[a], x[b])
+    overlap_y = numpy.minimum(y[a] + height[a], y[b] + height[b]) - numpy.maximum(y[a], y[b])
+
+    # Touching counts as a contact, same as the scenes' own edge checks
+    hit = (overlap_x >= 0) & (overlap_y >= 0)
+    a, b, overlap_x, overlap_y = a[hit], b[hit], overlap_x[hit], overlap_y[hit]
+
+    along_x = overlap_x < overlap_y
+    # Direction from b's center to a's center, ties resolve to +1
+    dir_x = numpy.where(x[a] + width[a] / 2 >= x[b] + width[b] / 2, 1, -1)
+    dir_y = numpy.where(y[a] + height[a] / 2 >= y[b] + height[b] / 2, 1, -1)
+
+    normals = numpy.zeros((len(a), 2), dtype=numpy.int8)
+    normals[:, 0] = numpy.where(along_x, dir_x, 0)
+    normals[:, 1] = numpy.where(along_x, 0, dir_y)
+    depths = numpy.where(along_x, overlap_x, overlap_y)
+
+    return Contacts(numpy.stack((a, b), axis=1), normals, depths)
+
+
+def collide_entities(entities: list, cell_size: float = SpatialHash.CELL_SIZE):
+    """ Broad + narrow phase over Rectangle derived objects, returns a list of (a, b, normal, depth) """
+    x = numpy.array([entity.x for entity in entities], dtype=numpy.float64)
+    y = numpy.array([entity.y for entity in entities], dtype=numpy.float64)
+    width = numpy.array([entity.width for entity in entities], dtype=numpy.float64)
+    height = numpy.array([entity.height for entity in entities], dtype=numpy.float64)
+
+    grid = SpatialHash(cell_size)
+    grid.rebuild(x, y, width, height)
+    contacts = find_contacts(x, y, width, height, grid.candidate_pairs())
+
+    return [(entities[a], entities[b], normal, depth) for (a, b, normal, depth) in contacts]
+
+
+def exchange_velocities(contacts: Contacts, speed_x: numpy.ndarray, speed_y: numpy.ndarray):
+    """ Elastic response between equal mass bodies: approaching pairs swap their velocity along the normal """
+    a, b = contacts.pairs[:, 0], contacts.pairs[:, 1]
+    normal_x, normal_y = contacts.normals[:, 0], contacts.normals[:, 1]
+
+    swap_x = (normal_x != 0) & ((speed_x[a] - speed_x[b]) * normal_x < 0)
+    swap_y = (normal_y != 0) & ((speed_y[a] - speed_y[b]) * normal_y < 0)
+
+    for speed, swap in ((speed_x, swap_x), (speed_y, swap_y)):
+        first, second = a[swap], b[swap]
+        speed[first], speed[second] = speed[second], speed[first].copy()
+
+
+def swept_aabb(x: float, y: float, width: float, height: float, dx: float, dy: float,
+               other_x: float, other_y: float, other_width: float, other_height: float):
+    """ Continuous collision of a rectangle moving by (dx, dy) against a static one
+
+    Returns (time of impact as a 0..1 fraction of the move, (normal_x, normal_y)) for the first touch within the
+    move, or None if they don't meet or already overlap at the start (that's for the discrete checks to handle).
+    """
+    if dx > 0:
+        entry_x = (other_x - (x + width)) / dx
+        exit_x = (other_x + other_width - x) / dx
+    elif dx < 0:
+        entry_x = (other_x + other_width - x) / dx
+        exit_x = (other_x - (x + width)) / dx
+    elif x + width < other_x or x > other_x + other_width:
+        return None
+    else:
+        entry_x, exit_x = -math.inf, math.inf
+
+    if dy > 0:
+        entry_y = (other_y - (y + height)) / dy
+        exit_y = (other_y + other_height - y) / dy
+    elif dy < 0:
+        entry_y = (other_y + other_height - y) / dy
+        exit_y = (other_y - (y + height)) / dy
+    elif y + height < other_y or y > other_y + other_height:
+        return None
+    else:
+        entry_y, exit_y = -math.inf, math.inf
+
+    entry = max(entry_x, entry_y)
+    if entry > min(exit_x, exit_y) or entry > 1 or entry < 0:
+        return None
+
+    if entry_x > entry_y:
+        return entry, (-1 if dx > 0 else 1, 0)
+    return entry, (0, -1 if dy > 0 else 1)
+
+
+def swept_bounds(x: float, y: float, width: float, height: float, dx: float, dy: float, bounds_width: float,
+                 bounds_height: float, left: bool = True, right: bool = True, top: bool = True, bottom: bool = True):
+    """ Continuous collision of a moving rectangle with the (enabled) inner walls of the 0, 0 - width, height area
+
+    Returns (time of impact, normal) of the first wall hit within the move or None. Something already past a
+    wall and still moving outwards hits it at time 0, so it gets turned around right away.
+    """
+    hits = []
+    if right and dx > 0:
+        hits.append(((bounds_width - (x + width)) / dx, (-1, 0)))
+    if left and dx < 0:
+        hits.append(((0 - x) / dx, (1, 0)))
+    if bottom and dy > 0:
+        hits.append(((bounds_height - (y + height)) / dy, (0, -1)))
+    if top and dy < 0:
+        hits.append(((0 - y) / dy, (0, 1)))
+
+    hits = [(max(toi, 0.0), normal) for (toi, normal) in hits if toi <= 1]
+    return min(hits, key=lambda hit: hit[0]) if hits else None
@@ -1,10 +1,126 @@
+import numpy
+
+
 class Color:
-    """ Store an RGB color """
+    """ Immutable RGB color, also available packed into one int (0xRRGGBB)
+
+    Colors are interned: Color(255, 255, 255) returns the same object every time, so animations stepping through
+    the same shades over and over stop allocating after the first run. Being immutable, a color can be shared by
+    any number of entities and animations without one changing the others'.
+    """
+
+    __slots__ = ('r', 'g', 'b', 'packed', 'rgba_bytes')
+
+    # Enough for every shade a few fades go through, past that colors are still created but not kept
+    INTERN_LIMIT = 1 << 16
+    _interned = dict()
+
+    def __new__(cls, r: int, g: int, b: int):
+        r, g, b = min(max(int(r), 0), 255), min(max(int(g), 0), 255), min(max(int(b), 0), 255)
+        packed = r << 16 | g << 8 | b
+
+        color = Color._interned.get(packed)
+        if color is not None:
+            return color
+
+        color = object.__new__(cls)
+        object.__setattr__(color, 'r', r)
+        object.__setattr__(color, 'g', g)
+        object.__setattr__(color, 'b', b)
+        object.__setattr__(color, 'packed', packed)
+        # What the renderer's color arrays hold: RGBA, one byte each
+        object.__setattr__(color, 'rgba_bytes', (r, g, b, 255))
+
+        if len(Color._interned) < Color.INTERN_LIMIT:
+            Color._interned[packed] = color
+        return color
 
-    def __init__(self, r: int, g: int, b: int):
-        self.r = r
-        self.g = g
-        self.b = b
+    @staticmethod
+    def from_packed(packed: int):
+        return Color(packed >> 16 & 0xFF, packed >> 8 & 0xFF, packed & 0xFF)
+
+    def rgba(self, alpha: int = 255) -> tuple:
+        """ The color in the renderer's byte layout """
+        return self.rgba_bytes if alpha == 255 else (self.r, self.g, self.b, alpha)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Color is immutable")
+
+    def __eq__(self, other):
+        return isinstance(other, Color) and self.packed == other.packed
+
+    def __hash__(self):
+        return self.packed
+
+    def __reduce__(self):
+        return Color, (self.r, self.g, self.b)
 
     def __repr__(self):
         return f"Color(r={self.r}, g={self.g}, b={self.b})"
+
+
+def to_array(colors, alpha: int = 255) -> numpy.ndarray:
+    """ (N, 4) uint8 RGBA array of the given colors, ready to copy into a render batch """
+    packed = numpy.fromiter((color.packed for color in colors), dtype=numpy.uint32)
+    return unpack(packed, alpha)
+
+
+def unpack(packed: numpy.ndarray, alpha: int = 255) -> numpy.ndarray:
+    """ Packed 0xRRGGBB ints to an (N, 4) uint8 RGBA array """
+    rgba = numpy.empty((len(packed), 4), dtype=numpy.uint8)
+    rgba[:, 0] = packed >> 16 & 0xFF
+    rgba[:, 1] = packed >> 8 & 0xFF
+    rgba[:, 2] = packed & 0xFF
+    rgba[:, 3] = alpha
+    return rgba
+
+
+def lerp(start: numpy.ndarray, end: numpy.ndarray, t: numpy.ndarray, out: numpy.ndarray = None) -> numpy.ndarray:
+    """ Interpolate many colors at once: start and end are (N, 3) or (N, 4) arrays (or single rows), t is (N,)
+
+    Returns uint8 colors, written to out if given.
+    """
+    start = numpy.asarray(start, dtype=numpy.float32)
+    values = start + (numpy.asarray(end, dtype=numpy.float32) - start) * numpy.asarray(t)[..., numpy.newaxis]
+    if out is None:
+        out = numpy.empty(values.shape, dtype=numpy.uint8)
+    numpy.copyto(out, values, casting='unsafe')
+    return out
+
+
+class Gradient:
+    """ Precomputed colors between two colors, for animations that look them up instead of computing them
+
+    Use Gradient.get() to share one table per pair of colors.
+    """
+
+    STEPS = 256
+
+    _gradients = dict()
+
+    @staticmethod
+    def get(start: Color, end: Color):
+        key = (start.packed, end.packed)
+        gradient = Gradient._gradients.get(key)
+        if gradient is None:
+            gradient = Gradient._gradients[key] = Gradient(start, end)
+        return gradient
+
+    def __init__(self, start: Color, end: Color):
+        self.start = start
+        self.end = end
+
+        t = numpy.linspace(0, 1, Gradient.STEPS)
+        self.table = lerp((start.r, start.g, start.b), (end.r, end.g, end.b), t)
+        self.colors = [Color(r, g, b) for (r, g, b) in self.table.tolist()]
+
+    def at(self, t: float) -> Color:
+        """ Color at 0 <= t <= 1 along the gradient """
+        return self.colors[int(t * (Gradient.STEPS - 1) + 0.5)]
+
+    def indices(self, t: numpy.ndarray) -> numpy.ndarray:
+        """ Table indices for a whole array of 0..1 values """
+        return (t * (Gradient.STEPS - 1) + 0.5).astype(numpy.intp)
+
+    def __repr__(self):
+        return f"<Gradient {self.start} -> {self.end}>"
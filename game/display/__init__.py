@@ -1,3 +1,12 @@
-from .glut_dm import DisplayManager as GLUTdm
-from .glfw_dm import DisplayManager as GLFWdm
+# Backends are only imported when asked for, so e.g. the headless one works without GLUT/GLFW installed
 
+def __getattr__(name: str):
+    if name == 'GLUTdm':
+        from .glut_dm import DisplayManager
+    elif name == 'GLFWdm':
+        from .glfw_dm import DisplayManager
+    elif name == 'HeadlessDM':
+        from .headless_dm import DisplayManager
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return DisplayManager
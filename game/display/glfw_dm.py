@@ -4,18 +4,29 @@ import time
 import OpenGL.GL as gl
 import glfw
 
+from clock import FixedStepClock
 from interfaces import IScene
+from log import get_logger
+from pacer import FramePacer
+from profiler import FrameProfiler
+from render_target import ScaledOutput
+
+
+logger = get_logger(__name__)
 
 
 class DisplayManager:
     """ A display manager implementation using GLFW """
 
-    TARGET_FPS = 60
-    FRAME_TIME = 1 / TARGET_FPS
-    VSYNC = False
     DOUBLEBUFFER = glfw.TRUE
+    # Multisampling of the window, and of the offscreen framebuffer when the scene is rendered scaled
+    SAMPLES = 4
+
+    # While the scene shows a static picture: longest wait for window events before running the scene again
+    IDLE_TIMEOUT = 0.1
 
-    def __init__(self, width: int, height: int, title: str):
+    def __init__(self, width: int, height: int, title: str, target_fps: int = FramePacer.DEFAULT_TARGET,
+                 vsync: bool = False, render_scale: float = None, virtual_size: tuple = None):
         self.width = self.original_width = width
         self.height = self.original_height = height
         self.original_x = self.original_y = None;
@@ -23,136 +34,186 @@ class DisplayManager:
         self.title = title
         self.scene = None
 
-        self.old_time = None
-        self.new_time = None
+        self.pacer = FramePacer(target_fps, vsync)
         self.time_diff = 0
         self.tick = 0
         self.elapsed = 0
 
+        # Simulation runs on its own fixed rate clock, independent of how often we render
+        self.clock = FixedStepClock()
+        self.sim_ticks = 0
+
+        self.profiler = FrameProfiler()
+        # Internal render resolution (None: adjusted to the frame time) and fixed scene dimensions, if any
+        self.output = ScaledOutput(self.pacer.target_fps, render_scale, virtual_size, samples=DisplayManager.SAMPLES)
+        # What's on screen is the scene's static picture (see IScene.is_static()), no need to draw it again
+        self.static_frame = False
+        # Quit right after the first frame made it to the screen (for measuring startup time)
+        self.exit_after_first_frame = False
+
         glfw.set_error_callback(self.glfw_error_callback)
 
         if not glfw.init():
-            print("Could not initialize GLFW, exiting")
+            logger.error("could not initialize GLFW, exiting")
             sys.exit(-1)
 
-        print(
-            f"DisplayManager: GLFW {glfw.VERSION_MAJOR}.{glfw.VERSION_MINOR}.{glfw.VERSION_REVISION} init {width}x{height}")
+        logger.info("GLFW %d.%d.%d init %dx%d", glfw.VERSION_MAJOR, glfw.VERSION_MINOR, glfw.VERSION_REVISION, width,
+                    height)
 
         # These are the default values anyway
         glfw.window_hint(glfw.RESIZABLE, glfw.TRUE)
         glfw.window_hint(glfw.DOUBLEBUFFER, DisplayManager.DOUBLEBUFFER)
 
         # Antialiasing (0, 4)
-        glfw.window_hint(glfw.SAMPLES, 4)
+        glfw.window_hint(glfw.SAMPLES, DisplayManager.SAMPLES)
 
         # OpenGL API version for our context
         glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
         glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
 
-        # We use compat profile to stay compatible with the older immediate mode code
-        glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_COMPAT_PROFILE)
+        # Everything is drawn through VBOs and shaders, so a core profile context is enough
+        glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+        glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, glfw.TRUE)
 
         self.window = glfw.create_window(self.width, self.height, self.title, None, None)
         if not self.window:
-            print("DisplayManager: Could not create window, exiting")
+            logger.error("could not create window, exiting")
             sys.exit(-1)
 
         glfw.make_context_current(self.window)
-        glfw.swap_interval(DisplayManager.VSYNC)
+        refresh_rate = glfw.get_video_mode(glfw.get_primary_monitor()).refresh_rate
+        glfw.swap_interval(self.pacer.swap_interval(refresh_rate))
         glfw.set_window_size_callback(self.window, self.reshape)
+        glfw.set_window_refresh_callback(self.window, self.refresh)
 
+        # 2D only: no depth test, things are drawn in order (entities, then the HUD on top), alpha blended
         gl.glClearColor(0, 0, 0, 0)
-        gl.glDepthFunc(gl.GL_LESS)
-        gl.glEnable(gl.GL_DEPTH_TEST)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
 
     @staticmethod
     def glfw_error_callback(error: int, description: str):
-        print(f"GLFW error {error}: {description.decode('UTF-8')}")
+        logger.error("GLFW error %d: %s", error, description.decode('UTF-8'))
 
     def set_scene(self, scene: IScene):
-        print("DisplayManager: setting refresh functions to scene")
+        logger.info("setting refresh functions to scene")
 
         self.scene = scene
-        self.scene.set_display_dimensions(self.width, self.height)
+        self.static_frame = False
+        self.scene.set_display_dimensions(*self.output.scene_size(self.width, self.height))
         self.scene.set_fullscreen_callback(self.toggle_fullscreen)
+        self.scene.set_profiler(self.profiler)
+
+    def set_keyboard(self, keyboard):
+        """ Feed key events of our window to a NativeKeyboardManager """
+        glfw.set_key_callback(self.window, keyboard.on_glfw_key)
 
     def refresh2d(self):
+        # Projection to window pixels is done by the batch shaders, they get the dimensions when flushing
         gl.glViewport(0, 0, self.width, self.height)
 
-        # Set up properties of camera view
-        gl.glMatrixMode(gl.GL_PROJECTION)
-        gl.glLoadIdentity()
-        gl.glOrtho(0.0, self.width, self.height, 0.0, 0.0, 1.0)
-
-        # Set up object transformation
-        gl.glMatrixMode(gl.GL_MODELVIEW)
-        gl.glLoadIdentity()
-
     @staticmethod
     def clear():
-        gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
-        gl.glLoadIdentity()
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
 
-    def update(self):
-        glfw.poll_events()
+    def showing_static(self) -> bool:
+        return self.static_frame and not self.profiler.overlay and self.scene.is_static()
 
-        self.clear()
-        self.refresh2d()
+    def idle(self):
+        """ Sleep until there's input (or a resize, or IDLE_TIMEOUT passed) instead of redrawing the same picture """
+        glfw.wait_events_timeout(DisplayManager.IDLE_TIMEOUT)
+        # At least one tick, so the scene gets to see the input that woke us
+        self.pacer.restart()
+        self.time_diff = self.clock.tick_time
+
+    def update(self):
+        if self.showing_static():
+            self.idle()
 
-        self.scene.update(self.time_diff)
+        self.profiler.begin_frame()
 
-        glfw.swap_buffers(self.window)
+        with self.profiler.scope('poll'):
+            glfw.poll_events()
 
-        # Timekeeping
-        self.old_time = self.new_time
-        self.new_time = time.time()
+        # Run as many fixed simulation ticks as the time since the last frame allows
+        steps = self.clock.advance(self.time_diff)
+        with self.profiler.scope('update'):
+            for _ in range(steps):
+                self.scene.update(self.clock.tick_time)
+        self.sim_ticks += steps
 
-        # first cycle, we cannot compute interval yet
-        if self.old_time is None:
+        if self.showing_static():
+            # Woke up to the same picture, back to sleep
+            self.profiler.end_frame()
             return
+        self.static_frame = self.scene.is_static()
 
-        self.time_diff = self.new_time - self.old_time
-        self.elapsed += self.time_diff
-        fps = 1.0 / self.time_diff
-        sleep_time = DisplayManager.FRAME_TIME - self.time_diff if self.time_diff < DisplayManager.FRAME_TIME else 0
+        self.clear()
 
+        with self.profiler.scope('draw'):
+            self.output.draw(self.scene, self.clock.alpha, self.width, self.height)
+        # Overlay at full window resolution, whatever the scene got rendered at
+        self.refresh2d()
+        self.profiler.draw_overlay(self.width, self.height)
+
+        with self.profiler.scope('swap'):
+            swap_start = time.perf_counter_ns()
+            glfw.swap_buffers(self.window)
+            self.pacer.record_swap(time.perf_counter_ns() - swap_start)
+        if self.exit_after_first_frame:
+            glfw.set_window_should_close(self.window, True)
+
+        with self.profiler.scope('sleep'):
+            self.time_diff = self.pacer.wait()
+        self.timekeeping()
+        self.profiler.end_frame()
+
+    def timekeeping(self):
+        """ Show the average rates in the title once a second """
+        self.elapsed += self.time_diff
         self.tick += 1
         if self.elapsed >= 1:
+            fps = self.tick / self.elapsed
             glfw.set_window_title(self.window,
-                                  f"{self.title} | {fps:.2f} FPS dt={self.time_diff:.4f} ticks={self.tick} ")
+                                  f"{self.title} | {fps:.2f} FPS dt={self.time_diff:.4f} ticks={self.tick} "
+                                  f"sim={self.sim_ticks} scale={self.output.scaler.scale:.2f}")
             self.tick = 0
+            self.sim_ticks = 0
             self.elapsed = 0
 
-        if sleep_time != 0:
-            time.sleep(sleep_time)
-
     def reshape(self, window, width: int, height: int):
-        print(f"DisplayManager: reshape from ({self.width}x{self.height}) to ({width}x{height})")
+        logger.info("reshape from (%dx%d) to (%dx%d)", self.width, self.height, width, height)
         gl.glViewport(0, 0, width, height)
         self.width = width
         self.height = height
-        self.scene.reshape(width, height)
+        self.static_frame = False
+        if self.output.virtual_size is None:
+            self.scene.reshape(width, height)
+
+    def refresh(self, window):
+        # Window contents got damaged (uncovered, restored), needs a redraw even if the scene is static
+        self.static_frame = False
 
     def toggle_fullscreen(self):
         monitor = glfw.get_primary_monitor()
         screen_size = glfw.get_video_mode(monitor).size
 
         if self.fullscreen:
-            print("DisplayManager: switching back from fullscreen")
+            logger.info("switching back from fullscreen")
             glfw.set_window_monitor(self.window, None, self.original_x, self.original_y, self.original_width,
                                     self.original_height, glfw.DONT_CARE)
             self.fullscreen = False
         else:
-            print("Display: setting fullscreen")
+            logger.info("setting fullscreen")
             self.original_width = self.width
             self.original_height = self.height
             self.original_x, self.original_y = glfw.get_window_pos(self.window)
-            print(f"Original x,y was {self.original_x}, {self.original_y}")
+            logger.debug("original x,y was %d, %d", self.original_x, self.original_y)
             glfw.set_window_monitor(self.window, monitor, 0, 0, screen_size.width, screen_size.height, glfw.DONT_CARE)
             self.fullscreen = True
 
     def main_loop(self):
-        print("DisplayManager: starting the mainloop")
+        logger.info("starting the mainloop")
         while not glfw.window_should_close(self.window):
             self.update()
 
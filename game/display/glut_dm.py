@@ -1,37 +1,64 @@
+import re
 import sys
 import time
 
 import OpenGL.GL as gl
 import OpenGL.GLUT as glut
 
+from clock import FixedStepClock
 from interfaces import IScene
+from log import get_logger
+from pacer import FramePacer
+from profiler import FrameProfiler
+from render_target import ScaledOutput
+
+
+logger = get_logger(__name__)
 
 
 class DisplayManager:
     """ A display manager implementation using GLUT """
 
-    TARGET_FPS = 60
-    FRAME_TIME = 1 / TARGET_FPS
+    # OpenGL context version the shaders are written for
+    GL_VERSION = (3, 3)
 
-    def __init__(self, width: int, height: int, title: str):
+    # While the scene shows a static picture: longest wait for window events before running the scene again
+    IDLE_TIMEOUT = 0.1
+
+    def __init__(self, width: int, height: int, title: str, target_fps: int = FramePacer.DEFAULT_TARGET,
+                 vsync: bool = False, render_scale: float = None, virtual_size: tuple = None):
         self.width = self.original_width = width
         self.height = self.original_height = height
         self.fullscreen = False
         self.title = title
         self.scene = None
 
-        self.old_time = None
-        self.new_time = None
+        self.pacer = FramePacer(target_fps, vsync)
         self.time_diff = 0
         self.tick = 0
         self.elapsed = 0
 
-        print("DisplayManager: checking GLUT")
+        # Simulation runs on its own fixed rate clock, independent of how often we render
+        self.clock = FixedStepClock()
+        self.sim_ticks = 0
+
+        self.profiler = FrameProfiler()
+        # Internal render resolution (None: adjusted to the frame time) and fixed scene dimensions, if any
+        self.output = ScaledOutput(self.pacer.target_fps, render_scale, virtual_size)
+        # What's on screen is the scene's static picture (see IScene.is_static()), no need to draw it again
+        self.static_frame = False
+        # No idle function while static, GLUT blocks on events then. Woken up: run the scene once more regardless.
+        self.sleeping = False
+        self.woken = False
+        # Quit right after the first frame made it to the screen (for measuring startup time)
+        self.exit_after_first_frame = False
+
+        logger.debug("checking GLUT")
         if not bool(glut.glutInit):
-            print("OpenGL not installed?")
+            logger.error("OpenGL not installed?")
             sys.exit(1)
 
-        print(f"DisplayManager: init {width}x{height}")
+        logger.info("init %dx%d", width, height)
 
         # Initialize a glut instance which will allow us to customize our window
         glut.glutInit()
@@ -39,83 +66,173 @@ class DisplayManager:
         glut.glutInitDisplayMode(glut.GLUT_RGBA)  # Set the display mode to be colored
         glut.glutInitWindowSize(width, height)  # Set the width and height of your window
 
+        # Same OpenGL 3.3 core profile context as with GLFW. Only freeglut can ask for one, with other GLUTs we get
+        # whatever the driver gives and check below that it's recent enough.
+        if bool(glut.glutInitContextVersion):
+            glut.glutInitContextVersion(*DisplayManager.GL_VERSION)
+            glut.glutInitContextProfile(glut.GLUT_CORE_PROFILE)
+            if sys.platform == 'darwin':
+                glut.glutInitContextFlags(glut.GLUT_FORWARD_COMPATIBLE)
+
         self.window = glut.glutCreateWindow(title)
 
+        version = gl.glGetString(gl.GL_VERSION)
+        match = re.search(rb'(\d+)\.(\d+)', version or b'')
+        if not match or (int(match[1]), int(match[2])) < DisplayManager.GL_VERSION:
+            logger.error("OpenGL %d.%d needed, got %s, exiting", *DisplayManager.GL_VERSION, version)
+            sys.exit(1)
+        logger.info("OpenGL %s", version.decode(errors='replace'))
+
+        # 2D only: things are drawn in order (entities, then the HUD on top), alpha blended
+        gl.glClearColor(0, 0, 0, 0)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
     def set_scene(self, scene: IScene):
-        print("DisplayManager: setting refresh functions to scene")
+        logger.info("setting refresh functions to scene")
 
         self.scene = scene
-        self.scene.set_display_dimensions(self.width, self.height)
+        self.static_frame = False
+        self.scene.set_display_dimensions(*self.output.scene_size(self.width, self.height))
         self.scene.set_fullscreen_callback(self.toggle_fullscreen)
+        self.scene.set_profiler(self.profiler)
 
-        glut.glutDisplayFunc(self.update)  # Tell OpenGL to call the showScreen method continuously
+        glut.glutDisplayFunc(self.redisplay)  # Window contents need to be redrawn
         glut.glutIdleFunc(self.update)  # Draw any graphics or shapes in the showScreen function at all times
 
         glut.glutReshapeFunc(self.reshape)  # Called whenever window is resized
 
+    def set_keyboard(self, keyboard):
+        """ Feed key events of our window to a NativeKeyboardManager """
+        glut.glutIgnoreKeyRepeat(1)
+        glut.glutKeyboardFunc(self.waking(keyboard.on_glut_key))
+        glut.glutKeyboardUpFunc(self.waking(keyboard.on_glut_key_up))
+        glut.glutSpecialFunc(self.waking(keyboard.on_glut_special))
+        glut.glutSpecialUpFunc(self.waking(keyboard.on_glut_special_up))
+
+    def waking(self, callback):
+        """ Wrap an input callback so that it also wakes us up if we're idle """
+        def wrapper(*args):
+            callback(*args)
+            self.wake()
+        return wrapper
+
     def refresh2d(self):
+        # Projection to window pixels is done by the batch shaders, they get the dimensions when flushing
         gl.glViewport(0, 0, self.width, self.height)
 
-        # Set up properties of camera view
-        gl.glMatrixMode(gl.GL_PROJECTION)
-        gl.glLoadIdentity()
-        gl.glOrtho(0.0, self.width, self.height, 0.0, 0.0, 1.0)
-
-        # Set up object transformation
-        gl.glMatrixMode(gl.GL_MODELVIEW)
-        gl.glLoadIdentity()
-
     @staticmethod
     def clear():
-        gl.glClear(gl.GL_COLOR_BUFFER_BIT | gl.GL_DEPTH_BUFFER_BIT)
-        gl.glLoadIdentity()
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
 
-    def update(self):
-        self.clear()
-        self.refresh2d()
+    def showing_static(self) -> bool:
+        return self.static_frame and not self.profiler.overlay and self.scene.is_static()
 
-        self.scene.update(self.time_diff)
+    def sleep(self):
+        """ Stop being called in a loop: GLUT blocks on window events until input, a redisplay or the timer """
+        self.sleeping = True
+        glut.glutIdleFunc(None)
+        glut.glutTimerFunc(int(DisplayManager.IDLE_TIMEOUT * 1000), self.on_idle_timer, 0)
 
-        glut.glutSwapBuffers()
+    def wake(self):
+        if not self.sleeping:
+            return
+        self.sleeping = False
+        self.woken = True
+        # At least one tick, so the scene gets to see the input that woke us
+        self.pacer.restart()
+        self.time_diff = self.clock.tick_time
+        glut.glutIdleFunc(self.update)
+
+    def on_idle_timer(self, value: int):
+        self.wake()
+
+    def redisplay(self):
+        self.static_frame = False
+        if self.sleeping:
+            self.wake()
+        else:
+            self.update()
+
+    def update(self):
+        if self.sleeping:
+            return
+        if self.showing_static() and not self.woken:
+            self.sleep()
+            return
+        self.woken = False
 
-        # Timekeeping
-        self.old_time = self.new_time
-        self.new_time = time.time()
+        self.profiler.begin_frame()
 
-        # first cycle, we cannot compute interval yet
-        if self.old_time is None:
+        # Run as many fixed simulation ticks as the time since the last frame allows
+        steps = self.clock.advance(self.time_diff)
+        with self.profiler.scope('update'):
+            for _ in range(steps):
+                self.scene.update(self.clock.tick_time)
+        self.sim_ticks += steps
+
+        if self.showing_static():
+            # Woke up to the same picture, back to sleep
+            self.profiler.end_frame()
+            self.sleep()
             return
+        self.static_frame = self.scene.is_static()
 
-        self.time_diff = self.new_time - self.old_time
-        self.elapsed += self.time_diff
-        fps = 1.0 / self.time_diff
-        sleep_time = DisplayManager.FRAME_TIME - self.time_diff if self.time_diff < DisplayManager.FRAME_TIME else 0
+        self.clear()
 
+        with self.profiler.scope('draw'):
+            self.output.draw(self.scene, self.clock.alpha, self.width, self.height)
+        # Overlay at full window resolution, whatever the scene got rendered at
+        self.refresh2d()
+        self.profiler.draw_overlay(self.width, self.height)
+
+        with self.profiler.scope('swap'):
+            swap_start = time.perf_counter_ns()
+            glut.glutSwapBuffers()
+            self.pacer.record_swap(time.perf_counter_ns() - swap_start)
+        if self.exit_after_first_frame:
+            # glutLeaveMainLoop() is freeglut only
+            if bool(glut.glutLeaveMainLoop):
+                glut.glutLeaveMainLoop()
+            else:
+                sys.exit(0)
+
+        with self.profiler.scope('sleep'):
+            self.time_diff = self.pacer.wait()
+        self.timekeeping()
+        self.profiler.end_frame()
+
+    def timekeeping(self):
+        """ Show the average rates in the title once a second """
+        self.elapsed += self.time_diff
         self.tick += 1
         if self.elapsed >= 1:
+            fps = self.tick / self.elapsed
             glut.glutSetWindowTitle(
-                f"{self.title} | {fps:.2f} FPS dt={self.time_diff:.4f} ticks={self.tick} elapsed={self.elapsed:.4f}")
+                f"{self.title} | {fps:.2f} FPS dt={self.time_diff:.4f} ticks={self.tick} "
+                f"sim={self.sim_ticks} scale={self.output.scaler.scale:.2f}")
             self.tick = 0
+            self.sim_ticks = 0
             self.elapsed = 0
 
-        if sleep_time != 0:
-            time.sleep(sleep_time)
-
     def reshape(self, width: int, height: int):
-        print(f"DisplayManager: reshape from ({self.width}x{self.height}) to ({width}x{height})")
+        logger.info("reshape from (%dx%d) to (%dx%d)", self.width, self.height, width, height)
         gl.glViewport(0, 0, width, height)
         self.width = width
         self.height = height
-        self.scene.reshape(width, height)
+        self.static_frame = False
+        self.wake()
+        if self.output.virtual_size is None:
+            self.scene.reshape(width, height)
 
     def toggle_fullscreen(self):
         if self.fullscreen:
-            print("DisplayManager: switching back from fullscreen")
+            logger.info("switching back from fullscreen")
             glut.glutPositionWindow(0, 0)
             glut.glutReshapeWindow(self.original_width, self.original_height)
             self.fullscreen = False
         else:
-            print("Display: setting fullscreen")
+            logger.info("setting fullscreen")
             self.original_width = self.width
             self.original_height = self.height
             glut.glutFullScreen(self.window)
@@ -123,5 +240,5 @@ class DisplayManager:
 
     @staticmethod
     def main_loop():
-        print("DisplayManager: starting the mainloop")
+        logger.info("starting the mainloop")
         glut.glutMainLoop()  # Keeps the window created above displaying/running in a loop
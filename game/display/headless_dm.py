@@ -0,0 +1,161 @@
+import time
+
+from clock import FixedStepClock
+from interfaces import IScene
+from log import get_logger
+from profiler import FrameProfiler
+
+
+logger = get_logger(__name__)
+
+
+class DisplayManager:
+    """ A display manager without a window, driving the scene from a synthetic clock
+
+    By default no GL calls are made at all (scene.draw() is never called), so scene logic can run on machines
+    without a display or GPU. With offscreen=True a hidden GLFW window provides a context and every frame is
+    also drawn, which still needs a display server (e.g. Xvfb) but no visible window.
+    """
+
+    def __init__(self, width: int, height: int, title: str, offscreen: bool = False,
+                 tick_rate: int = FixedStepClock.TICK_RATE):
+        self.width = width
+        self.height = height
+        self.title = title
+        self.scene = None
+        self.offscreen = offscreen
+        self.window = None
+
+        self.clock = FixedStepClock(tick_rate)
+        self.profiler = FrameProfiler()
+
+        # Throughput of the last run
+        self.ticks = 0
+        self.elapsed = 0
+        self.ticks_per_second = 0
+
+        # What main_loop() runs: a fixed number of ticks as fast as possible, or real time (0)
+        self.max_ticks = 0
+        self.duration = None
+        # Quit after the first tick and frame (for measuring startup time)
+        self.exit_after_first_frame = False
+
+        logger.info("headless init %dx%d at %d ticks/s, offscreen=%s", width, height, tick_rate, offscreen)
+
+        if offscreen:
+            self.init_offscreen()
+
+    def init_offscreen(self):
+        import glfw
+        import OpenGL.GL as gl
+
+        if not glfw.init():
+            raise RuntimeError("Could not initialize GLFW for the offscreen context")
+
+        glfw.window_hint(glfw.VISIBLE, glfw.FALSE)
+        glfw.window_hint(glfw.CONTEXT_VERSION_MAJOR, 3)
+        glfw.window_hint(glfw.CONTEXT_VERSION_MINOR, 3)
+        glfw.window_hint(glfw.OPENGL_PROFILE, glfw.OPENGL_CORE_PROFILE)
+        glfw.window_hint(glfw.OPENGL_FORWARD_COMPAT, glfw.TRUE)
+
+        self.window = glfw.create_window(self.width, self.height, self.title, None, None)
+        if not self.window:
+            raise RuntimeError("Could not create the offscreen window")
+
+        glfw.make_context_current(self.window)
+        gl.glViewport(0, 0, self.width, self.height)
+        gl.glClearColor(0, 0, 0, 0)
+        gl.glEnable(gl.GL_BLEND)
+        gl.glBlendFunc(gl.GL_SRC_ALPHA, gl.GL_ONE_MINUS_SRC_ALPHA)
+
+    def set_scene(self, scene: IScene):
+        logger.info("setting scene")
+
+        self.scene = scene
+        self.scene.set_display_dimensions(self.width, self.height)
+        self.scene.set_fullscreen_callback(self.toggle_fullscreen)
+        self.scene.set_profiler(self.profiler)
+
+    def render(self):
+        if self.window is None:
+            return
+
+        import glfw
+        import OpenGL.GL as gl
+
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+        self.scene.draw(self.clock.alpha)
+        glfw.swap_buffers(self.window)
+
+    def step(self, ticks: int = 1):
+        """ Run the given number of simulation ticks, no matter how long it takes """
+        for _ in range(ticks):
+            self.scene.update(self.clock.tick_time)
+
+    def run_ticks(self, ticks: int) -> float:
+        """ Run the given number of ticks as fast as possible, returns simulated ticks/second """
+        start = time.perf_counter()
+        self.profiler.begin_frame()
+        with self.profiler.scope('update'):
+            self.step(ticks)
+        self.clock.ticks += ticks
+        with self.profiler.scope('draw'):
+            self.render()
+        self.profiler.end_frame()
+        self.record(ticks, time.perf_counter() - start)
+        return self.ticks_per_second
+
+    def run_realtime(self, duration: float = None) -> float:
+        """ Run the simulation at wall clock speed for duration seconds (forever if None) """
+        start = last = time.perf_counter()
+        ticks = 0
+
+        try:
+            while duration is None or last - start < duration:
+                self.profiler.begin_frame()
+                now = time.perf_counter()
+                steps = self.clock.advance(now - last)
+                last = now
+
+                with self.profiler.scope('update'):
+                    self.step(steps)
+                ticks += steps
+                with self.profiler.scope('draw'):
+                    self.render()
+
+                with self.profiler.scope('sleep'):
+                    time.sleep(self.clock.tick_time)
+                self.profiler.end_frame()
+        except KeyboardInterrupt:
+            logger.info("interrupted")
+
+        self.record(ticks, time.perf_counter() - start)
+        return self.ticks_per_second
+
+    def record(self, ticks: int, elapsed: float):
+        self.ticks = ticks
+        self.elapsed = elapsed
+        self.ticks_per_second = ticks / elapsed if elapsed > 0 else 0
+        logger.info("%d ticks in %.4fs, %.2f ticks/s", ticks, elapsed, self.ticks_per_second)
+
+    def reshape(self, width: int, height: int):
+        logger.info("reshape from (%dx%d) to (%dx%d)", self.width, self.height, width, height)
+        self.width = width
+        self.height = height
+        self.scene.reshape(width, height)
+
+    def toggle_fullscreen(self):
+        logger.info("no fullscreen in headless mode")
+
+    def main_loop(self):
+        logger.info("starting the mainloop")
+        if self.exit_after_first_frame:
+            self.run_ticks(1)
+        elif self.max_ticks:
+            self.run_ticks(self.max_ticks)
+        else:
+            self.run_realtime(self.duration)
+
+        if self.window is not None:
+            import glfw
+            glfw.terminate()
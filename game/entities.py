@@ -1,28 +1,48 @@
-from abc import ABC, abstractmethod
+from color import Color
+from interfaces import IColorable, IMovable
+from log import get_logger
+from renderer import QuadBatch
 
-import OpenGL.GL as gl
 
-from color import Color
-from interfaces import IColorable, IMovable, IAnimation
+logger = get_logger(__name__)
+
+
+class Rectangle(IMovable, IColorable):
+    """ Movable, colorable rectangle, the base of everything on screen
 
+    Flat on purpose: one class with __slots__ instead of a stack of mixins, so instances have no __dict__ and
+    attribute access doesn't have to walk a deep MRO. Speeds are expressed in pixels/second, move() scales them
+    by the tick length.
+    """
 
-class Entity:
-    """ Simple entity that knows its position only """
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'width', 'height', 'speed_x', 'speed_y', 'color')
 
-    def __init__(self, x: int, y: int):
+    DEFAULT_COLOR = Color(255, 255, 255)
+
+    def __init__(self, x: int, y: int, width: int, height: int, color: Color = None):
         self.x = x
         self.y = y
+        # Position at the start of the current simulation tick, used for render interpolation
+        self.prev_x = x
+        self.prev_y = y
+        self.width = width
+        self.height = height
+        self.speed_x = 0
+        self.speed_y = 0
+        self.color = color if color is not None else Rectangle.DEFAULT_COLOR
 
-    def __repr__(self):
-        return f"<Entity x={self.x}, y={self.y}>"
-
+    def snapshot(self):
+        """ Remember the current position as the starting point of the next simulation tick """
+        self.prev_x = self.x
+        self.prev_y = self.y
 
-class MovableMixin(IMovable):
-    """ Mixin that provides the ability to move to a position or by given dx/dy amount """
+    def get_interpolated_coords(self, alpha: float):
+        return self.prev_x + (self.x - self.prev_x) * alpha, self.prev_y + (self.y - self.prev_y) * alpha
 
     def move_to(self, dest_x: int, dest_y: int):
-        self.x = dest_x
-        self.y = dest_y
+        # Teleporting, so there is nothing to interpolate from
+        self.x = self.prev_x = dest_x
+        self.y = self.prev_y = dest_y
 
     def move_by(self, dx: int, dy: int):
         self.x += dx
@@ -39,122 +59,62 @@ class MovableMixin(IMovable):
         return self.x, self.y
 
     def set_coords(self, x: int, y: int):
-        self.x = x
-        self.y = y
-
-    def move(self):
-        self.x += self.speed_x
-        self.y += self.speed_y
-
-
-class DrawableMixin(ABC):
-    """ Mixin that provides the ability for the entity to draw itself (abstract) """
-
-    @abstractmethod
-    def draw(self):
-        pass
+        self.move_to(x, y)
 
-
-class ColorableMixin(IColorable):
-    """ Mixin that provides the ability to have color """
-    DEFAULT_COLOR = Color(255, 255, 255)
+    def move(self, dt: float):
+        self.x += self.speed_x * dt
+        self.y += self.speed_y * dt
 
     def set_color(self, color: Color):
+        # Colors are immutable, sharing them is safe
         self.color = color
 
     def get_color(self):
         return self.color
 
-
-class AnimatedMixin:
-    """ Mixin to provide the ability to have a number of animations applied to the object """
-
-    def __init__(self):
-        self.clear_animations()
-        self.target = None
-
-    def clear_animations(self):
-        print(f"AnimatedMixin: Clearing all animations on {self}")
-        self.animations = []
-
-    def add_animation(self, animation: IAnimation):
-        animation.set_target(self)
-        self.animations.append(animation)
-
-    def delete_animation(self, animation: IAnimation):
-        if animation in self.animations:
-            self.animations.remove(animation)
-
-    def animate(self, dt: int):
-        for anim in list(self.animations):
-            anim.update(dt)
-            if anim.is_finished():
-                print(f"AnimatedMixin: {anim} is finished and being removed")
-                self.delete_animation(anim)
-
-
-class Rectangle(Entity, DrawableMixin, ColorableMixin):
-    """ Simple drawable, colorable rectangle """
-
-    def __init__(self, x: int, y: int, width: int, height: int, color=None):
-        super().__init__(x, y)
-        self.width = width
-        self.height = height
-        self.set_color(color if color is not None else ColorableMixin.DEFAULT_COLOR)
-
-    def draw(self):
-        gl.glBegin(gl.GL_QUADS)
-        gl.glColor3ub(self.color.r, self.color.g, self.color.b)
-        gl.glVertex2f(self.x, self.y)
-        gl.glVertex2f(self.x + self.width, self.y)
-        gl.glVertex2f(self.x + self.width, self.y + self.height)
-        gl.glVertex2f(self.x, self.y + self.height)
-        gl.glEnd()
+    def draw(self, batch: QuadBatch, alpha: float = 1.0):
+        prev_x, prev_y = self.prev_x, self.prev_y
+        batch.add_rect(prev_x + (self.x - prev_x) * alpha, prev_y + (self.y - prev_y) * alpha, self.width,
+                       self.height, self.color)
 
     def __repr__(self):
         return f"<Rectangle x={self.x}, y={self.y}>"
 
 
-class Ball(Rectangle, MovableMixin, AnimatedMixin):
+class Ball(Rectangle):
     """ Implementation of the ball in game """
 
-    def __init__(self, *args):
-        super().__init__(*args)
-        AnimatedMixin.__init__(self)
-        self.set_speed(0, 0)
+    __slots__ = ()
+
+    # Speed change (pixels/second) applied when the ball hits the pad
+    SPEED_STEP = 60
 
     # When bouncing on the left/right edge, providing a possibility to
-    # also adjust vertical speed e.g. when the pad was moving
+    # also adjust vertical speed e.g. when the pad was moving (-1, 0 or 1)
     def bounce_x(self, adjust_x: int = 0):
         self.speed_x = -self.speed_x
         if adjust_x:
-            print("Ball: Increasing vertical speed")
-            self.speed_y += adjust_x
+            logger.debug("increasing vertical speed")
+            self.speed_y += adjust_x * Ball.SPEED_STEP
 
     def bounce_y(self):
         self.speed_y *= -1
 
-    def update(self, dt: int):
-        self.animate(dt)
-        self.move()
+    def update(self, dt: float):
+        self.move(dt)
 
     def increase_speed(self):
-        self.speed_x += 1
-        self.speed_y += 1
+        self.speed_x += Ball.SPEED_STEP
+        self.speed_y += Ball.SPEED_STEP
 
     def __repr__(self):
         return f"<Ball x={self.x}, y={self.y}>"
 
 
-class Pad(Rectangle, MovableMixin, AnimatedMixin):
+class Pad(Rectangle):
     """ Implementation of the pad in game """
 
-    def __init__(self, *args):
-        super().__init__(*args)
-        AnimatedMixin.__init__(self)
-
-    def update(self, dt: int):
-        self.animate(dt)
+    __slots__ = ()
 
     def __repr__(self):
         return f"<Pad x={self.x}, y={self.y}>"
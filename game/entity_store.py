@@ -0,0 +1,241 @@
+import numpy
+
+from color import Color
+from entities import Ball
+from interfaces import IColorable, IMovable
+from renderer import QuadBatch
+
+
+class EntityStore:
+    """ Structure-of-arrays storage for many rectangle entities
+
+    Positions, sizes, velocities and colors live in contiguous NumPy arrays, so movement, wall bounces and pad
+    checks run as one vectorized pass over all entities instead of per-object Python calls. Slots of removed
+    entities are recycled, so indices (and the handles built on them) stay valid while the entity is alive.
+    """
+
+    INITIAL_CAPACITY = 64
+
+    FIELDS = ('x', 'y', 'prev_x', 'prev_y', 'width', 'height', 'speed_x', 'speed_y')
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.capacity = 0
+        self.count = 0  # high water mark, everything at or above is unused
+        self.free = []
+
+        for field in EntityStore.FIELDS:
+            setattr(self, field, numpy.zeros(0, dtype=numpy.float64))
+        self.colors = numpy.zeros((0, 4), dtype=numpy.uint8)
+        self.alive = numpy.zeros(0, dtype=bool)
+
+        self.resize(capacity)
+
+    def resize(self, capacity: int):
+        for field in EntityStore.FIELDS:
+            array = numpy.zeros(capacity, dtype=numpy.float64)
+            array[:self.count] = getattr(self, field)[:self.count]
+            setattr(self, field, array)
+
+        colors = numpy.zeros((capacity, 4), dtype=numpy.uint8)
+        colors[:self.count] = self.colors[:self.count]
+        self.colors = colors
+
+        alive = numpy.zeros(capacity, dtype=bool)
+        alive[:self.count] = self.alive[:self.count]
+        self.alive = alive
+
+        self.capacity = capacity
+
+    def add(self, x: float, y: float, width: float, height: float, color: Color, speed_x: float = 0,
+            speed_y: float = 0) -> int:
+        """ Store a new entity, returns its index """
+        if self.free:
+            index = self.free.pop()
+        else:
+            if self.count == self.capacity:
+                self.resize(self.capacity * 2)
+            index = self.count
+            self.count += 1
+
+        self.x[index] = self.prev_x[index] = x
+        self.y[index] = self.prev_y[index] = y
+        self.width[index] = width
+        self.height[index] = height
+        self.speed_x[index] = speed_x
+        self.speed_y[index] = speed_y
+        self.colors[index] = color.rgba_bytes
+        self.alive[index] = True
+
+        return index
+
+    def remove(self, index: int):
+        if not self.alive[index]:
+            return
+        self.alive[index] = False
+        self.speed_x[index] = self.speed_y[index] = 0
+        self.free.append(index)
+
+    def remove_all(self, mask: numpy.ndarray):
+        """ Remove every entity selected by a boolean mask over the first count slots """
+        for index in numpy.flatnonzero(mask & self.alive[:self.count]):
+            self.remove(int(index))
+
+    def clear(self):
+        self.alive[:] = False
+        self.count = 0
+        self.free = []
+
+    def __len__(self):
+        return self.count - len(self.free)
+
+    def handle(self, index: int):
+        return EntityHandle(self, index)
+
+    def snapshot(self):
+        """ Remember the current positions as the start of the next simulation tick """
+        n = self.count
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+
+    def move(self, dt: float):
+        # Removed entities have zero speed, no need to mask them
+        n = self.count
+        self.x[:n] += self.speed_x[:n] * dt
+        self.y[:n] += self.speed_y[:n] * dt
+
+    def bounce_walls(self, width: float, height: float, left: bool = False):
+        """ Bounce everything off the top, bottom and right walls (and the left one, if asked)
+
+        Only entities moving towards a wall are turned around, so nothing gets stuck flipping back and forth
+        while still overlapping it. Returns the masks of the entities bounced horizontally and vertically.
+        """
+        n = self.count
+        x, y = self.x[:n], self.y[:n]
+        speed_x, speed_y = self.speed_x[:n], self.speed_y[:n]
+        alive = self.alive[:n]
+
+        bounce_x = alive & (x + self.width[:n] > width) & (speed_x > 0)
+        if left:
+            bounce_x |= alive & (x < 0) & (speed_x < 0)
+        bounce_y = alive & (((y < 0) & (speed_y < 0)) | ((y + self.height[:n] > height) & (speed_y > 0)))
+
+        speed_x[bounce_x] *= -1
+        speed_y[bounce_y] *= -1
+
+        return bounce_x, bounce_y
+
+    def overlapping(self, x: float, y: float, width: float, height: float) -> numpy.ndarray:
+        """ Mask of the alive entities whose rectangle touches the given one """
+        n = self.count
+        return (self.alive[:n] &
+                (self.x[:n] <= x + width) & (self.x[:n] + self.width[:n] >= x) &
+                (self.y[:n] <= y + height) & (self.y[:n] + self.height[:n] >= y))
+
+    def collide_pad(self, pad, pad_move: int = 0) -> numpy.ndarray:
+        """ Bounce every entity approaching the pad (from the right) off it, the vectorized Ball.bounce_x()
+        plus Ball.increase_speed(). Returns the mask of the entities that hit the pad.
+        """
+        n = self.count
+        hit = self.overlapping(pad.x, pad.y, pad.width, pad.height) & (self.speed_x[:n] < 0)
+
+        self.speed_x[:n][hit] *= -1
+        if pad_move:
+            self.speed_y[:n][hit] += pad_move * Ball.SPEED_STEP
+        self.speed_x[:n][hit] += Ball.SPEED_STEP
+        self.speed_y[:n][hit] += Ball.SPEED_STEP
+
+        return hit
+
+    def draw(self, batch: QuadBatch, alpha: float = 1.0):
+        """ Queue all alive entities into a render batch, interpolated between the last two ticks """
+        alive = self.alive[:self.count]
+        n = int(alive.sum())
+        if not n:
+            return
+
+        rects = numpy.empty((n, 4), dtype=numpy.float32)
+        prev_x, prev_y = self.prev_x[:self.count][alive], self.prev_y[:self.count][alive]
+        rects[:, 0] = prev_x + (self.x[:self.count][alive] - prev_x) * alpha
+        rects[:, 1] = prev_y + (self.y[:self.count][alive] - prev_y) * alpha
+        rects[:, 2] = self.width[:self.count][alive]
+        rects[:, 3] = self.height[:self.count][alive]
+
+        batch.add_rects(rects, self.colors[:self.count][alive])
+
+    def __repr__(self):
+        return f"<EntityStore entities={len(self)} capacity={self.capacity}>"
+
+
+class StoreField:
+    """ Descriptor exposing one element of an EntityStore array as a plain attribute of a handle """
+
+    def __init__(self, field: str):
+        self.field = field
+
+    def __get__(self, handle, owner=None):
+        if handle is None:
+            return self
+        return float(getattr(handle.store, self.field)[handle.index])
+
+    def __set__(self, handle, value):
+        getattr(handle.store, self.field)[handle.index] = value
+
+
+class EntityHandle(IMovable, IColorable):
+    """ Lightweight object style view of one entity in an EntityStore
+
+    Works anywhere an IMovable/IColorable is expected (e.g. as an animation target), all state stays in the store.
+    """
+
+    __slots__ = ('store', 'index')
+
+    x = StoreField('x')
+    y = StoreField('y')
+    prev_x = StoreField('prev_x')
+    prev_y = StoreField('prev_y')
+    width = StoreField('width')
+    height = StoreField('height')
+    speed_x = StoreField('speed_x')
+    speed_y = StoreField('speed_y')
+
+    def __init__(self, store: EntityStore, index: int):
+        self.store = store
+        self.index = index
+
+    def move_to(self, dest_x: int, dest_y: int):
+        self.x = self.prev_x = dest_x
+        self.y = self.prev_y = dest_y
+
+    def move_by(self, dx: int, dy: int):
+        self.x += dx
+        self.y += dy
+
+    def set_speed(self, speed_x: int, speed_y: int):
+        self.speed_x = speed_x
+        self.speed_y = speed_y
+
+    def get_speed(self):
+        return self.speed_x, self.speed_y
+
+    def get_coords(self):
+        return self.x, self.y
+
+    def set_coords(self, x: int, y: int):
+        self.move_to(x, y)
+
+    def move(self, dt: float):
+        self.x += self.speed_x * dt
+        self.y += self.speed_y * dt
+
+    def set_color(self, color: Color):
+        self.store.colors[self.index] = color.rgba_bytes
+
+    def get_color(self):
+        r, g, b = self.store.colors[self.index, 0:3]
+        return Color(int(r), int(g), int(b))
+
+    def is_alive(self) -> bool:
+        return bool(self.store.alive[self.index])
+
+    def __repr__(self):
+        return f"<EntityHandle #{self.index} x={self.x}, y={self.y}>"
@@ -1,80 +1,79 @@
 import os
 
-import OpenGL.GL as gl
-import numpy
-from PIL import Image, ImageDraw, ImageFont
+from color import Color
+from log import get_logger
+from renderer import QuadBatch
+from text import GlyphAtlas, TextBatch
+
+
+logger = get_logger(__name__)
 
 
 class Hud:
+    """ Text overlay: the main info panel in the top right corner plus any number of free positioned labels
+
+    Text is drawn from a glyph atlas that is built once per font and size, so changing it every frame is cheap.
+    """
+
+    FONT_FILENAME = "FiraSans-Bold.ttf"
+    FONT_SIZE = 25
+
+    TEXT_COLOR = Color(55, 85, 255)
+    PANEL_COLOR = Color(15, 15, 15)
+    PANEL_WIDTH = 275
+    PANEL_HEIGHT = 100
+    PANEL_MARGIN = 25
+    PANEL_PADDING = 10
+
     def __init__(self):
-        print("Hud: init")
+        logger.debug("init")
         self.data = dict()
+        self.labels = dict()
         self.window_width = None
         self.window_height = None
-        self.img_data = None
-        self.textureID = None
-        self.font_filename = "FiraSans-Bold.ttf"
-        self.font_size = 25
 
-        self.font = ImageFont.truetype(os.path.join(os.path.abspath(os.path.dirname(__file__)),
-                                                    "..", self.font_filename), self.font_size)
+        self.atlas = Hud.get_atlas(Hud.FONT_SIZE)
+        self.panels = QuadBatch()
+        self.text = TextBatch(self.atlas)
+
+    @staticmethod
+    def get_atlas(font_size: int) -> GlyphAtlas:
+        """ Shared atlas of the HUD font in the given size """
+        return GlyphAtlas.get(os.path.join(os.path.abspath(os.path.dirname(__file__)), "..", Hud.FONT_FILENAME),
+                              font_size)
 
     def reshape(self, width: int, height: int):
-        print(f"Hud: received window dimensions {width}x{height}")
+        logger.debug("received window dimensions %dx%d", width, height)
         self.window_width = width
         self.window_height = height
 
     def update(self, data: dict):
+        """ Set the text of the main panel """
         self.data = data
-        img = Image.new('RGBA', (300, 100), color=(15, 15, 15))
-        d = ImageDraw.Draw(img)
-        text = self.data.get('text', '')
-        d.text((10, 10), text, fill=(55, 85, 255), font=self.font)
-        img = img.transpose(Image.FLIP_TOP_BOTTOM)
-        self.img_data = numpy.array(list(img.getdata()), numpy.int8)
 
-        # Make sure we deallocate any textures previously bound
-        if self.textureID:
-            print(f"Hud: unbinding and deallocating txid#{self.textureID}")
-            gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
-            gl.glDeleteTextures(1, self.textureID)
+    def set_label(self, name: str, text: str, x: float, y: float, color: Color = TEXT_COLOR):
+        """ Add or replace a named label at the given window position """
+        self.labels[name] = (text, x, y, color)
 
-        self.textureID = gl.glGenTextures(1)
-        print(f"Hud: allocated txid#{self.textureID}")
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.textureID)
-
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_REPEAT)
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_REPEAT)
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
-        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
-
-        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA, img.size[0], img.size[1], 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE,
-                        self.img_data)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+    def remove_label(self, name: str):
+        self.labels.pop(name, None)
 
     def draw(self):
-        if not self.textureID:
+        if self.window_width is None:
             return
 
-        gl.glEnable(gl.GL_TEXTURE_2D)
-        gl.glActiveTexture(gl.GL_TEXTURE0)
-        gl.glBindTexture(gl.GL_TEXTURE_2D, self.textureID)
-        gl.glTexEnvi(gl.GL_TEXTURE_ENV, gl.GL_TEXTURE_ENV_MODE, gl.GL_REPLACE)
-
-        gl.glBegin(gl.GL_QUADS)
-
-        gl.glTexCoord2f(0, 1)
-        gl.glVertex2f(self.window_width - 300, 25)
+        self.panels.begin()
+        self.text.begin()
 
-        gl.glTexCoord2f(1, 1)
-        gl.glVertex2f(self.window_width - 25, 25)
-
-        gl.glTexCoord2f(1, 0)
-        gl.glVertex2f(self.window_width - 25, 125)
-
-        gl.glTexCoord2f(0, 0)
-        gl.glVertex2f(self.window_width - 300, 125)
+        text = self.data.get('text', '')
+        if text:
+            panel_x = self.window_width - Hud.PANEL_WIDTH - Hud.PANEL_MARGIN
+            panel_y = Hud.PANEL_MARGIN
+            self.panels.add_rect(panel_x, panel_y, Hud.PANEL_WIDTH, Hud.PANEL_HEIGHT, Hud.PANEL_COLOR)
+            self.text.add_text(text, panel_x + Hud.PANEL_PADDING, panel_y + Hud.PANEL_PADDING, Hud.TEXT_COLOR)
 
-        gl.glEnd()
+        for (text, x, y, color) in self.labels.values():
+            self.text.add_text(text, x, y, color)
 
-        gl.glDisable(gl.GL_TEXTURE_2D)
+        self.panels.flush(self.window_width, self.window_height)
+        self.text.flush(self.window_width, self.window_height)
@@ -1,9 +1,13 @@
 from abc import ABC, abstractmethod
 
 from color import Color
+from profiler import NullProfiler
 
 
 class IColorable(ABC):
+    # No __dict__ of its own, so implementations can use __slots__
+    __slots__ = ()
+
     @abstractmethod
     def set_color(self, color: Color):
         pass
@@ -14,6 +18,8 @@ class IColorable(ABC):
 
 
 class IMovable(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def move_to(self, dest_x: int, dest_y: int):
         pass
@@ -35,11 +41,13 @@ class IMovable(ABC):
         pass
 
     @abstractmethod
-    def move(self):
+    def move(self, dt: float):
         pass
 
 
 class IAnimation(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def update(self, dt: int):
         pass
@@ -53,9 +61,28 @@ class IAnimation(ABC):
         pass
 
 
+class IKeyboardManager(ABC):
+    """ Keys are identified by name: the character for printable keys ('q', 'f'), otherwise e.g. 'space' """
+
+    @abstractmethod
+    def next(self):
+        """ Returns the name of the next newly pressed key from the queue (press edge), None if there's none """
+        pass
+
+    @abstractmethod
+    def is_pressed(self, key: str) -> bool:
+        pass
+
+
 class IScene(ABC):
+    # Replaced by the display manager's profiler in set_profiler(), scenes can always time their own phases with
+    # `with self.profiler.scope(name):`
+    profiler = NullProfiler()
+    # Set when run by a SceneManager, for switching to other scenes
+    scene_manager = None
+
     @abstractmethod
-    def __init__(self, keyboard_manager):
+    def __init__(self, keyboard_manager: IKeyboardManager):
         pass
 
     @abstractmethod
@@ -72,11 +99,31 @@ class IScene(ABC):
 
     @abstractmethod
     def update(self, dt):
+        """ Advance the simulation by one fixed tick of dt seconds """
+        pass
+
+    @abstractmethod
+    def draw(self, alpha: float):
+        """ Render the scene, alpha (0..1) tells how far we are between the previous and the current tick """
         pass
 
     @abstractmethod
     def reshape(self, width: int, height: int):
         pass
 
+    def is_static(self) -> bool:
+        """ True while the picture can't change until the next input, so the display manager may stop redrawing """
+        return False
+
     def set_fullscreen_callback(self, callback):
         self.fullscreen_callback = callback
+
+    def set_profiler(self, profiler):
+        self.profiler = profiler
+
+    def set_scene_manager(self, scene_manager):
+        self.scene_manager = scene_manager
+
+    def state_bytes(self) -> bytes:
+        """ Everything that defines the simulation state, packed: replays compare hashes of it """
+        return b''
@@ -3,8 +3,14 @@ from threading import Lock
 
 from pynput import keyboard
 
+from interfaces import IKeyboardManager
+from log import get_logger
 
-class KeyboardManager:
+
+logger = get_logger(__name__)
+
+
+class KeyboardManager(IKeyboardManager):
 
     def __init__(self):
 
@@ -12,7 +18,7 @@ class KeyboardManager:
         self.keys_pressed = dict()
         self.queue = deque()
 
-        print("Keyboard: start")
+        logger.info("start")
         self.listener = keyboard.Listener(
             on_press=self.on_press_handler,
             on_release=self.on_release_handler
@@ -20,20 +26,28 @@ class KeyboardManager:
 
         self.listener.start()
 
+    @staticmethod
+    def key_name(key) -> str:
+        """ Translate a pynput key into the name used by the IKeyboardManager interface """
+        if isinstance(key, keyboard.KeyCode):
+            return key.char
+        return key.name
+
     def on_press_handler(self, key):
+        # Auto repeat sends more presses while the key is held, only the first one is queued
         if key not in self.keys_pressed:
             with self._lock:
                 self.keys_pressed[key] = True
+                self.queue.appendleft(key)
 
     def on_release_handler(self, key):
         if key in self.keys_pressed:
             with self._lock:
                 del (self.keys_pressed[key])
-                self.queue.appendleft(key)
 
     def next(self):
         if len(self.queue):
-            return self.queue.pop()
+            return self.key_name(self.queue.pop())
         else:
             return None
 
@@ -0,0 +1,93 @@
+""" Logging for the game package
+
+Every module gets its own logger via get_logger(__name__), all of them children of the "poing" logger. setup()
+makes the actual output happen on a background thread: the game thread only puts records into a queue, so a
+slow terminal or a pipe to a log shipper can't stall a frame. Messages logged from the frame loop are also rate
+limited per call site, anything over the limit is counted and reported with the next message that gets through.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+
+ROOT_LOGGER = "poing"
+FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+_listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+class RateLimitFilter(logging.Filter):
+    """ Lets through at most `burst` records per call site (logger + message template) every `interval` seconds
+
+    Runs on the calling thread before the record is queued, so dropped records cost a dict lookup only.
+    """
+
+    def __init__(self, burst: int = 5, interval: float = 1.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.sites = dict()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Warnings and errors always get through
+        if record.levelno >= logging.WARNING:
+            return True
+
+        key = (record.name, record.msg)
+        now = record.created
+        site = self.sites.get(key)
+        if site is None or now - site[0] >= self.interval:
+            suppressed = site[2] if site is not None else 0
+            self.sites[key] = [now, 1, 0]
+        elif site[1] < self.burst:
+            site[1] += 1
+            suppressed = 0
+        else:
+            site[2] += 1
+            return False
+
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+def setup(level=logging.INFO, stream=None, burst: int = 5, interval: float = 1.0):
+    """ Route all game logging through a queue to a background thread writing to stream (stderr by default) """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(logging.Formatter(FORMAT))
+
+    records = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(RateLimitFilter(burst, interval))
+
+    logger = logging.getLogger(ROOT_LOGGER)
+    logger.handlers = [queue_handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown():
+    """ Flush whatever is still queued, called automatically at exit """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(shutdown)
+
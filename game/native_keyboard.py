@@ -0,0 +1,105 @@
+import time
+from collections import deque
+
+from interfaces import IKeyboardManager
+
+
+# Key codes are GLFW's: printable keys are their (uppercase) ASCII code, the rest starts at 256
+KEY_CODES = 512
+
+NAMED_KEYS = {
+    32: 'space',
+    256: 'esc', 257: 'enter', 258: 'tab', 259: 'backspace', 260: 'insert', 261: 'delete',
+    262: 'right', 263: 'left', 264: 'down', 265: 'up', 266: 'page_up', 267: 'page_down', 268: 'home', 269: 'end',
+    **{290 + n: f"f{n + 1}" for n in range(12)},
+}
+
+# Same names as pynput's, so scenes don't care which input backend is used
+KEY_NAMES = [NAMED_KEYS.get(code, chr(code).lower() if 33 <= code <= 96 else None) for code in range(KEY_CODES)]
+CODES = {name: code for code, name in enumerate(KEY_NAMES) if name is not None}
+
+# GLUT delivers characters for printable keys and its own codes for the rest
+GLUT_CHARS = {b'\x1b': 256, b'\r': 257, b'\t': 258, b'\x08': 259, b'\x7f': 261}
+GLUT_SPECIAL = {
+    100: 263, 101: 265, 102: 262, 103: 264, 104: 266, 105: 267, 106: 268, 107: 269, 108: 260,
+    **{n + 1: 290 + n for n in range(12)},
+}
+
+PRESS = 1
+RELEASE = 0
+
+
+class NativeKeyboardManager(IKeyboardManager):
+    """ Keyboard input straight from the window system's key callbacks
+
+    The callbacks run on the main thread while the display manager polls events, and only append a timestamped
+    event to a queue: no listener thread, no locks. The queue is drained once per tick, on the scene's next() call,
+    into a preallocated key state array and the queue of press edges, so a key is seen as pressed for whole ticks.
+    """
+
+    def __init__(self):
+        self.state = bytearray(KEY_CODES)
+        self.events = deque()
+        self.presses = deque()
+        # When the key returned by the last next() call was pressed (perf_counter_ns)
+        self.last_timestamp = None
+
+    def push(self, code: int, action: int):
+        if 0 <= code < KEY_CODES and KEY_NAMES[code] is not None:
+            self.events.append((time.perf_counter_ns(), code, action))
+
+    def drain(self):
+        """ Apply every queued event to the key state, remembering the press edges """
+        events, state = self.events, self.state
+        while events:
+            event = events.popleft()
+            _, code, action = event
+            if action == PRESS and not state[code]:
+                self.presses.append(event)
+            state[code] = action
+
+    def next(self):
+        self.drain()
+        if not self.presses:
+            return None
+
+        self.last_timestamp, code, _ = self.presses.popleft()
+        return KEY_NAMES[code]
+
+    def is_pressed(self, key: str) -> bool:
+        code = CODES.get(key)
+        return code is not None and self.state[code] == PRESS
+
+    def get_keys(self):
+        return {KEY_NAMES[code] for code in range(KEY_CODES) if self.state[code]}
+
+    # GLFW: glfw.set_key_callback(window, keyboard.on_glfw_key)
+
+    def on_glfw_key(self, window, key: int, scancode: int, action: int, mods: int):
+        # GLFW_REPEAT (2) is a key that's still held, nothing changes
+        if action != 2:
+            self.push(key, PRESS if action == 1 else RELEASE)
+
+    # GLUT: glutKeyboardFunc/glutKeyboardUpFunc and glutSpecialFunc/glutSpecialUpFunc
+
+    @staticmethod
+    def glut_char_code(char: bytes) -> int:
+        code = GLUT_CHARS.get(char)
+        if code is None:
+            code = ord(char.upper()) if len(char) == 1 else -1
+        return code
+
+    def on_glut_key(self, char: bytes, x: int, y: int):
+        self.push(self.glut_char_code(char), PRESS)
+
+    def on_glut_key_up(self, char: bytes, x: int, y: int):
+        self.push(self.glut_char_code(char), RELEASE)
+
+    def on_glut_special(self, key: int, x: int, y: int):
+        self.push(GLUT_SPECIAL.get(key, -1), PRESS)
+
+    def on_glut_special_up(self, key: int, x: int, y: int):
+        self.push(GLUT_SPECIAL.get(key, -1), RELEASE)
+
+    def __repr__(self):
+        return f"<NativeKeyboardManager pending={len(self.events)}>"
@@ -0,0 +1,482 @@
+""" Local network multiplayer over UDP: an authoritative server and predicting clients
+
+The server runs the real scene (a VersusScene with both sides played from the network) and is the only one that
+decides what happens. Clients send their input every tick, each record stamped with a sequence number and the
+client's clock, and apply it to their own pad right away instead of waiting a round trip for it (prediction).
+Snapshots of the server's state say up to which input they include; the client puts its pad where the server
+has it and applies the inputs the server hasn't seen yet again on top (reconciliation).
+
+Packets, all little endian, start with magic, version and kind:
+
+    HELLO     client wants to play
+    WELCOME   side, seed, arena size and tick rate
+    INPUT     last snapshot tick received, then the last few input records (seq, time, pad move, pressed key)
+    SNAPSHOT  tick, baseline tick, last input seq and time processed, change mask, changed state words
+
+The state is a handful of 32 bit words. A snapshot only carries the words that differ from the baseline, the
+latest snapshot the client acknowledged (or all of them if there's none), so an idle pad or an unchanged score
+costs nothing. Inputs are repeated in a few consecutive packets, a lost one doesn't lose the input. Packets whose
+length doesn't add up are dropped, a stray or truncated datagram never stops the game.
+
+Everything also works over loopback: LossyChannel delays and drops outgoing packets to simulate a real network.
+"""
+
+import heapq
+import random
+import socket
+import struct
+import time
+from collections import deque
+
+from clock import FixedStepClock
+from interfaces import IKeyboardManager, IScene
+from log import get_logger
+from native_keyboard import CODES, KEY_CODES, KEY_NAMES
+
+
+logger = get_logger(__name__)
+
+MAGIC = b'PN'
+VERSION = 1
+
+PACKET = struct.Struct('<2sBB')
+WELCOME_BODY = struct.Struct('<BQHHH')
+INPUT_BODY = struct.Struct('<IB')
+INPUT_RECORD = struct.Struct('<IIbH')
+SNAPSHOT_BODY = struct.Struct('<IIIIH')
+WORD = struct.Struct('<I')
+
+HELLO = 1
+WELCOME = 2
+INPUT = 3
+SNAPSHOT = 4
+
+# Ball x, y, speed x, speed y, left and right pad y, left and right score, ball color and flags
+STATE = struct.Struct('<6f3I')
+STATE_WORDS = struct.Struct('<9I')
+ENDED = 1 << 24
+PAUSED = 1 << 25
+
+NO_BASELINE = 0xFFFFFFFF
+
+# Only these keys do something on the server, the rest (fullscreen, profiler, ...) stay local
+NET_KEYS = ('space', 'r')
+
+MAX_PACKET = 1024
+
+
+def pack_state(scene: IScene) -> bytes:
+    ball = scene.ball
+    flags = (ENDED if scene.ended else 0) | (PAUSED if scene.paused else 0)
+    return STATE.pack(ball.x, ball.y, ball.speed_x, ball.speed_y, scene.pad.y, scene.right_pad.y, *scene.scores,
+                      ball.color.packed | flags)
+
+
+def encode_delta(state: bytes, baseline: bytes = None) -> tuple:
+    """ (mask, changed words) of state against baseline, all words if there's no baseline """
+    words = STATE_WORDS.unpack(state)
+    if baseline is None:
+        return (1 << len(words)) - 1, words
+    mask = 0
+    changed = []
+    for index, (word, base) in enumerate(zip(words, STATE_WORDS.unpack(baseline))):
+        if word != base:
+            mask |= 1 << index
+            changed.append(word)
+    return mask, changed
+
+
+def decode_delta(mask: int, changed, baseline: bytes = None) -> bytes:
+    """ State from baseline and the changed words of encode_delta(), ValueError if they don't match the mask """
+    words = list(STATE_WORDS.unpack(baseline)) if baseline is not None else [0] * (STATE_WORDS.size // WORD.size)
+    if mask >> len(words) or bin(mask).count('1') != len(changed):
+        raise ValueError(f"mask {mask:#x} doesn't match {len(changed)} changed words")
+    changed = iter(changed)
+    for index in range(len(words)):
+        if mask & 1 << index:
+            words[index] = next(changed)
+    return STATE_WORDS.pack(*words)
+
+
+def millis() -> int:
+    return int(time.perf_counter() * 1000) & 0xFFFFFFFF
+
+
+class LossyChannel:
+    """ Sends UDP packets through a socket, optionally late or not at all, like a real network would
+
+    Latency and jitter are in seconds, loss is the probability of a packet getting dropped. Delayed packets go
+    out from pump(), to be called often (every tick).
+    """
+
+    def __init__(self, sock: socket.socket, latency: float = 0.0, jitter: float = 0.0, loss: float = 0.0,
+                 seed: int = None):
+        self.sock = sock
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.random = random.Random(seed)
+        self.queue = []
+        self.count = 0
+
+        self.sent = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+
+    def send(self, data: bytes, address):
+        self.sent += 1
+        if self.loss and self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        self.bytes_sent += len(data)
+        if not self.latency and not self.jitter:
+            self.sock.sendto(data, address)
+            return
+        due = time.perf_counter() + self.latency + self.random.uniform(0, self.jitter)
+        self.count += 1
+        heapq.heappush(self.queue, (due, self.count, data, address))
+
+    def pump(self):
+        now = time.perf_counter()
+        while self.queue and self.queue[0][0] <= now:
+            _, _, data, address = heapq.heappop(self.queue)
+            self.sock.sendto(data, address)
+
+    def receive(self):
+        """ Every packet waiting on the socket, as (data, address) """
+        while True:
+            try:
+                yield self.sock.recvfrom(MAX_PACKET)
+            except (BlockingIOError, ConnectionResetError):
+                return
+
+    def __repr__(self):
+        return f"<LossyChannel latency={self.latency} jitter={self.jitter} loss={self.loss}>"
+
+
+def open_socket(host: str, port: int = 0) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((host, port))
+    sock.setblocking(False)
+    return sock
+
+
+class NetKeyboard(IKeyboardManager):
+    """ The server scene's keyboard: each side's pad keys are held as that side's client says """
+
+    def __init__(self, side_keys: tuple):
+        # (up, down) key names per side
+        self.side_keys = side_keys
+        self.moves = [0, 0]
+        self.presses = deque()
+
+    def next(self):
+        return self.presses.popleft() if self.presses else None
+
+    def is_pressed(self, key: str) -> bool:
+        for (up, down), move in zip(self.side_keys, self.moves):
+            if key == up:
+                return move < 0
+            if key == down:
+                return move > 0
+        return False
+
+
+class RemotePlayer:
+    """ What the server knows about one client """
+
+    # Queued inputs past this many are dropped, oldest first, so a burst doesn't keep the client behind for good
+    MAX_QUEUE = 8
+
+    def __init__(self, address, side: int):
+        self.address = address
+        self.side = side
+        self.inputs = deque()
+        # Last input applied: (seq, time)
+        self.last_input = (0, 0)
+        self.acked_tick = NO_BASELINE
+        self.last_heard = time.perf_counter()
+
+    def add_input(self, seq: int, stamp: int, move: int, key: int):
+        newest = self.inputs[-1][0] if self.inputs else self.last_input[0]
+        if seq > newest:
+            self.inputs.append((seq, stamp, move, key))
+            while len(self.inputs) > RemotePlayer.MAX_QUEUE:
+                self.inputs.popleft()
+
+    def __repr__(self):
+        return f"<RemotePlayer {self.address} side={self.side}>"
+
+
+class NetServer:
+    """ Runs the scene for two clients, one input per client per tick, sending them snapshots """
+
+    # Snapshot every second tick, 60 per second at the default tick rate
+    SNAPSHOT_INTERVAL = 2
+    # Snapshots kept as delta baselines, that's about a second at 60 per second
+    HISTORY = 64
+    # Seconds of silence after which a client is dropped
+    TIMEOUT = 5.0
+
+    def __init__(self, scene: IScene, keyboard: NetKeyboard, channel: LossyChannel, width: int, height: int,
+                 tick_rate: int = FixedStepClock.TICK_RATE):
+        self.scene = scene
+        self.keyboard = keyboard
+        self.channel = channel
+        self.width = width
+        self.height = height
+        self.clock = FixedStepClock(tick_rate)
+
+        self.players = dict()
+        self.tick = 0
+        self.history = dict()
+
+        # For the bandwidth report
+        self.snapshots_sent = 0
+        self.snapshot_bytes = 0
+
+        scene.set_display_dimensions(width, height)
+
+    @property
+    def full(self) -> bool:
+        return len(self.players) == 2
+
+    def free_side(self) -> int:
+        taken = {player.side for player in self.players.values()}
+        return 0 if 0 not in taken else 1
+
+    def handle(self, data: bytes, address):
+        if len(data) < PACKET.size:
+            return
+        magic, version, kind = PACKET.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return
+
+        player = self.players.get(address)
+        if kind == HELLO:
+            if player is None:
+                if self.full:
+                    logger.info("%s: no room for %s", self, address)
+                    return
+                player = self.players[address] = RemotePlayer(address, self.free_side())
+                logger.info("%s: %s joined", self, player)
+            self.send(address, WELCOME, WELCOME_BODY.pack(player.side, self.scene.seed, self.width, self.height,
+                                                          self.clock.tick_rate))
+        elif kind == INPUT and player is not None:
+            player.last_heard = time.perf_counter()
+            acked_tick, count = INPUT_BODY.unpack_from(data, PACKET.size)
+            if len(data) != PACKET.size + INPUT_BODY.size + count * INPUT_RECORD.size:
+                logger.debug("%s: %d input records don't fit %d bytes from %s", self, count, len(data), address)
+                return
+            if acked_tick != NO_BASELINE and (player.acked_tick == NO_BASELINE or acked_tick > player.acked_tick):
+                player.acked_tick = acked_tick
+            offset = PACKET.size + INPUT_BODY.size
+            # Oldest first
+            for _ in range(count):
+                player.add_input(*INPUT_RECORD.unpack_from(data, offset))
+                offset += INPUT_RECORD.size
+
+    def send(self, address, kind: int, body: bytes):
+        self.channel.send(PACKET.pack(MAGIC, VERSION, kind) + body, address)
+
+    def poll(self):
+        for data, address in self.channel.receive():
+            try:
+                self.handle(data, address)
+            except (struct.error, ValueError) as e:
+                logger.debug("%s: dropped malformed packet from %s: %s", self, address, e)
+
+        now = time.perf_counter()
+        for address, player in list(self.players.items()):
+            if now - player.last_heard > NetServer.TIMEOUT:
+                logger.info("%s: %s timed out", self, player)
+                del self.players[address]
+
+    def apply_inputs(self):
+        keyboard = self.keyboard
+        for player in self.players.values():
+            if not player.inputs:
+                # Nothing arrived in time: keep doing what it did
+                continue
+            seq, stamp, move, key = player.inputs.popleft()
+            player.last_input = (seq, stamp)
+            keyboard.moves[player.side] = move
+            name = KEY_NAMES[key] if key < KEY_CODES else None
+            if name in NET_KEYS:
+                keyboard.presses.append(name)
+
+    def step(self):
+        """ One simulation tick, once both players are in """
+        if not self.full:
+            return
+        self.apply_inputs()
+        self.scene.update(self.clock.tick_time)
+        self.tick += 1
+
+        if self.tick % NetServer.SNAPSHOT_INTERVAL == 0:
+            self.send_snapshots()
+
+    def send_snapshots(self):
+        state = pack_state(self.scene)
+        self.history[self.tick] = state
+        self.history.pop(self.tick - NetServer.HISTORY * NetServer.SNAPSHOT_INTERVAL, None)
+
+        for player in self.players.values():
+            baseline = self.history.get(player.acked_tick)
+            mask, changed = encode_delta(state, baseline)
+            body = SNAPSHOT_BODY.pack(self.tick, player.acked_tick if baseline is not None else NO_BASELINE,
+                                      *player.last_input, mask) + b''.join(WORD.pack(word) for word in changed)
+            self.send(player.address, SNAPSHOT, body)
+            self.snapshots_sent += 1
+            self.snapshot_bytes += PACKET.size + len(body)
+
+    def update(self, frame_time: float):
+        """ Receive, run as many ticks as frame_time is worth, send whatever is due """
+        self.poll()
+        for _ in range(self.clock.advance(frame_time)):
+            self.step()
+        self.channel.pump()
+
+    def run(self, duration: float = None):
+        """ Serve in real time for duration seconds (forever if None) """
+        logger.info("%s: serving on %s:%d", self, *self.channel.sock.getsockname())
+        start = last = time.perf_counter()
+        try:
+            while duration is None or last - start < duration:
+                now = time.perf_counter()
+                self.update(now - last)
+                last = now
+                time.sleep(self.clock.tick_time / 4)
+        except KeyboardInterrupt:
+            logger.info("interrupted")
+        logger.info("%s: %d snapshots sent, %.1f bytes on average", self, self.snapshots_sent,
+                    self.snapshot_bytes / self.snapshots_sent if self.snapshots_sent else 0)
+
+    def __repr__(self):
+        return f"<NetServer players={len(self.players)} tick={self.tick}>"
+
+
+class NetClient:
+    """ The client's end of the connection: joins, sends input, decodes snapshots
+
+    Inputs not yet covered by a snapshot are kept in pending, for reconciliation.
+    """
+
+    # Each input packet repeats this many of the latest inputs
+    REDUNDANCY = 4
+    HELLO_INTERVAL = 0.25
+    HISTORY = 64
+    # Unacknowledged inputs kept for reconciliation (a second's worth), e.g. while the server waits for players
+    MAX_PENDING = 120
+
+    def __init__(self, channel: LossyChannel, server_address):
+        self.channel = channel
+        self.server = server_address
+
+        # From WELCOME
+        self.side = None
+        self.seed = None
+        self.width = None
+        self.height = None
+        self.tick_rate = None
+        self.last_hello = None
+
+        self.seq = 0
+        self.pending = deque()
+        # Received states by tick, the baselines of the next deltas
+        self.states = dict()
+        self.latest_tick = NO_BASELINE
+        # Latest snapshot: (tick, state bytes, last input seq the server applied)
+        self.snapshot = None
+        self.snapshot_time = None
+        self.rtt = 0.0
+
+        self.snapshots_received = 0
+        self.snapshots_dropped = 0
+
+    @property
+    def connected(self) -> bool:
+        return self.side is not None
+
+    def send(self, kind: int, body: bytes = b''):
+        self.channel.send(PACKET.pack(MAGIC, VERSION, kind) + body, self.server)
+
+    def hello(self):
+        now = time.perf_counter()
+        if self.last_hello is None or now - self.last_hello >= NetClient.HELLO_INTERVAL:
+            self.last_hello = now
+            self.send(HELLO)
+
+    def send_input(self, move: int, key: str = None) -> int:
+        """ Queue and send this tick's input, returns its sequence number """
+        self.seq += 1
+        code = CODES.get(key, 0) if key in NET_KEYS else 0
+        self.pending.append((self.seq, millis(), move, code))
+        while len(self.pending) > NetClient.MAX_PENDING:
+            self.pending.popleft()
+
+        records = list(self.pending)[-NetClient.REDUNDANCY:]
+        body = INPUT_BODY.pack(self.latest_tick, len(records)) + \
+            b''.join(INPUT_RECORD.pack(*record) for record in records)
+        self.send(INPUT, body)
+        return self.seq
+
+    def handle(self, data: bytes):
+        if len(data) < PACKET.size:
+            return None
+        magic, version, kind = PACKET.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return None
+
+        if kind == WELCOME and not self.connected:
+            self.side, self.seed, self.width, self.height, self.tick_rate = \
+                WELCOME_BODY.unpack_from(data, PACKET.size)
+            logger.info("%s: joined", self)
+        elif kind == SNAPSHOT:
+            self.handle_snapshot(data)
+
+    def handle_snapshot(self, data: bytes):
+        tick, baseline_tick, input_seq, input_time, mask = SNAPSHOT_BODY.unpack_from(data, PACKET.size)
+        if self.latest_tick != NO_BASELINE and tick <= self.latest_tick:
+            # Late, a newer one is already in
+            self.snapshots_dropped += 1
+            return
+
+        baseline = None
+        if baseline_tick != NO_BASELINE:
+            baseline = self.states.get(baseline_tick)
+            if baseline is None:
+                self.snapshots_dropped += 1
+                return
+
+        offset = PACKET.size + SNAPSHOT_BODY.size
+        changed = [word for (word,) in WORD.iter_unpack(data[offset:])]
+        state = decode_delta(mask, changed, baseline)
+
+        self.states[tick] = state
+        for old in [old for old in self.states if old <= tick - NetClient.HISTORY * NetServer.SNAPSHOT_INTERVAL]:
+            del self.states[old]
+        self.latest_tick = tick
+        self.snapshot = (tick, state, input_seq)
+        self.snapshot_time = time.perf_counter()
+        self.snapshots_received += 1
+        if input_seq:
+            self.rtt = ((millis() - input_time) & 0xFFFFFFFF) / 1000
+
+        # The server has these, no need to apply them again
+        while self.pending and self.pending[0][0] <= input_seq:
+            self.pending.popleft()
+
+    def poll(self) -> bool:
+        """ Handle everything received, returns whether there's a new snapshot """
+        tick = self.latest_tick
+        for data, address in self.channel.receive():
+            try:
+                self.handle(data)
+            except (struct.error, ValueError) as e:
+                logger.debug("%s: dropped malformed packet from %s: %s", self, address, e)
+        self.channel.pump()
+        return self.latest_tick != tick
+
+    def __repr__(self):
+        return f"<NetClient {self.server} side={self.side}>"
@@ -0,0 +1,103 @@
+import time
+
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class FramePacer:
+    """ Keeps frames on a fixed schedule of perf_counter_ns deadlines
+
+    Deadlines advance by exactly one frame period, so a frame that finished early or late doesn't shift the
+    following ones (no drift). Waiting is hybrid: time.sleep() for the bulk, since the OS may oversleep by a
+    millisecond or more, then yield in a loop for the last SPIN_NS. A target of 0 means unlimited.
+
+    With VSync, buffer swaps already block until the next refresh, sleeping on top of that would only make us miss
+    vblanks. So if VSync is enabled (or the driver forces it, which shows as swaps taking most of a refresh period)
+    the pacer only measures.
+    """
+
+    TARGETS = (60, 120, 144, 0)
+    DEFAULT_TARGET = 60
+
+    # Last part of the wait is spent spinning, OS sleep isn't precise enough for it
+    SPIN_NS = 1_500_000
+    # Late by more than this many frames: give up on catching up and restart the schedule from now
+    MAX_LATE_FRAMES = 2
+
+    # Swaps taking this fraction of the frame period on average mean they are synced to the display
+    VSYNC_DETECT_RATIO = 0.5
+    SWAP_SMOOTHING = 0.1
+
+    def __init__(self, target_fps: int = DEFAULT_TARGET, vsync: bool = False):
+        self.target_fps = 0
+        self.frame_ns = 0
+        self.vsync = vsync
+        self.vsync_detected = False
+        self.swap_ns = 0.0  # moving average of the buffer swap time
+
+        self.deadline = None
+        self.last_frame = None
+        self.frame_time = 0.0
+
+        self.set_target(target_fps)
+
+    def set_target(self, target_fps: int):
+        """ Frames per second to aim for, 0 for as many as possible """
+        self.target_fps = target_fps
+        self.frame_ns = 1_000_000_000 // target_fps if target_fps else 0
+        self.deadline = None
+        logger.info("%s: pacing set", self)
+
+    def swap_interval(self, refresh_rate: int) -> int:
+        """ Swap interval that gets closest to the target at the given display refresh rate (for VSync) """
+        if not self.vsync:
+            return 0
+        if not self.target_fps or not refresh_rate:
+            return 1
+        return max(1, round(refresh_rate / self.target_fps))
+
+    def record_swap(self, swap_ns: int):
+        """ Feed the duration of the last buffer swap, to notice swaps blocking on the display """
+        self.swap_ns += (swap_ns - self.swap_ns) * FramePacer.SWAP_SMOOTHING
+        if not self.frame_ns:
+            return
+
+        detected = self.swap_ns > self.frame_ns * FramePacer.VSYNC_DETECT_RATIO
+        if detected != self.vsync_detected:
+            logger.info("%s: swaps %s blocking on the display", self, "are" if detected else "no longer")
+            self.vsync_detected = detected
+
+    def wait(self) -> float:
+        """ Wait for the end of the current frame, returns the duration of the frame that just ended (seconds) """
+        now = time.perf_counter_ns()
+
+        if self.frame_ns and not (self.vsync or self.vsync_detected):
+            if self.deadline is None or now - self.deadline > self.frame_ns * FramePacer.MAX_LATE_FRAMES:
+                self.deadline = now + self.frame_ns
+            self.sleep_until(self.deadline)
+            self.deadline += self.frame_ns
+            now = time.perf_counter_ns()
+
+        self.frame_time = (now - self.last_frame) / 1e9 if self.last_frame is not None else 0.0
+        self.last_frame = now
+        return self.frame_time
+
+    def restart(self):
+        """ Start over from now after not rendering for a while, the time spent idle isn't counted as a frame """
+        self.deadline = None
+        self.last_frame = time.perf_counter_ns()
+
+    @staticmethod
+    def sleep_until(deadline: int):
+        remaining = deadline - time.perf_counter_ns()
+        if remaining > FramePacer.SPIN_NS:
+            time.sleep((remaining - FramePacer.SPIN_NS) / 1e9)
+
+        while time.perf_counter_ns() < deadline:
+            # Yield the rest of our time slice instead of burning it
+            time.sleep(0)
+
+    def __repr__(self):
+        return f"<FramePacer target={self.target_fps or 'unlimited'} vsync={self.vsync}>"
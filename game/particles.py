@@ -0,0 +1,186 @@
+import math
+
+import numpy
+
+from color import Color
+from renderer import QuadBatch
+
+
+class ParticleSystem:
+    """ Short-lived colored squares (trails, sparks, bursts), all in fixed-capacity NumPy arrays
+
+    Particles fly at constant acceleration, so only where and when they were spawned is stored: draw() works out
+    where they are at the time of the frame, in one vectorized pass, and update() only has to advance the clock.
+    Per tick that costs next to nothing however many particles there are, which matters since ticks run more often
+    than frames and the scenes' own tick is only a few microseconds of Python.
+
+    Spawning a few particles takes a couple dozen NumPy calls, whatever the count, so emit() only queues the request
+    and the queue is spawned in one pass by the next draw(). Live particles are always the first count entries of
+    the arrays: draw() also swap-removes the dead ones (the last live particles move into the holes). When nothing
+    gets drawn, update() does both once the arrays fill up. Nothing is allocated per particle.
+
+    Spawning is capped at spawn_rate particles per second (lower it on slow machines, 0 turns particles off),
+    anything over the cap or the capacity is silently not spawned.
+    """
+
+    CAPACITY = 65536
+    SPAWN_RATE = 50000
+    # Spawn budget saved up while idle, in seconds worth of spawn_rate, so a burst can go over the rate briefly
+    BURST_TIME = 0.1
+
+    # Rows of the data array, one column per particle: spawn position, speed and time, acceleration, lifetime, size
+    FIELDS = ('x', 'y', 'speed_x', 'speed_y', 'accel_y', 'born', 'life', 'size')
+    X, Y, SPEED_X, SPEED_Y, ACCEL_Y, BORN, LIFE, SIZE = range(len(FIELDS))
+
+    # Columns of a queued emit() request
+    REQUEST = ('x', 'y', 'dx', 'dy', 'count', 'speed', 'life', 'angle', 'spread', 'size', 'accel_y', 'born', 'r', 'g',
+               'b', 'a')
+    (REQ_X, REQ_Y, REQ_DX, REQ_DY, REQ_COUNT, REQ_SPEED, REQ_LIFE, REQ_ANGLE, REQ_SPREAD, REQ_SIZE, REQ_ACCEL_Y,
+     REQ_BORN, REQ_COLOR) = range(len(REQUEST) - 3)
+
+    def __init__(self, capacity: int = CAPACITY, spawn_rate: int = None, seed: int = None):
+        self.capacity = capacity
+        self.spawn_rate = ParticleSystem.SPAWN_RATE if spawn_rate is None else spawn_rate
+        self.budget = self.spawn_rate * ParticleSystem.BURST_TIME
+        self.count = 0
+        # emit() requests not spawned yet, and how many particles they add up to
+        self.queue = []
+        self.queued = 0
+        # Particle clock: seconds of updates so far, and the length of the last one (for interpolating in draw())
+        self.time = 0.0
+        self.dt = 0.0
+        # Particles only look random, they don't take anything from the scene's generator
+        self.rng = numpy.random.default_rng(seed)
+
+        # All the fields in one array, so moving a particle (swap-remove, spawn) is one copy for all of them.
+        # Float64 for the spawn times, ages stay precise however long the game runs.
+        self.data = numpy.zeros((len(ParticleSystem.FIELDS), capacity), dtype=numpy.float64)
+        for row, field in enumerate(ParticleSystem.FIELDS):
+            setattr(self, field, self.data[row])
+        self.colors = numpy.zeros((capacity, 4), dtype=numpy.uint8)
+
+        # Scratch buffers for draw()
+        self.rects = numpy.zeros((capacity, 4), dtype=numpy.float32)
+        self.draw_colors = numpy.zeros((capacity, 4), dtype=numpy.uint8)
+
+    def set_spawn_rate(self, spawn_rate: int):
+        self.spawn_rate = spawn_rate
+        self.budget = min(self.budget, spawn_rate * ParticleSystem.BURST_TIME)
+
+    def emit(self, x: float, y: float, count: int, speed: float, life: float, color: Color, angle: float = 0.0,
+             spread: float = 2 * math.pi, size: float = 4, accel_y: float = 0.0, dx: float = 0.0,
+             dy: float = 0.0) -> int:
+        """ Spawn up to count particles at x, y flying at about speed in directions within spread around angle
+
+        Speeds and lifetimes vary randomly by up to half. With dx, dy the particles are spread along the line from
+        x, y to x + dx, y + dy instead. Returns how many get spawned.
+        """
+        count = min(count, int(self.budget), self.capacity - len(self))
+        if count <= 0:
+            return 0
+        self.budget -= count
+
+        self.queue.append((x - size / 2, y - size / 2, dx, dy, count, speed, life, angle, spread, size, accel_y,
+                           self.time, *color.rgba_bytes))
+        self.queued += count
+        return count
+
+    def spawn_queued(self):
+        """ Spawn everything emit() queued, all requests at once """
+        if not self.queue:
+            return
+
+        # One column per particle, with the parameters of the request it came from
+        requests = numpy.array(self.queue)
+        params = numpy.repeat(requests, requests[:, ParticleSystem.REQ_COUNT].astype(numpy.intp), axis=0).T
+        count = self.queued
+        self.queue = []
+        self.queued = 0
+
+        angles, speeds, lives, along = self.rng.random((4, count))
+        angles -= 0.5
+        angles *= params[ParticleSystem.REQ_SPREAD]
+        angles += params[ParticleSystem.REQ_ANGLE]
+        speeds *= -0.5
+        speeds += 1
+        speeds *= params[ParticleSystem.REQ_SPEED]
+        lives *= -0.5
+        lives += 1
+        lives *= params[ParticleSystem.REQ_LIFE]
+
+        start, end = self.count, self.count + count
+        block = self.data[:, start:end]
+        block[ParticleSystem.X] = along * params[ParticleSystem.REQ_DX] + params[ParticleSystem.REQ_X]
+        block[ParticleSystem.Y] = along * params[ParticleSystem.REQ_DY] + params[ParticleSystem.REQ_Y]
+        block[ParticleSystem.SPEED_X] = numpy.cos(angles) * speeds
+        block[ParticleSystem.SPEED_Y] = numpy.sin(angles) * speeds
+        block[ParticleSystem.ACCEL_Y] = params[ParticleSystem.REQ_ACCEL_Y]
+        block[ParticleSystem.BORN] = params[ParticleSystem.REQ_BORN]
+        block[ParticleSystem.LIFE] = lives
+        block[ParticleSystem.SIZE] = params[ParticleSystem.REQ_SIZE]
+        self.colors[start:end] = params[ParticleSystem.REQ_COLOR:].T
+
+        self.count = end
+
+    def update(self, dt: float):
+        """ Advance the clock, that's all unless half the capacity is used up and nothing draws to clean up """
+        self.time += dt
+        self.dt = dt
+        self.budget = min(self.budget + self.spawn_rate * dt, self.spawn_rate * ParticleSystem.BURST_TIME)
+
+        if len(self) > self.capacity // 2:
+            self.spawn_queued()
+            self.remove_dead()
+
+    def remove_dead(self):
+        n = self.count
+        if not n:
+            return
+        dead = self.born[:n] + self.life[:n] <= self.time
+        dead_count = int(numpy.count_nonzero(dead))
+        if not dead_count:
+            return
+
+        # Swap-remove in bulk: live particles past the new end fill the holes before it
+        live_count = n - dead_count
+        holes = numpy.flatnonzero(dead[:live_count])
+        if len(holes):
+            movers = live_count + numpy.flatnonzero(~dead[live_count:])
+            self.data[:, holes] = self.data[:, movers]
+            self.colors[holes] = self.colors[movers]
+        self.count = live_count
+
+    def draw(self, batch: QuadBatch, alpha: float = 1.0):
+        """ Queue every live particle into a render batch, where it is alpha of the way through the last tick """
+        self.spawn_queued()
+        self.remove_dead()
+        n = self.count
+        if not n:
+            return
+
+        # Spawned during the last tick: they stay put until the frame catches up with them
+        age = numpy.maximum(self.time - (1 - alpha) * self.dt - self.born[:n], 0)
+
+        rects = self.rects[:n]
+        rects[:, 0] = self.speed_x[:n] * age + self.x[:n]
+        rects[:, 1] = (self.accel_y[:n] * 0.5 * age + self.speed_y[:n]) * age + self.y[:n]
+        rects[:, 2] = self.size[:n]
+        rects[:, 3] = self.size[:n]
+
+        colors = self.draw_colors[:n]
+        colors[:, :3] = self.colors[:n, :3]
+        colors[:, 3] = self.colors[:n, 3] * numpy.clip(1 - age / self.life[:n], 0, 1)
+
+        batch.add_rects(rects, colors)
+
+    def clear(self):
+        self.count = 0
+        self.queue = []
+        self.queued = 0
+
+    def __len__(self):
+        """ Live particles, spawned or still queued """
+        return self.count + self.queued
+
+    def __repr__(self):
+        return f"<ParticleSystem count={self.count} capacity={self.capacity}>"
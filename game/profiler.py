@@ -0,0 +1,186 @@
+import csv
+import time
+
+import numpy
+
+from color import Color
+from log import get_logger
+
+logger = get_logger(__name__)
+
+
+class Scope:
+    """ Times one named phase, reused for every frame so entering a scope allocates nothing """
+
+    __slots__ = ('profiler', 'column', 'start')
+
+    def __init__(self, profiler, column: int):
+        self.profiler = profiler
+        self.column = column
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        # Phases can be entered several times per frame (e.g. one scene update per simulation tick), they add up
+        self.profiler.current[self.column] += (time.perf_counter_ns() - self.start) / 1e6
+        return False
+
+
+class NullProfiler:
+    """ Stand-in when no profiling is wanted, every scope is a no-op """
+
+    class NullScope:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    SCOPE = NullScope()
+
+    overlay = False
+
+    def scope(self, name: str):
+        return NullProfiler.SCOPE
+
+    def begin_frame(self):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def toggle_overlay(self):
+        pass
+
+    def draw_overlay(self, width: int, height: int):
+        pass
+
+
+class FrameProfiler:
+    """ Per-phase frame timings (milliseconds) in fixed size ring buffers
+
+    Display managers time their own phases (event poll, scene update, draw, buffer swap, sleep), scenes can add
+    their own with `with profiler.scope("collisions"): ...`. Column 0 is always the whole frame. Keeps the last
+    CAPACITY frames for percentile stats, plus a copy of the worst frame seen so far.
+    """
+
+    CAPACITY = 1024
+    MAX_PHASES = 32
+    FRAME = "frame"
+
+    OVERLAY_REFRESH = 0.5
+    OVERLAY_X = 25
+    OVERLAY_Y = 150
+    OVERLAY_FONT_SIZE = 16
+    OVERLAY_COLOR = Color(255, 200, 0)
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self.samples = numpy.zeros((capacity, FrameProfiler.MAX_PHASES), dtype=numpy.float64)
+        self.current = numpy.zeros(FrameProfiler.MAX_PHASES, dtype=numpy.float64)
+        self.worst = numpy.zeros(FrameProfiler.MAX_PHASES, dtype=numpy.float64)
+
+        self.phases = [FrameProfiler.FRAME]
+        self.scopes = dict()
+        self.frames = 0  # total frames recorded, the ring position is frames % capacity
+        self.frame_start = None
+
+        self.overlay = False
+        self.overlay_text = ""
+        self.overlay_updated = 0
+        self.overlay_batch = None
+
+    def scope(self, name: str) -> Scope:
+        scope = self.scopes.get(name)
+        if scope is None:
+            if len(self.phases) == FrameProfiler.MAX_PHASES:
+                raise ValueError(f"Too many profiler phases, can't add {name}")
+            self.phases.append(name)
+            scope = self.scopes[name] = Scope(self, len(self.phases) - 1)
+        return scope
+
+    def begin_frame(self):
+        self.current[:] = 0
+        self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+
+        self.current[0] = (time.perf_counter_ns() - self.frame_start) / 1e6
+        self.samples[self.frames % self.capacity] = self.current
+        if self.current[0] > self.worst[0]:
+            self.worst[:] = self.current
+        self.frames += 1
+
+    def recorded(self) -> numpy.ndarray:
+        """ Recorded frames, oldest first """
+        if self.frames < self.capacity:
+            return self.samples[:self.frames, :len(self.phases)]
+        start = self.frames % self.capacity
+        return numpy.roll(self.samples, -start, axis=0)[:, :len(self.phases)]
+
+    def stats(self) -> dict:
+        """ {phase: {'p50', 'p95', 'p99', 'max', 'worst_frame'}} over the recorded frames, in milliseconds """
+        samples = self.recorded()
+        if not len(samples):
+            return dict()
+
+        percentiles = numpy.percentile(samples, [50, 95, 99], axis=0)
+        maximum = samples.max(axis=0)
+        return {
+            phase: {
+                'p50': float(percentiles[0, column]),
+                'p95': float(percentiles[1, column]),
+                'p99': float(percentiles[2, column]),
+                'max': float(maximum[column]),
+                # What this phase took in the slowest frame so far: where the spike came from
+                'worst_frame': float(self.worst[column]),
+            }
+            for column, phase in enumerate(self.phases)
+        }
+
+    def report(self) -> str:
+        lines = [f"{'phase':<12}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'worst':>8}"]
+        for phase, stat in self.stats().items():
+            lines.append(f"{phase:<12}{stat['p50']:8.2f}{stat['p95']:8.2f}{stat['p99']:8.2f}{stat['max']:8.2f}"
+                         f"{stat['worst_frame']:8.2f}")
+        return "\n".join(lines)
+
+    def dump_csv(self, filename: str):
+        """ Write every recorded frame, one column per phase (milliseconds) """
+        with open(filename, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.phases)
+            writer.writerows(self.recorded().tolist())
+        logger.info("dumped %d frames to %s", min(self.frames, self.capacity), filename)
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+
+    def draw_overlay(self, width: int, height: int):
+        """ Draw the stats table on screen (if toggled on), refreshed a couple of times a second """
+        if not self.overlay:
+            return
+
+        if self.overlay_batch is None:
+            # Only needed with a GL context, headless runs never get here
+            from hud import Hud
+            from text import TextBatch
+            self.overlay_batch = TextBatch(Hud.get_atlas(FrameProfiler.OVERLAY_FONT_SIZE))
+
+        now = time.monotonic()
+        if now - self.overlay_updated >= FrameProfiler.OVERLAY_REFRESH:
+            self.overlay_text = self.report()
+            self.overlay_updated = now
+
+        self.overlay_batch.begin()
+        self.overlay_batch.add_text(self.overlay_text, FrameProfiler.OVERLAY_X, FrameProfiler.OVERLAY_Y,
+                                    FrameProfiler.OVERLAY_COLOR)
+        self.overlay_batch.flush(width, height)
+
+    def __repr__(self):
+        return f"<FrameProfiler frames={self.frames} phases={len(self.phases)}>"
@@ -0,0 +1,332 @@
+""" Rendering at an internal resolution other than the window's
+
+The scene is drawn into an offscreen framebuffer (RenderTarget), which is then drawn scaled up onto the window.
+ResolutionScaler picks the internal resolution from how long the GPU takes for the scene (measured by GpuTimer), so
+big windows (e.g. fullscreen on a 4K display) still hold the target frame rate. ScaledOutput puts them together for
+the display managers, optionally with a fixed virtual resolution: then the scene always gets the same dimensions,
+whatever the window size, and is letterboxed into the window.
+"""
+
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+# Imported on first use, same as in the renderer
+gl = None
+shaders = None
+
+
+def load_gl():
+    global gl, shaders
+    if gl is None:
+        import OpenGL.GL
+        import OpenGL.GL.shaders
+        gl = OpenGL.GL
+        shaders = OpenGL.GL.shaders
+
+
+def fit(width: int, height: int, aspect_width: int, aspect_height: int) -> tuple:
+    """ Largest (x, y, width, height) rectangle with the given aspect ratio, centered in width x height """
+    scale = min(width / aspect_width, height / aspect_height)
+    fit_width = max(1, round(aspect_width * scale))
+    fit_height = max(1, round(aspect_height * scale))
+    return (width - fit_width) // 2, (height - fit_height) // 2, fit_width, fit_height
+
+
+class ResolutionScaler:
+    """ Internal resolution as a fraction (scale) of the output size, adjusted to the measured GPU time
+
+    The GPU time of the scene is smoothed, and compared to the frame budget of the target frame rate once the
+    current scale has been measured for SETTLE_FRAMES frames: above HIGH of the budget the scale goes one STEP
+    down, below LOW one STEP up. Pixel count goes with the square of the scale, the gap between LOW and HIGH is
+    wide enough that a step up doesn't land above HIGH right away. With a fixed scale it never changes.
+    """
+
+    MIN_SCALE = 0.5
+    MAX_SCALE = 1.0
+    STEP = 0.1
+
+    HIGH = 0.8
+    LOW = 0.5
+    SMOOTHING = 0.1
+    SETTLE_FRAMES = 30
+
+    # Frame budget to aim for when the frame rate is unlimited
+    DEFAULT_FPS = 60
+
+    def __init__(self, target_fps: int, scale: float = None):
+        self.auto = scale is None
+        self.scale = ResolutionScaler.MAX_SCALE if scale is None else scale
+        self.budget = 1 / (target_fps or ResolutionScaler.DEFAULT_FPS)
+        self.average = 0.0
+        self.frames = 0
+
+    def record(self, gpu_time: float):
+        """ Feed the GPU time of one frame's scene pass, in seconds """
+        if not self.auto:
+            return
+
+        self.frames += 1
+        if self.frames == 1:
+            self.average = gpu_time
+        else:
+            self.average += (gpu_time - self.average) * ResolutionScaler.SMOOTHING
+        if self.frames < ResolutionScaler.SETTLE_FRAMES:
+            return
+
+        load = self.average / self.budget
+        if load > ResolutionScaler.HIGH and self.scale > ResolutionScaler.MIN_SCALE:
+            self.set_scale(max(self.scale - ResolutionScaler.STEP, ResolutionScaler.MIN_SCALE), load)
+        elif load < ResolutionScaler.LOW and self.scale < ResolutionScaler.MAX_SCALE:
+            self.set_scale(min(self.scale + ResolutionScaler.STEP, ResolutionScaler.MAX_SCALE), load)
+
+    def set_scale(self, scale: float, load: float):
+        logger.info("%s: GPU at %.0f%% of the frame budget, scale %.2f -> %.2f", self, load * 100, self.scale, scale)
+        self.scale = round(scale, 2)
+        self.frames = 0
+
+    def size(self, width: int, height: int) -> tuple:
+        """ Internal resolution for an output of width x height """
+        return max(1, round(width * self.scale)), max(1, round(height * self.scale))
+
+    def __repr__(self):
+        return f"<ResolutionScaler scale={self.scale:.2f} auto={self.auto}>"
+
+
+class GpuTimer:
+    """ GPU time of the drawing between begin() and end(), measured with timer queries
+
+    Query results are collected a few frames later, once available, so we never wait for the GPU: timings() returns
+    the ones that came in. Frames that find all queries still running aren't measured.
+    """
+
+    # Timer queries in flight at most, results usually come back 1-2 frames later
+    QUERIES = 4
+
+    def __init__(self):
+        # Queries are created on first use, we may not have a context yet
+        self.free_queries = None
+        self.running_queries = []
+        self.query = None
+        self.gpu_times = []
+
+    def begin(self):
+        if self.free_queries is None:
+            load_gl()
+            self.free_queries = list(gl.glGenQueries(GpuTimer.QUERIES))
+
+        self.collect_queries()
+        if self.free_queries:
+            self.query = self.free_queries.pop()
+            gl.glBeginQuery(gl.GL_TIME_ELAPSED, self.query)
+
+    def end(self):
+        if self.query is not None:
+            gl.glEndQuery(gl.GL_TIME_ELAPSED)
+            self.running_queries.append(self.query)
+            self.query = None
+
+    def collect_queries(self):
+        """ Read back the timer queries that finished, oldest first, without waiting for the others """
+        while self.running_queries:
+            query = self.running_queries[0]
+            if not int(gl.glGetQueryObjectiv(query, gl.GL_QUERY_RESULT_AVAILABLE)):
+                break
+            self.gpu_times.append(int(gl.glGetQueryObjectui64v(query, gl.GL_QUERY_RESULT)) / 1e9)
+            self.free_queries.append(self.running_queries.pop(0))
+
+    def timings(self) -> list:
+        """ GPU seconds of the frames whose timer query results came in since the last call """
+        gpu_times = self.gpu_times
+        self.gpu_times = []
+        return gpu_times
+
+    def __repr__(self):
+        return f"<GpuTimer running={len(self.running_queries)}>"
+
+
+class RenderTarget:
+    """ Offscreen framebuffer with a color texture, drawn onto the window scaled with linear filtering
+
+    Usage, once per frame:
+
+        target.begin(width, height)     # drawing goes into a width x height texture from here
+        scene.draw(alpha)
+        target.end(x, y, width, height) # and the texture into this rectangle of the window
+
+    With samples, drawing goes into a multisampled renderbuffer instead, which end() resolves into the texture.
+    """
+
+    VERTEX_SHADER = """
+        #version 330 core
+        out vec2 uv;
+
+        void main() {
+            // One triangle covering the whole viewport, made up from the vertex index: no vertex buffer needed
+            uv = vec2((gl_VertexID << 1) & 2, gl_VertexID & 2);
+            gl_Position = vec4(uv * 2.0 - 1.0, 0.0, 1.0);
+        }
+    """
+
+    FRAGMENT_SHADER = """
+        #version 330 core
+        in vec2 uv;
+        uniform sampler2D image;
+        out vec4 out_color;
+
+        void main() {
+            out_color = texture(image, uv);
+        }
+    """
+
+    def __init__(self, samples: int = 0):
+        self.width = 0
+        self.height = 0
+        self.samples = samples
+
+        # GL objects are created on first use, we may not have a context yet
+        self.program = None
+        self.image_location = None
+        self.vao = None
+        self.framebuffer = None
+        self.texture = None
+        self.multisample_framebuffer = None
+        self.renderbuffer = None
+
+    def init_gl(self):
+        load_gl()
+        self.program = shaders.compileProgram(
+            shaders.compileShader(self.VERTEX_SHADER, gl.GL_VERTEX_SHADER),
+            shaders.compileShader(self.FRAGMENT_SHADER, gl.GL_FRAGMENT_SHADER),
+            validate=False
+        )
+        self.image_location = gl.glGetUniformLocation(self.program, "image")
+        # Core profile can't draw without a VAO, even with no vertex attributes
+        self.vao = gl.glGenVertexArrays(1)
+
+        self.framebuffer = gl.glGenFramebuffers(1)
+        self.texture = gl.glGenTextures(1)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+        if self.samples:
+            self.samples = min(self.samples, int(gl.glGetIntegerv(gl.GL_MAX_SAMPLES)))
+            self.multisample_framebuffer = gl.glGenFramebuffers(1)
+            self.renderbuffer = gl.glGenRenderbuffers(1)
+
+    def resize(self, width: int, height: int):
+        logger.info("%s: resizing to %dx%d", self, width, height)
+        self.width = width
+        self.height = height
+
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_RGBA8, width, height, 0, gl.GL_RGBA, gl.GL_UNSIGNED_BYTE, None)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.framebuffer)
+        gl.glFramebufferTexture2D(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_TEXTURE_2D, self.texture, 0)
+        self.check_framebuffer()
+
+        if self.renderbuffer is not None:
+            gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, self.renderbuffer)
+            gl.glRenderbufferStorageMultisample(gl.GL_RENDERBUFFER, self.samples, gl.GL_RGBA8, width, height)
+            gl.glBindRenderbuffer(gl.GL_RENDERBUFFER, 0)
+
+            gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.multisample_framebuffer)
+            gl.glFramebufferRenderbuffer(gl.GL_FRAMEBUFFER, gl.GL_COLOR_ATTACHMENT0, gl.GL_RENDERBUFFER,
+                                         self.renderbuffer)
+            self.check_framebuffer()
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+
+    def check_framebuffer(self):
+        status = gl.glCheckFramebufferStatus(gl.GL_FRAMEBUFFER)
+        if status != gl.GL_FRAMEBUFFER_COMPLETE:
+            logger.error("%s: framebuffer incomplete (status 0x%x)", self, status)
+
+    def begin(self, width: int, height: int):
+        """ Send drawing into the offscreen texture, resized to width x height if needed, cleared """
+        if self.program is None:
+            self.init_gl()
+        if (width, height) != (self.width, self.height):
+            self.resize(width, height)
+
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, self.multisample_framebuffer or self.framebuffer)
+        gl.glViewport(0, 0, width, height)
+        gl.glClear(gl.GL_COLOR_BUFFER_BIT)
+
+    def end(self, x: int, y: int, width: int, height: int):
+        """ Back to drawing on the window, and draw the texture into the given rectangle of it """
+        if self.multisample_framebuffer is not None:
+            # Resolve the samples into the texture
+            gl.glBindFramebuffer(gl.GL_READ_FRAMEBUFFER, self.multisample_framebuffer)
+            gl.glBindFramebuffer(gl.GL_DRAW_FRAMEBUFFER, self.framebuffer)
+            gl.glBlitFramebuffer(0, 0, self.width, self.height, 0, 0, self.width, self.height,
+                                 gl.GL_COLOR_BUFFER_BIT, gl.GL_NEAREST)
+
+        gl.glBindFramebuffer(gl.GL_FRAMEBUFFER, 0)
+        gl.glViewport(x, y, width, height)
+
+        # Already blended once when drawn into the texture, so just copy it
+        gl.glDisable(gl.GL_BLEND)
+        gl.glUseProgram(self.program)
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture)
+        gl.glUniform1i(self.image_location, 0)
+        gl.glBindVertexArray(self.vao)
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, 3)
+
+        gl.glBindVertexArray(0)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+        gl.glUseProgram(0)
+        gl.glEnable(gl.GL_BLEND)
+
+    def __repr__(self):
+        return f"<RenderTarget {self.width}x{self.height} samples={self.samples}>"
+
+
+class ScaledOutput:
+    """ How the display managers get a scene on the window, directly or through a RenderTarget
+
+    Without a virtual resolution, while the scale is 1, the scene is drawn straight to the window: that keeps the
+    window's multisampling and saves a full-screen copy. Otherwise it goes through the render target at the
+    scaler's resolution, multisampled with the given number of samples. The scene's dimensions are the window's,
+    or the virtual resolution (then the window only decides how big it gets on screen). With an automatic scale,
+    the scene pass is timed either way.
+    """
+
+    def __init__(self, target_fps: int, scale: float = None, virtual_size: tuple = None, samples: int = 0):
+        self.scaler = ResolutionScaler(target_fps, scale)
+        self.virtual_size = virtual_size
+        self.target = RenderTarget(samples) if virtual_size or self.scaler.auto or self.scaler.scale != 1 else None
+        self.timer = GpuTimer() if self.scaler.auto else None
+
+    def scene_size(self, window_width: int, window_height: int) -> tuple:
+        return self.virtual_size or (window_width, window_height)
+
+    def draw(self, scene, alpha: float, window_width: int, window_height: int):
+        load_gl()
+        direct = self.virtual_size is None and self.scaler.scale == 1
+        if self.timer is not None:
+            self.timer.begin()
+
+        if direct:
+            gl.glViewport(0, 0, window_width, window_height)
+        else:
+            x, y, width, height = fit(window_width, window_height, *self.scene_size(window_width, window_height))
+            self.target.begin(*self.scaler.size(width, height))
+        scene.draw(alpha)
+
+        if self.timer is not None:
+            self.timer.end()
+            for gpu_time in self.timer.timings():
+                self.scaler.record(gpu_time)
+        if not direct:
+            self.target.end(x, y, width, height)
+
+    def __repr__(self):
+        return f"<ScaledOutput virtual={self.virtual_size} {self.scaler}>"
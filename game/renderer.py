@@ -0,0 +1,193 @@
+import ctypes
+
+import numpy
+
+from color import Color
+
+
+# PyOpenGL takes a while to import, it's only loaded once something actually gets drawn (never in headless runs)
+gl = None
+shaders = None
+
+
+def load_gl():
+    global gl, shaders
+    if gl is None:
+        import OpenGL.GL
+        import OpenGL.GL.shaders
+        gl = OpenGL.GL
+        shaders = OpenGL.GL.shaders
+
+
+class QuadBatch:
+    """ Collects colored rectangles into one NumPy vertex buffer and draws all of them with a single call
+
+    Usage, once per frame:
+
+        batch.begin()
+        batch.add_rect(x, y, width, height, color)   # or add_rects() with whole arrays
+        batch.flush(window_width, window_height)
+
+    Only uses core profile features (VAO, VBO, shaders), coordinates are in window pixels with the
+    origin in the top left corner, same as the old glOrtho() setup.
+    """
+
+    INITIAL_CAPACITY = 256
+
+    VERTEX_SHADER = """
+        #version 330 core
+        layout(location = 0) in vec2 position;
+        layout(location = 1) in vec4 color;
+        uniform vec2 viewport;
+        out vec4 frag_color;
+
+        void main() {
+            gl_Position = vec4(position.x * 2.0 / viewport.x - 1.0, 1.0 - position.y * 2.0 / viewport.y, 0.0, 1.0);
+            frag_color = color;
+        }
+    """
+
+    FRAGMENT_SHADER = """
+        #version 330 core
+        in vec4 frag_color;
+        out vec4 out_color;
+
+        void main() {
+            out_color = frag_color;
+        }
+    """
+
+    # Interleaved vertex layout uploaded to the GPU: 2 floats for position + 4 normalized bytes for RGBA
+    VERTEX_DTYPE = numpy.dtype([('position', numpy.float32, 2), ('color', numpy.uint8, 4)])
+
+    # Two triangles per quad: which corner (x offset, y offset) every one of the 6 vertices uses
+    CORNERS = numpy.array([[0, 0], [1, 0], [1, 1], [0, 0], [1, 1], [0, 1]], dtype=numpy.float32)
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.count = 0
+        self.rects = None
+        self.colors = None
+        self.vertices = None
+        self.resize(capacity)
+
+        # GL objects are created on first flush, we may not have a context yet
+        self.program = None
+        self.vao = None
+        self.vbo = None
+        self.viewport_location = None
+
+    def resize(self, capacity: int):
+        """ (Re)allocate the CPU side buffers, keeping whatever is already queued """
+        rects = numpy.zeros((capacity, 4), dtype=numpy.float32)
+        colors = numpy.zeros((capacity, 4), dtype=numpy.uint8)
+        if self.rects is not None:
+            rects[:self.count] = self.rects[:self.count]
+            colors[:self.count] = self.colors[:self.count]
+
+        self.rects = rects
+        self.colors = colors
+        self.vertices = numpy.zeros(capacity * 6, dtype=self.VERTEX_DTYPE)
+        self.capacity = capacity
+
+    def reserve(self, count: int):
+        if self.count + count > self.capacity:
+            self.resize(max(self.capacity * 2, self.count + count))
+
+    def begin(self):
+        self.count = 0
+
+    def add_rect(self, x: float, y: float, width: float, height: float, color: Color, alpha: int = 255):
+        self.reserve(1)
+        self.rects[self.count] = (x, y, width, height)
+        self.colors[self.count] = color.rgba(alpha)
+        self.count += 1
+
+    def add_rects(self, rects: numpy.ndarray, colors: numpy.ndarray):
+        """ Queue many rectangles at once: rects is (N, 4) x/y/width/height, colors is (N, 4) RGBA bytes """
+        n = len(rects)
+        self.reserve(n)
+        self.rects[self.count:self.count + n] = rects
+        self.colors[self.count:self.count + n] = colors
+        self.count += n
+
+    def build_vertices(self) -> numpy.ndarray:
+        """ Expand the queued rectangles into triangle vertices, returns the used part of the vertex buffer """
+        n = self.count
+        rects = self.rects[:n]
+        left, top = rects[:, 0], rects[:, 1]
+        right = left + rects[:, 2]
+        bottom = top + rects[:, 3]
+
+        # Every vertex field is 4 bytes wide, so the buffer can be filled as a (quad, vertex, word) array, one
+        # column of all quads at a time. Much faster than broadcasting into the structured fields.
+        words = self.vertices[:n * 6].view(numpy.float32).reshape(n, 6, self.VERTEX_DTYPE.itemsize // 4)
+        x = self.VERTEX_DTYPE.fields['position'][1] // 4
+        for vertex, (corner_x, corner_y) in enumerate(QuadBatch.CORNERS):
+            words[:, vertex, x] = right if corner_x else left
+            words[:, vertex, x + 1] = bottom if corner_y else top
+        words.view(numpy.uint32)[:, :, self.VERTEX_DTYPE.fields['color'][1] // 4] = self.colors[:n].view(numpy.uint32)
+
+        return self.vertices[:n * 6]
+
+    def init_gl(self):
+        load_gl()
+        self.program = shaders.compileProgram(
+            shaders.compileShader(self.VERTEX_SHADER, gl.GL_VERTEX_SHADER),
+            shaders.compileShader(self.FRAGMENT_SHADER, gl.GL_FRAGMENT_SHADER),
+            validate=False
+        )
+        self.viewport_location = gl.glGetUniformLocation(self.program, "viewport")
+
+        self.vao = gl.glGenVertexArrays(1)
+        self.vbo = gl.glGenBuffers(1)
+
+        gl.glBindVertexArray(self.vao)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        self.setup_attributes()
+        gl.glBindVertexArray(0)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+
+    def setup_attributes(self):
+        """ Describe VERTEX_DTYPE to the currently bound VAO """
+        stride = self.VERTEX_DTYPE.itemsize
+        gl.glEnableVertexAttribArray(0)
+        gl.glVertexAttribPointer(0, 2, gl.GL_FLOAT, gl.GL_FALSE, stride,
+                                 ctypes.c_void_p(self.VERTEX_DTYPE.fields['position'][1]))
+        gl.glEnableVertexAttribArray(1)
+        gl.glVertexAttribPointer(1, 4, gl.GL_UNSIGNED_BYTE, gl.GL_TRUE, stride,
+                                 ctypes.c_void_p(self.VERTEX_DTYPE.fields['color'][1]))
+
+    def bind(self):
+        """ Set up any extra GL state (textures, blending) the batch needs, called with the program in use """
+        pass
+
+    def unbind(self):
+        pass
+
+    def flush(self, width: int, height: int):
+        """ Upload everything queued since begin() and draw it in one call """
+        if not self.count:
+            return
+
+        if self.program is None:
+            self.init_gl()
+
+        vertices = self.build_vertices()
+
+        gl.glUseProgram(self.program)
+        gl.glUniform2f(self.viewport_location, width, height)
+        self.bind()
+
+        gl.glBindVertexArray(self.vao)
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, self.vbo)
+        # Orphan and refill the whole buffer, the driver can keep using last frame's copy meanwhile
+        gl.glBufferData(gl.GL_ARRAY_BUFFER, vertices.nbytes, vertices, gl.GL_STREAM_DRAW)
+        gl.glDrawArrays(gl.GL_TRIANGLES, 0, len(vertices))
+
+        self.unbind()
+        gl.glBindBuffer(gl.GL_ARRAY_BUFFER, 0)
+        gl.glBindVertexArray(0)
+        gl.glUseProgram(0)
+
+    def __repr__(self):
+        return f"<QuadBatch count={self.count} capacity={self.capacity}>"
@@ -0,0 +1,236 @@
+""" Deterministic input recording and replay
+
+A scene seeded with a known value and fed the same input on the same ticks plays out exactly the same, so a
+recording only needs the seed plus what changed in the input, tick by tick:
+
+    header   magic, version, seed, window size, tick rate, scene name and parameter
+    records  tick, kind, two 16 bit arguments (plus a 64 bit state hash for checkpoints and the end record)
+
+Kinds are a press edge (what next() returned), a held key going up or down (what is_pressed() returned), a window
+resize and a checkpoint with the hash of the scene's state_bytes(). Idle ticks cost nothing.
+
+InputRecorder wraps the live keyboard manager and relies on scenes calling next() once at the start of every tick
+(which they all do, that's where a tick's input is drained). Replayer runs the log through a ReplayKeyboard as
+fast as possible, without rendering, and raises ReplayDivergence on the first checkpoint that doesn't match.
+"""
+
+import hashlib
+import struct
+import time
+
+from clock import FixedStepClock
+from interfaces import IKeyboardManager, IScene
+from log import get_logger
+from native_keyboard import CODES, KEY_NAMES
+
+
+logger = get_logger(__name__)
+
+MAGIC = b'POIR'
+VERSION = 1
+
+HEADER = struct.Struct('<4sBQHHHI16s')
+RECORD = struct.Struct('<IBHH')
+HASH = struct.Struct('<Q')
+
+PRESS = 1
+HOLD = 2
+RESIZE = 3
+CHECKPOINT = 4
+END = 5
+
+CHECKPOINT_INTERVAL = 120
+
+
+class ReplayDivergence(Exception):
+    pass
+
+
+def state_hash(scene: IScene) -> int:
+    return HASH.unpack(hashlib.blake2b(scene.state_bytes(), digest_size=HASH.size).digest())[0]
+
+
+class ReplayLog:
+    """ A parsed recording: header fields and the list of (tick, kind, a, b, hash) records """
+
+    def __init__(self, seed: int, width: int, height: int, tick_rate: int, scene: str, scene_param: int,
+                 records: list):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.tick_rate = tick_rate
+        self.scene = scene
+        self.scene_param = scene_param
+        self.records = records
+
+    @property
+    def ticks(self) -> int:
+        return self.records[-1][0] if self.records else 0
+
+    @staticmethod
+    def load(filename: str):
+        with open(filename, 'rb') as f:
+            data = f.read()
+
+        magic, version, seed, width, height, tick_rate, scene_param, scene = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filename} is not a version {VERSION} replay")
+
+        records = []
+        offset = HEADER.size
+        while offset < len(data):
+            tick, kind, a, b = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            digest = None
+            if kind in (CHECKPOINT, END):
+                digest, = HASH.unpack_from(data, offset)
+                offset += HASH.size
+            records.append((tick, kind, a, b, digest))
+
+        if not records or records[-1][1] != END:
+            logger.warning("%s is truncated, replaying what's there", filename)
+
+        return ReplayLog(seed, width, height, tick_rate, scene.rstrip(b'\0').decode('ascii'), scene_param, records)
+
+    def __repr__(self):
+        return f"<ReplayLog {self.scene} seed={self.seed} ticks={self.ticks} records={len(self.records)}>"
+
+
+class InputRecorder(IKeyboardManager):
+    """ Passes everything through to the real keyboard manager, writing the answers to a replay log """
+
+    def __init__(self, keyboard_manager: IKeyboardManager, filename: str, scene_name: str, scene_param: int = 0,
+                 tick_rate: int = FixedStepClock.TICK_RATE, checkpoint_interval: int = CHECKPOINT_INTERVAL):
+        self.keyboard = keyboard_manager
+        self.file = open(filename, 'wb')
+        self.filename = filename
+        self.scene_name = scene_name
+        self.scene_param = scene_param
+        self.tick_rate = tick_rate
+        self.checkpoint_interval = checkpoint_interval
+
+        self.scene = None
+        self.tick = -1
+        self.held = dict()
+        self.size = None
+
+    def attach(self, scene: IScene):
+        """ The scene whose seed, size and state hashes go into the log """
+        self.scene = scene
+
+    def write(self, kind: int, a: int = 0, b: int = 0, digest: int = None):
+        self.file.write(RECORD.pack(self.tick, kind, a, b))
+        if digest is not None:
+            self.file.write(HASH.pack(digest))
+
+    def next(self):
+        # A new tick starts
+        scene = self.scene
+        self.tick += 1
+        if self.tick == 0:
+            self.size = (scene.width, scene.height)
+            self.file.write(HEADER.pack(MAGIC, VERSION, scene.seed, scene.width, scene.height, self.tick_rate,
+                                        self.scene_param, self.scene_name.encode('ascii')))
+            logger.info("recording %s seed %d to %s", self.scene_name, scene.seed, self.filename)
+        elif self.size != (scene.width, scene.height):
+            self.size = (scene.width, scene.height)
+            self.write(RESIZE, scene.width, scene.height)
+
+        if self.tick % self.checkpoint_interval == 0:
+            self.write(CHECKPOINT, digest=state_hash(scene))
+
+        key = self.keyboard.next()
+        if key is not None:
+            code = CODES.get(key)
+            if code is None:
+                logger.debug("can't record key %s", key)
+            else:
+                self.write(PRESS, code)
+        return key
+
+    def is_pressed(self, key: str) -> bool:
+        pressed = self.keyboard.is_pressed(key)
+        if pressed != self.held.get(key, False):
+            self.held[key] = pressed
+            code = CODES.get(key)
+            if code is not None:
+                self.write(HOLD, code, int(pressed))
+        return pressed
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.tick >= 0:
+            self.tick += 1
+            self.write(END, digest=state_hash(self.scene))
+        self.file.close()
+        logger.info("recorded %d ticks to %s", max(self.tick, 0), self.filename)
+
+
+class ReplayKeyboard(IKeyboardManager):
+    """ Serves the recorded input of the current tick, set up by the Replayer """
+
+    def __init__(self):
+        self.press = None
+        self.held = set()
+
+    def next(self):
+        key, self.press = self.press, None
+        return key
+
+    def is_pressed(self, key: str) -> bool:
+        return key in self.held
+
+    def get_keys(self):
+        return self.held
+
+
+class Replayer:
+    """ Runs a recording through its scene at full speed, verifying the checkpoints """
+
+    def __init__(self, log: ReplayLog, scene: IScene, keyboard: ReplayKeyboard):
+        self.log = log
+        self.scene = scene
+        self.keyboard = keyboard
+        self.checkpoints = 0
+        self.ticks_per_second = 0
+
+    def check(self, tick: int, digest: int):
+        actual = state_hash(self.scene)
+        if actual != digest:
+            raise ReplayDivergence(f"state differs at tick {tick}: {actual:016x}, recorded {digest:016x}")
+        self.checkpoints += 1
+
+    def run(self) -> float:
+        """ Replay the whole log, returns ticks/second """
+        scene, keyboard = self.scene, self.keyboard
+        scene.set_display_dimensions(self.log.width, self.log.height)
+        dt = 1 / self.log.tick_rate
+        records = self.log.records
+        index = 0
+
+        start = time.perf_counter()
+        for tick in range(self.log.ticks + 1):
+            while index < len(records) and records[index][0] == tick:
+                _, kind, a, b, digest = records[index]
+                index += 1
+                if kind == PRESS:
+                    keyboard.press = KEY_NAMES[a]
+                elif kind == HOLD:
+                    if b:
+                        keyboard.held.add(KEY_NAMES[a])
+                    else:
+                        keyboard.held.discard(KEY_NAMES[a])
+                elif kind == RESIZE:
+                    scene.reshape(a, b)
+                elif kind in (CHECKPOINT, END):
+                    self.check(tick, digest)
+
+            if tick < self.log.ticks:
+                scene.update(dt)
+        elapsed = time.perf_counter() - start
+
+        self.ticks_per_second = self.log.ticks / elapsed if elapsed > 0 else 0
+        logger.info("replayed %d ticks in %.4fs (%.2f ticks/s), %d checkpoints matched", self.log.ticks, elapsed,
+                    self.ticks_per_second, self.checkpoints)
+        return self.ticks_per_second
@@ -0,0 +1,76 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+
+class ResourceCache:
+    """ Loaded resources (fonts, glyph atlases, ...) shared by every scene, loadable from a worker thread
+
+    get() builds a resource once per key, other threads asking for the same key meanwhile wait for it instead of
+    building their own. Anything with an upload() method needs a GL context for that, which only the main thread
+    has: it's queued and uploaded by upload_pending(), called by the scene manager every frame.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.items = dict()
+        self.loading = dict()
+        self.uploads = deque()
+        self.executor = None
+
+    def get(self, key, factory):
+        with self.lock:
+            if key in self.items:
+                return self.items[key]
+            future = self.loading.get(key)
+            owner = future is None
+            if owner:
+                future = self.loading[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = factory()
+        except BaseException as e:
+            with self.lock:
+                del self.loading[key]
+            future.set_exception(e)
+            raise
+
+        with self.lock:
+            self.items[key] = value
+            del self.loading[key]
+            if hasattr(value, 'upload'):
+                self.uploads.append(value)
+        future.set_result(value)
+        return value
+
+    def submit(self, function, *args) -> Future:
+        """ Run function (e.g. a scene constructor, loading its assets) on the loader thread """
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="loader")
+        return self.executor.submit(function, *args)
+
+    def upload_pending(self):
+        """ GL upload of whatever got loaded since the last call, main thread only """
+        while self.uploads:
+            resource = self.uploads.popleft()
+            resource.upload()
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.uploads.clear()
+
+    def __repr__(self):
+        return f"<ResourceCache items={len(self.items)} loading={len(self.loading)}>"
+
+
+# The one shared by everything
+RESOURCES = ResourceCache()
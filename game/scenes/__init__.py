@@ -1,4 +1,10 @@
 from .single_player_scene import SinglePlayerScene
+from .versus_scene import VersusScene
+from .multi_ball_scene import MultiBallScene
 from .test_scene import TestScene
+from .net_scene import NetClientScene
+from .scene_manager import SceneManager, FadeTransition
+from .prediction import PadAI, predict_crossing, predict_crossings
 
-__all__ = ['SinglePlayerScene', 'TestScene']
+__all__ = ['SinglePlayerScene', 'VersusScene', 'MultiBallScene', 'TestScene', 'NetClientScene', 'SceneManager',
+           'FadeTransition', 'PadAI', 'predict_crossing', 'predict_crossings']
@@ -0,0 +1,192 @@
+import random
+import struct
+
+from collision import SpatialHash, find_contacts, exchange_velocities
+from color import Color
+from entities import Pad
+from entity_store import EntityStore
+from hud import Hud
+from interfaces import IScene, IKeyboardManager
+from log import get_logger
+from renderer import QuadBatch
+
+
+logger = get_logger(__name__)
+
+
+class MultiBallScene(IScene):
+    """ Single pad game with many balls at once (stress mode), all balls live in one EntityStore """
+
+    BALL_COUNT = 1000
+    BALL_COLOR = Color(255, 255, 255)
+    BALL_XSIZE = 8
+    BALL_YSIZE = 8
+    BALL_SPEED_X = 180
+    BALL_SPEED_Y = 180
+    BALL_COLLISIONS = True
+
+    PAD_COLOR = Color(255, 255, 255)
+    PAD_XSIZE = 10
+    PAD_YSIZE = 100
+    PAD_MOVE_FACTOR = 300
+
+    def __init__(self, keyboard_manager: IKeyboardManager, ball_count: int = BALL_COUNT, seed: int = None):
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.random = random.Random(self.seed)
+        logger.info("%s: created with %d balls, seed %d", self, ball_count, self.seed)
+        self.width = None
+        self.height = None
+        self.ball_count = ball_count
+
+        self.paused = False
+        self.ended = False
+
+        self.hud = Hud()
+        self.batch = QuadBatch()
+        self.balls = EntityStore(ball_count)
+        self.grid = SpatialHash(2 * max(MultiBallScene.BALL_XSIZE, MultiBallScene.BALL_YSIZE))
+
+        self.keyboard = keyboard_manager
+        self.fullscreen_callback = None
+
+        # initialized once we have our display dimensions
+        self.pad = None
+
+        self.init_hud()
+
+    def init_hud(self):
+        self.hud.update({"text": "Q/A: move pad\nSPACE: pause\nF: toggle fullscreen"})
+
+    def pause(self):
+        if self.paused:
+            return
+        self.paused = True
+        self.hud.update({"text": "Spacebar to unpause"})
+
+    def unpause(self):
+        if not self.paused:
+            return
+        self.paused = False
+        self.init_hud()
+
+    def spawn_balls(self):
+        self.balls.clear()
+        for _ in range(self.ball_count):
+            self.balls.add(self.random.randint(50, self.width),
+                           self.random.randint(0, self.height - MultiBallScene.BALL_YSIZE),
+                           MultiBallScene.BALL_XSIZE, MultiBallScene.BALL_YSIZE, MultiBallScene.BALL_COLOR,
+                           self.random.choice((-1, 1)) * MultiBallScene.BALL_SPEED_X,
+                           self.random.choice((-1, 1)) * MultiBallScene.BALL_SPEED_Y)
+
+    def set_display_dimensions(self, width: int, height: int):
+        logger.info("%s: received display dimensions %dx%d", self, width, height)
+        self.width = width
+        self.height = height
+        self.hud.reshape(width, height)
+
+        self.pad = Pad(5, int(self.height / 2 - MultiBallScene.PAD_YSIZE / 2), MultiBallScene.PAD_XSIZE,
+                       MultiBallScene.PAD_YSIZE, MultiBallScene.PAD_COLOR)
+        self.spawn_balls()
+
+    def update(self, dt):
+        self.balls.snapshot()
+        self.pad.snapshot()
+
+        next_key = self.keyboard.next()
+
+        if next_key == 'space':
+            if self.paused:
+                self.unpause()
+            else:
+                self.pause()
+        elif next_key == 'f':
+            if self.fullscreen_callback:
+                self.fullscreen_callback()
+        elif next_key == 'p':
+            self.profiler.toggle_overlay()
+        elif next_key == 'm' and self.scene_manager:
+            self.scene_manager.next_mode()
+        elif self.ended and next_key == 'r':
+            logger.info("%s: restarting", self)
+            self.init_hud()
+            self.ended = False
+            self.spawn_balls()
+
+        if self.paused:
+            return
+
+        pad_move = 0
+
+        if not self.ended and self.keyboard.is_pressed('a'):
+            self.pad.move_by(0, MultiBallScene.PAD_MOVE_FACTOR * dt)
+            pad_move = 1
+
+        if not self.ended and self.keyboard.is_pressed('q'):
+            self.pad.move_by(0, -MultiBallScene.PAD_MOVE_FACTOR * dt)
+            pad_move = -1
+
+        if self.pad.y < 0:
+            self.pad.y = 0
+        if self.pad.y + self.pad.height > self.height:
+            self.pad.y = self.height - self.pad.height
+
+        # One vectorized pass for all balls: move, walls, pad, then drop the ones that got past the pad
+        with self.profiler.scope('physics'):
+            self.balls.move(dt)
+            self.balls.bounce_walls(self.width, self.height)
+            self.balls.collide_pad(self.pad, pad_move)
+        if MultiBallScene.BALL_COLLISIONS:
+            with self.profiler.scope('collisions'):
+                self.collide_balls()
+        self.balls.remove_all(self.balls.x[:self.balls.count] <= 0)
+
+        if not self.ended and not len(self.balls):
+            self.ended = True
+            self.hud.update({"text": "Game over\nR to restart"})
+
+    def is_static(self) -> bool:
+        # Once every ball is gone the pad can't move either
+        return self.paused or self.ended
+
+    def collide_balls(self):
+        """ Balls bounce off each other, candidates come from the spatial hash so this stays about linear """
+        balls = self.balls
+        n = balls.count
+        x, y, width, height = balls.x[:n], balls.y[:n], balls.width[:n], balls.height[:n]
+
+        self.grid.rebuild(x, y, width, height, balls.alive[:n])
+        contacts = find_contacts(x, y, width, height, self.grid.candidate_pairs())
+        exchange_velocities(contacts, balls.speed_x[:n], balls.speed_y[:n])
+
+    def draw(self, alpha: float):
+        with self.profiler.scope('entities'):
+            self.batch.begin()
+            self.balls.draw(self.batch, alpha)
+            self.pad.draw(self.batch, alpha)
+            self.batch.flush(self.width, self.height)
+
+        with self.profiler.scope('hud'):
+            self.hud.set_label('balls', f"{len(self.balls)} balls", 25, 25)
+            self.hud.draw()
+
+    def reshape(self, width: int, height: int):
+        logger.info("%s: received new resolution %dx%d", self, width, height)
+        self.width = width
+        self.height = height
+
+        self.hud.reshape(width, height)
+
+        # Balls out of bounds after a resize will just bounce back in, pad is kept on screen
+        if self.pad.y < 0:
+            self.pad.y = 0
+        elif self.pad.y + self.pad.height > self.height:
+            self.pad.y = self.height - self.pad.height
+
+    def state_bytes(self) -> bytes:
+        balls, n = self.balls, self.balls.count
+        return b''.join((struct.pack('<4d2?', self.pad.y, self.width, self.height, len(balls), self.paused, self.ended),
+                         balls.x[:n].tobytes(), balls.y[:n].tobytes(), balls.speed_x[:n].tobytes(),
+                         balls.speed_y[:n].tobytes(), balls.alive[:n].tobytes()))
+
+    def __repr__(self):
+        return "<scenes.MultiBallScene>"
@@ -0,0 +1,191 @@
+import time
+
+from color import Color
+from entities import Ball, Pad
+from hud import Hud
+from interfaces import IScene, IKeyboardManager
+from log import get_logger
+from netplay import NetClient, STATE, ENDED, PAUSED
+from renderer import QuadBatch
+from .prediction import fold, fold_speed
+from .single_player_scene import SinglePlayerScene
+
+
+logger = get_logger(__name__)
+
+
+class NetClientScene(IScene):
+    """ Client side of a network game: shows what the server sends, with our own pad predicted
+
+    Our pad (always on the Q/A keys, whichever side we got) moves as soon as a key is held, and is put back in
+    line with the server whenever a snapshot comes in. The ball is moved on from the latest snapshot, by the time
+    since it arrived plus half the round trip, bouncing off the top and bottom walls the same way the server does.
+    """
+
+    def __init__(self, keyboard_manager: IKeyboardManager, client: NetClient):
+        self.keyboard = keyboard_manager
+        self.client = client
+        self.width = None
+        self.height = None
+        self.fullscreen_callback = None
+
+        self.hud = Hud()
+        self.hud_text = None
+        self.batch = QuadBatch()
+
+        # Created once the server told us the arena size
+        self.ball = None
+        self.pads = None
+
+        self.paused = False
+        self.ended = False
+        self.scores = (0, 0)
+        # Snapshot ball (x, y, speed x, speed y) and when it arrived
+        self.ball_state = None
+
+        # How far off our predicted pad was from the server's, in pixels
+        self.corrections = 0
+        self.max_correction = 0.0
+
+    @property
+    def own_pad(self) -> Pad:
+        return self.pads[self.client.side]
+
+    def pause(self):
+        # The server decides, the space key asks it to
+        pass
+
+    def unpause(self):
+        pass
+
+    def set_display_dimensions(self, width: int, height: int):
+        logger.info("%s: received display dimensions %dx%d", self, width, height)
+        self.width = width
+        self.height = height
+        self.hud.reshape(width, height)
+
+    def create_entities(self):
+        client = self.client
+        self.ball = Ball(client.width / 2, client.height / 2, SinglePlayerScene.BALL_XSIZE,
+                         SinglePlayerScene.BALL_YSIZE, SinglePlayerScene.BALL_COLOR)
+        pad_y = client.height / 2 - SinglePlayerScene.PAD_YSIZE / 2
+        self.pads = (
+            Pad(5, pad_y, SinglePlayerScene.PAD_XSIZE, SinglePlayerScene.PAD_YSIZE, SinglePlayerScene.PAD_COLOR),
+            Pad(client.width - 5 - SinglePlayerScene.PAD_XSIZE, pad_y, SinglePlayerScene.PAD_XSIZE,
+                SinglePlayerScene.PAD_YSIZE, SinglePlayerScene.PAD_COLOR),
+        )
+
+    def move_pad(self, pad: Pad, pad_move: int, dt: float):
+        """ Same as the server's SinglePlayerScene.move_pad(), in arena coordinates """
+        pad.y = min(max(pad.y + pad_move * SinglePlayerScene.PAD_MOVE_FACTOR * dt, 0),
+                    self.client.height - pad.height)
+
+    def update(self, dt):
+        client = self.client
+        next_key = self.keyboard.next()
+
+        if next_key == 'f':
+            if self.fullscreen_callback:
+                self.fullscreen_callback()
+        elif next_key == 'p':
+            self.profiler.toggle_overlay()
+        elif next_key == 'm' and self.scene_manager:
+            self.scene_manager.next_mode()
+
+        if not client.connected:
+            client.hello()
+            client.poll()
+            self.update_hud()
+            return
+        if self.ball is None:
+            self.create_entities()
+
+        self.ball.snapshot()
+        for pad in self.pads:
+            pad.snapshot()
+
+        pad_move = self.keyboard.is_pressed('a') - self.keyboard.is_pressed('q')
+        client.send_input(pad_move, next_key)
+        if not (self.ended or self.paused):
+            self.move_pad(self.own_pad, pad_move, dt)
+
+        if client.poll():
+            self.apply_snapshot(dt)
+        self.move_ball()
+        self.update_hud()
+
+    def apply_snapshot(self, dt: float):
+        _, state, _ = self.client.snapshot
+        ball_x, ball_y, speed_x, speed_y, left_y, right_y, left_score, right_score, flags = STATE.unpack(state)
+
+        self.ball_state = (ball_x, ball_y, speed_x, speed_y, self.client.snapshot_time)
+        self.ball.set_color(Color.from_packed(flags & 0xFFFFFF))
+        self.ended = bool(flags & ENDED)
+        self.paused = bool(flags & PAUSED)
+        self.scores = (left_score, right_score)
+
+        side = self.client.side
+        self.pads[1 - side].y = (left_y, right_y)[1 - side]
+
+        # Reconcile: start from the server's pad and apply what it hasn't seen yet
+        own = self.own_pad
+        predicted = own.y
+        own.y = (left_y, right_y)[side]
+        if not (self.ended or self.paused):
+            for _, _, pad_move, _ in self.client.pending:
+                self.move_pad(own, pad_move, dt)
+
+        correction = abs(own.y - predicted)
+        if correction > 0.5:
+            self.corrections += 1
+            self.max_correction = max(self.max_correction, correction)
+
+    def move_ball(self):
+        if self.ball_state is None:
+            return
+        x, y, speed_x, speed_y, received = self.ball_state
+        elapsed = time.perf_counter() - received + self.client.rtt / 2
+        self.ball.x = x + speed_x * elapsed
+        if self.ended:
+            # The bounce off animation is accelerating, just show where the server has it
+            self.ball.y = y
+            self.ball.set_speed(speed_x, speed_y)
+        else:
+            free_y = y + speed_y * elapsed
+            self.ball.y = fold(free_y, 0, self.client.height - self.ball.height)
+            self.ball.set_speed(speed_x, fold_speed(free_y, speed_y, 0, self.client.height - self.ball.height))
+
+    def update_hud(self):
+        client = self.client
+        if not client.connected:
+            text = f"Connecting to\n{client.server[0]}:{client.server[1]}"
+        elif client.snapshot is None:
+            text = "Waiting for the\nother player"
+        else:
+            status = "Paused" if self.paused else "Point!" if self.ended else "Q/A: move pad"
+            text = f"{self.scores[0]} : {self.scores[1]}\n{status}\n{client.rtt * 1000:.0f} ms"
+        if text != self.hud_text:
+            self.hud_text = text
+            self.hud.update({"text": text})
+
+    def draw(self, alpha: float):
+        if self.ball is not None:
+            with self.profiler.scope('entities'):
+                self.batch.begin()
+                self.ball.draw(self.batch, alpha)
+                for pad in self.pads:
+                    pad.draw(self.batch, alpha)
+                # Arena coordinates, stretched to the window
+                self.batch.flush(self.client.width, self.client.height)
+
+        with self.profiler.scope('hud'):
+            self.hud.draw()
+
+    def reshape(self, width: int, height: int):
+        logger.info("%s: received new resolution %dx%d", self, width, height)
+        self.width = width
+        self.height = height
+        self.hud.reshape(width, height)
+
+    def __repr__(self):
+        return f"<scenes.NetClientScene {self.client}>"
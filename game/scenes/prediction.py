@@ -0,0 +1,149 @@
+import math
+
+import numpy
+
+from entities import Ball, Pad
+
+
+def fold(value: float, low: float, high: float) -> float:
+    """ Where something moving freely to value ends up when it's bounced back between low and high
+
+    The path bounced between two walls is the unbounced one folded over and over: it repeats every 2 * span, in
+    the second half of a period it's going back the other way.
+    """
+    span = high - low
+    if span <= 0:
+        return low
+    offset = (value - low) % (2 * span)
+    return low + (offset if offset <= span else 2 * span - offset)
+
+
+def fold_speed(value: float, speed: float, low: float, high: float) -> float:
+    """ The speed something moving freely to value has after the bounces fold() folded in """
+    span = high - low
+    if span <= 0:
+        return speed
+    return speed if (value - low) % (2 * span) <= span else -speed
+
+
+def predict_crossing(x: float, y: float, speed_x: float, speed_y: float, target_x: float, bounds_height: float,
+                     ball_height: float, wall_x: float = None):
+    """ When and where a ball at x, y gets to target_x, bouncing off the top and bottom walls on the way
+
+    Returns (seconds, y) or None if it's moving away and nothing turns it back. With wall_x, the ball also bounces
+    off a vertical wall there (e.g. the right wall in single player) before coming back to target_x. Closed-form,
+    so it costs the same however many bounces away the crossing is.
+    """
+    if speed_x == 0:
+        return None
+    if (target_x - x) * speed_x >= 0:
+        distance = abs(target_x - x)
+    elif wall_x is not None:
+        distance = abs(wall_x - x) + abs(wall_x - target_x)
+    else:
+        return None
+
+    seconds = distance / abs(speed_x)
+    return seconds, fold(y + speed_y * seconds, 0, bounds_height - ball_height)
+
+
+def predict_crossings(x: numpy.ndarray, y: numpy.ndarray, speed_x: numpy.ndarray, speed_y: numpy.ndarray,
+                      target_x, bounds_height: float, ball_height: float, wall_x=None):
+    """ predict_crossing() for many balls (or many targets) at once
+
+    Returns (seconds, y) arrays, seconds is inf and y is nan where the ball never gets there.
+    """
+    x = numpy.asarray(x, dtype=numpy.float64)
+    speed_x = numpy.asarray(speed_x, dtype=numpy.float64)
+    target_x = numpy.asarray(target_x, dtype=numpy.float64)
+
+    towards = (target_x - x) * speed_x >= 0
+    distance = numpy.abs(target_x - x)
+    if wall_x is not None:
+        distance = numpy.where(towards, distance, numpy.abs(wall_x - x) + numpy.abs(wall_x - target_x))
+        reaches = speed_x != 0
+    else:
+        reaches = towards & (speed_x != 0)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        seconds = numpy.where(reaches, distance / numpy.abs(speed_x), numpy.inf)
+
+    span = max(bounds_height - ball_height, 0)
+    free_y = numpy.asarray(y, dtype=numpy.float64) + numpy.asarray(speed_y, dtype=numpy.float64) * \
+        numpy.where(reaches, seconds, 0)
+    if span > 0:
+        offset = numpy.mod(free_y, 2 * span)
+        folded = numpy.where(offset <= span, offset, 2 * span - offset)
+    else:
+        folded = numpy.zeros_like(free_y)
+    return seconds, numpy.where(reaches, folded, numpy.nan)
+
+
+def pad_target_x(pad: Pad, ball: Ball, bounds_width: float) -> float:
+    """ The ball x at which it touches the pad's inner side: the right side for a pad on the left, and vice versa """
+    if pad.x + pad.width / 2 < bounds_width / 2:
+        return pad.x + pad.width
+    return pad.x - ball.width
+
+
+class PadAI:
+    """ Computer player for a pad: aims the pad at where the ball is going to cross it
+
+    Difficulty knobs: reaction_delay is how long it takes to notice that the ball changed direction (bounced off
+    something), error is the standard deviation, in pixels, of how far off it aims, drawn again every time it
+    reacts. update() returns the pad move (-1, 0 or 1) the same way the keys would move it.
+    """
+
+    REACTION_DELAY = 0.15
+    ERROR = 20
+    # Close enough to the aim to stop moving, more than a tick's worth of pad move so it doesn't jitter around it
+    DEAD_ZONE = 4
+
+    def __init__(self, pad: Pad, rng, reaction_delay: float = REACTION_DELAY, error: float = ERROR,
+                 wall_x: float = None):
+        self.pad = pad
+        self.random = rng
+        self.reaction_delay = reaction_delay
+        self.error = error
+        self.wall_x = wall_x
+
+        self.seen_speed = None
+        self.reacting_in = 0.0
+        self.stale = True
+        self.aim = None
+
+    def update(self, dt: float, ball: Ball, bounds_width: float, bounds_height: float) -> int:
+        speed = ball.get_speed()
+        if speed != self.seen_speed:
+            self.seen_speed = speed
+            self.reacting_in = self.reaction_delay
+            self.stale = True
+
+        if self.stale:
+            # Keeps going for the old aim until it notices
+            self.reacting_in -= dt
+            if self.reacting_in <= 0:
+                self.aim = self.choose_aim(ball, bounds_width, bounds_height)
+                self.stale = False
+
+        return self.move_towards(self.aim) if self.aim is not None else 0
+
+    def choose_aim(self, ball: Ball, bounds_width: float, bounds_height: float) -> float:
+        crossing = predict_crossing(ball.x, ball.y, ball.speed_x, ball.speed_y,
+                                    pad_target_x(self.pad, ball, bounds_width), bounds_height, ball.height,
+                                    self.wall_x)
+        if crossing is None:
+            # Going away for good (towards the other player): wait in the middle
+            return bounds_height / 2
+        _, y = crossing
+        miss = self.random.gauss(0, self.error) if self.error else 0
+        return y + ball.height / 2 + miss
+
+    def move_towards(self, center_y: float) -> int:
+        distance = center_y - (self.pad.y + self.pad.height / 2)
+        if math.fabs(distance) <= PadAI.DEAD_ZONE:
+            return 0
+        return 1 if distance > 0 else -1
+
+    def __repr__(self):
+        return f"<PadAI reaction_delay={self.reaction_delay} error={self.error}>"
@@ -0,0 +1,236 @@
+from concurrent.futures import Future
+
+from color import Color
+from interfaces import IScene, IKeyboardManager
+from log import get_logger
+from renderer import QuadBatch
+from resources import RESOURCES, ResourceCache
+
+
+logger = get_logger(__name__)
+
+
+class FadeTransition:
+    """ Fades the old scene to black, swaps the scenes at the darkest point, then fades the new one in """
+
+    COLOR = Color(0, 0, 0)
+    DURATION = 0.4
+
+    def __init__(self, duration: float = DURATION):
+        self.duration = duration
+        self.elapsed = 0.0
+
+    def update(self, dt: float):
+        self.elapsed += dt
+
+    @property
+    def progress(self) -> float:
+        return min(self.elapsed / self.duration, 1.0)
+
+    def at_midpoint(self) -> bool:
+        return self.progress >= 0.5
+
+    def is_finished(self) -> bool:
+        return self.progress >= 1.0
+
+    def draw(self, batch: QuadBatch, width: int, height: int):
+        alpha = int(255 * (1 - abs(2 * self.progress - 1)))
+        batch.begin()
+        batch.add_rect(0, 0, width, height, FadeTransition.COLOR, alpha)
+        batch.flush(width, height)
+
+
+class SceneManager(IScene):
+    """ Stack of scenes, the top one gets updated and drawn. Set as the display manager's scene.
+
+    Scenes can be pushed (e.g. a menu over the paused game), popped and switched, optionally with a transition.
+    Game modes are registered as factories: switching to one constructs the scene on the resource cache's loader
+    thread (which also builds its fonts and atlases) while the current scene keeps running, the GL uploads happen
+    on the main thread in draw(). So a mode switch doesn't stall the frame loop.
+    """
+
+    def __init__(self, keyboard_manager: IKeyboardManager, resources: ResourceCache = RESOURCES):
+        logger.info("%s: created", self)
+        self.keyboard = keyboard_manager
+        self.resources = resources
+        self.width = None
+        self.height = None
+        self.fullscreen_callback = None
+
+        self.stack = []
+        self.modes = dict()
+        self.mode = None
+        self.preloaded = dict()
+        self.to_preload = []
+
+        # Waiting for a scene to load: (future, operation, transition)
+        self.pending = None
+        # Running transition and the operation to do at its midpoint
+        self.transition = None
+        self.transition_op = None
+
+        self.batch = QuadBatch()
+
+    @property
+    def top(self) -> IScene:
+        return self.stack[-1] if self.stack else None
+
+    def register(self, name: str, factory):
+        """ Add a game mode, factory(keyboard_manager) creates its scene """
+        self.modes[name] = factory
+
+    def activate(self, scene: IScene):
+        scene.set_fullscreen_callback(self.fullscreen_callback)
+        scene.set_profiler(self.profiler)
+        scene.set_scene_manager(self)
+        if self.width is None:
+            return
+
+        if getattr(scene, 'width', None) is None:
+            scene.set_display_dimensions(self.width, self.height)
+        elif (scene.width, scene.height) != (self.width, self.height):
+            # Loaded in the background with the window size of that time
+            scene.reshape(self.width, self.height)
+
+    def apply(self, operation: str, scene: IScene = None):
+        logger.info("%s: %s %s", self, operation, scene or "")
+        if operation == 'pop':
+            if self.stack:
+                self.stack.pop()
+            else:
+                logger.warning("%s: nothing to pop", self)
+        else:
+            if operation == 'switch' and self.stack:
+                self.stack.pop()
+            self.activate(scene)
+            self.stack.append(scene)
+
+    def run(self, operation: str, scene: IScene = None, transition: FadeTransition = None):
+        if transition is None:
+            self.apply(operation, scene)
+        else:
+            self.transition = transition
+            self.transition_op = (operation, scene)
+
+    def push(self, scene: IScene, transition: FadeTransition = None):
+        self.run('push', scene, transition)
+
+    def pop(self, transition: FadeTransition = None):
+        self.run('pop', None, transition)
+
+    def switch(self, scene: IScene, transition: FadeTransition = None):
+        self.run('switch', scene, transition)
+
+    def load(self, factory) -> Future:
+        """ Create a scene (and load everything it needs) on the loader thread, sized for the current window """
+        def create():
+            scene = factory(self.keyboard)
+            if self.width is not None:
+                scene.set_display_dimensions(self.width, self.height)
+            return scene
+
+        return self.resources.submit(create)
+
+    def preload(self, name: str):
+        """ Load a game mode in the background, so switching to it later is instant
+
+        Loading starts once the first frame is drawn, it would only compete with startup for the CPU before that.
+        """
+        if name not in self.preloaded:
+            self.to_preload.append(name)
+
+    def start_preloads(self):
+        for name in self.to_preload:
+            if name not in self.preloaded:
+                self.preloaded[name] = self.load(self.modes[name])
+        self.to_preload = []
+
+    def switch_mode(self, name: str, transition: FadeTransition = None):
+        """ Switch to a game mode once it's loaded, the current scene keeps running until then """
+        if self.pending is not None or self.transition is not None:
+            return
+        if name in self.to_preload:
+            self.to_preload.remove(name)
+        future = self.preloaded.pop(name, None) or self.load(self.modes[name])
+        self.pending = (future, 'switch', transition or FadeTransition())
+        self.mode = name
+
+    def next_mode(self):
+        names = list(self.modes)
+        if not names:
+            return
+        index = names.index(self.mode) + 1 if self.mode in names else 0
+        self.switch_mode(names[index % len(names)])
+
+    def pause(self):
+        if self.top:
+            self.top.pause()
+
+    def unpause(self):
+        if self.top:
+            self.top.unpause()
+
+    def set_display_dimensions(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        for scene in self.stack:
+            self.activate(scene)
+
+    def set_fullscreen_callback(self, callback):
+        self.fullscreen_callback = callback
+        for scene in self.stack:
+            scene.set_fullscreen_callback(callback)
+
+    def set_profiler(self, profiler):
+        self.profiler = profiler
+        for scene in self.stack:
+            scene.set_profiler(profiler)
+
+    def is_static(self) -> bool:
+        if self.pending is not None or self.transition is not None or self.to_preload:
+            return False
+        return self.top is not None and self.top.is_static()
+
+    def update(self, dt):
+        if self.pending is not None and self.pending[0].done():
+            future, operation, transition = self.pending
+            self.pending = None
+            try:
+                self.run(operation, future.result(), transition)
+            except Exception:
+                logger.exception("%s: loading the next scene failed", self)
+
+        if self.transition is not None:
+            self.transition.update(dt)
+            if self.transition_op is not None and self.transition.at_midpoint():
+                self.apply(*self.transition_op)
+                self.transition_op = None
+            if self.transition.is_finished():
+                self.transition = None
+
+        if self.top:
+            self.top.update(dt)
+
+    def draw(self, alpha: float):
+        # Resources loaded in the background get to the GPU here, where we have the context
+        self.resources.upload_pending()
+
+        if self.top:
+            self.top.draw(alpha)
+        if self.transition is not None:
+            self.transition.draw(self.batch, self.width, self.height)
+
+        if self.to_preload:
+            self.start_preloads()
+
+    def reshape(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        for scene in self.stack:
+            scene.reshape(width, height)
+
+    def state_bytes(self) -> bytes:
+        return self.top.state_bytes() if self.top else b''
+
+    def __repr__(self):
+        return "<scenes.SceneManager>"
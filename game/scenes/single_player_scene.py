@@ -1,11 +1,20 @@
+import math
 import random
+import struct
 
+from animation_scheduler import AnimationScheduler
 from animations import FadeOut, BallBounceOff, Flash
+from collision import swept_aabb, swept_bounds
 from color import Color
 from entities import Pad, Ball
 from hud import Hud
-from interfaces import IScene
-from pynput import keyboard as kb
+from interfaces import IScene, IKeyboardManager
+from log import get_logger
+from particles import ParticleSystem
+from renderer import QuadBatch
+
+
+logger = get_logger(__name__)
 
 
 class SinglePlayerScene(IScene):
@@ -14,23 +23,49 @@ class SinglePlayerScene(IScene):
     BALL_COLOR = Color(255, 255, 255)
     BALL_XSIZE = 20
     BALL_YSIZE = 20
-    BALL_SPEED_X = 3
-    BALL_SPEED_Y = 3
+    # Speeds are in pixels/second
+    BALL_SPEED_X = 180
+    BALL_SPEED_Y = 180
 
     PAD_COLOR = Color(255, 255, 255)
     PAD_XSIZE = 10
     PAD_YSIZE = 100
-    PAD_MOVE_FACTOR = 5
+    PAD_MOVE_FACTOR = 300
+
+    # Most pad/wall hits resolved within one tick
+    MAX_BOUNCES = 8
+
+    # Particle effects: ball trail (particles every TRAIL_INTERVAL ticks), pad hit sparks and the game over burst
+    TRAIL_INTERVAL = 4
+    TRAIL_PARTICLES = 8
+    TRAIL_COLOR = Color(120, 120, 160)
+    SPARK_PARTICLES = 60
+    SPARK_COLOR = Color(255, 200, 64)
+    BURST_PARTICLES = 400
+    BURST_COLOR = Color(255, 150, 150)
+
+    def __init__(self, keyboard_manager: IKeyboardManager, seed: int = None):
+        # All randomness comes from our own generator, so a seed and the input replay a game exactly
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.random = random.Random(self.seed)
+        logger.info("%s: created with seed %d", self, self.seed)
 
-    def __init__(self, keyboard_manager):
-        print(f"{self}: created")
         self.width = None
         self.height = None
 
         self.paused = False
         self.ended = False
+        # Game over animations finished, the ball is off screen
+        self.ball_gone = False
+
+        self.animations = AnimationScheduler()
+        self.particles = ParticleSystem(seed=self.seed)
+        # Where the last bit of trail ended, None to start over from wherever the ball is
+        self.trail_from = None
+        self.trail_ticks = 0
 
         self.hud = Hud()
+        self.batch = QuadBatch()
 
         self.keyboard = keyboard_manager
         self.fullscreen_callback = None
@@ -57,115 +92,233 @@ class SinglePlayerScene(IScene):
         self.init_hud()
 
     def set_display_dimensions(self, width: int, height: int):
-        print(f"{self}: received display dimensions")
+        logger.info("%s: received display dimensions %dx%d", self, width, height)
         self.width = width
         self.height = height
         self.hud.reshape(width, height)
 
-        random.seed()
-        self.ball = Ball(random.randint(50, self.width), random.randint(0, self.height), SinglePlayerScene.BALL_XSIZE,
-                         SinglePlayerScene.BALL_YSIZE, SinglePlayerScene.PAD_COLOR)
-        self.ball.c = SinglePlayerScene.BALL_COLOR
+        self.ball = Ball(self.random.randint(50, self.width), self.random.randint(0, self.height),
+                         SinglePlayerScene.BALL_XSIZE, SinglePlayerScene.BALL_YSIZE, SinglePlayerScene.BALL_COLOR)
         self.ball.set_speed(SinglePlayerScene.BALL_SPEED_X, SinglePlayerScene.BALL_SPEED_Y)
 
         self.pad = Pad(5, int(self.height / 2 - SinglePlayerScene.PAD_YSIZE / 2), SinglePlayerScene.PAD_XSIZE,
-                       SinglePlayerScene.PAD_YSIZE, SinglePlayerScene.BALL_COLOR)
-        self.ball.c = SinglePlayerScene.PAD_COLOR
+                       SinglePlayerScene.PAD_YSIZE, SinglePlayerScene.PAD_COLOR)
 
     def update(self, dt):
+        # Start of a new tick, remember where everything was for render interpolation
+        self.ball.snapshot()
+        self.pad.snapshot()
+
         # Check keyboard
-        next_key = self.keyboard.next()
+        self.handle_key(self.keyboard.next())
+
+        # Nothing moves while paused, the pad neither: is_static() stops the redraws meanwhile
+        if self.paused:
+            return
+
+        # To help us tell whether the pad is moving right now, and if yes, its direction
+        pad_move = 0
+        if not self.ended:
+            pad_move = self.keyboard.is_pressed('a') - self.keyboard.is_pressed('q')
+
+        self.move_pad(self.pad, pad_move, dt)
+
+        # Need to update even when game ended so we properly run animations
+        with self.profiler.scope('animations'):
+            self.animations.update(dt)
+        # Only a clock to advance, the particles are moved when drawn
+        self.particles.update(dt)
+
+        if self.ended:
+            # Just playing the bounce off animation, nothing to collide with anymore
+            self.ball.move(dt)
+            return
+
+        with self.profiler.scope('physics'):
+            self.move_ball(dt, [(self.pad, pad_move)])
+        self.emit_trail()
+
+        # Ball got past the pad and hit the wall
+        if self.ball.x <= 0:
+            self.end_game("Game over\nR to restart")
 
+    def handle_key(self, next_key: str):
         # Spacebar for pause
-        if next_key == kb.Key.space:
+        if next_key == 'space':
             if self.paused:
                 self.unpause()
             else:
                 self.pause()
         # Toggle fullscreen
-        elif next_key == kb.KeyCode.from_char('f'):
+        elif next_key == 'f':
             if self.fullscreen_callback:
                 self.fullscreen_callback()
             pass
+        # Frame profiler overlay
+        elif next_key == 'p':
+            self.profiler.toggle_overlay()
+        # Next game mode
+        elif next_key == 'm' and self.scene_manager:
+            self.scene_manager.next_mode()
         # 'r' to restart when game ended
-        elif self.ended and next_key == kb.KeyCode.from_char('r'):
-            print(f"{self}: restarting")
-            self.init_hud()
-            self.ended = False
-            random.seed()
-            self.ball.set_coords(random.randint(50, self.width), random.randint(0, self.height))
-            self.ball.clear_animations()
-            self.ball.set_color(SinglePlayerScene.BALL_COLOR)
-            self.ball.set_speed(SinglePlayerScene.BALL_SPEED_X, SinglePlayerScene.BALL_SPEED_Y)
+        elif self.ended and next_key == 'r':
+            self.restart()
 
-        # To help us tell whether the pad is moving right now, and if yes, its direction
-        pad_move = 0
-
-        if not self.ended and self.keyboard.is_pressed('a'):
-            self.pad.move_by(0, SinglePlayerScene.PAD_MOVE_FACTOR)
-            pad_move = 1
-
-        if not self.ended and self.keyboard.is_pressed('q'):
-            self.pad.move_by(0, -SinglePlayerScene.PAD_MOVE_FACTOR)
-            pad_move = -1
-
-        if self.pad.y < 0:
-            self.pad.y = 0
-        if self.pad.y + self.pad.height > self.height:
-            self.pad.y = self.height - self.pad.height
+    def restart(self):
+        logger.info("%s: restarting", self)
+        self.init_hud()
+        self.ended = False
+        self.ball_gone = False
+        self.trail_from = None
+        self.ball.set_coords(self.random.randint(50, self.width), self.random.randint(0, self.height))
+        self.animations.cancel(self.ball)
+        self.ball.set_color(SinglePlayerScene.BALL_COLOR)
+        self.ball.set_speed(SinglePlayerScene.BALL_SPEED_X, SinglePlayerScene.BALL_SPEED_Y)
 
-        # Need to update even when game ended so we properly run animations
-        if not self.paused:
-            self.ball.update(dt)
-            self.pad.update(dt)
-
-        self.ball.draw()
-        self.pad.draw()
-        self.hud.draw()
-
-        # Ball at pad width distance from the left wall, checking for collision with the pad
-        if self.ball.x <= self.pad.x + self.pad.width:
-            if self.ball.y <= self.pad.y + self.pad.height and self.ball.y + self.ball.height >= self.pad.y:
-                # Ball is touching the pad, bouncing back
-                # If the pad was moving, also adjust vertical speed
-                self.ball.bounce_x(pad_move)
-                self.ball.increase_speed()
-                self.pad.add_animation(Flash(Color(255, 64, 64), speed=500))
-                if pad_move:
-                    self.ball.add_animation(Flash(Color(64, 128, 255)))
+    def move_pad(self, pad: Pad, pad_move: int, dt: float):
+        if pad_move:
+            pad.move_by(0, pad_move * SinglePlayerScene.PAD_MOVE_FACTOR * dt)
+
+        if pad.y < 0:
+            pad.y = 0
+        if pad.y + pad.height > self.height:
+            pad.y = self.height - pad.height
+
+    def end_game(self, text: str):
+        self.ended = True
+        self.animations.cancel(self.ball)
+        self.animations.add(self.ball, FadeOut(Color(255, 150, 150)))
+        self.animations.add(self.ball, BallBounceOff(self), on_complete=self.on_ball_gone)
+        self.particles.emit(self.ball.x + self.ball.width / 2, self.ball.y + self.ball.height / 2,
+                            SinglePlayerScene.BURST_PARTICLES, 400, 1.2, SinglePlayerScene.BURST_COLOR, size=5,
+                            accel_y=BallBounceOff.ACCEL_Y)
+        self.hud.update({"text": text})
+
+    def is_static(self) -> bool:
+        # Paused (animations and particles are frozen too), or the game over screen once everything settled
+        return self.paused or (self.ball_gone and not len(self.animations) and not len(self.particles))
+
+    def emit_trail(self):
+        """ Every TRAIL_INTERVAL ticks, lay the trail along the way the ball went since the last time """
+        self.trail_ticks += 1
+        if self.trail_ticks < SinglePlayerScene.TRAIL_INTERVAL:
+            return
+        self.trail_ticks = 0
+
+        ball = self.ball
+        x, y = ball.x + ball.width / 2, ball.y + ball.height / 2
+        from_x, from_y = self.trail_from or (x, y)
+        self.particles.emit(from_x, from_y, SinglePlayerScene.TRAIL_PARTICLES, 20, 0.3, SinglePlayerScene.TRAIL_COLOR,
+                            size=6, dx=x - from_x, dy=y - from_y)
+        self.trail_from = x, y
+
+    def hit_pad(self, pad: Pad, pad_move: int):
+        # Ball is touching the pad, bouncing back
+        # If the pad was moving, also adjust vertical speed
+        self.ball.bounce_x(pad_move)
+        self.ball.increase_speed()
+        # Sparks flying off the pad, the way the ball goes
+        self.particles.emit(self.ball.x + self.ball.width / 2, self.ball.y + self.ball.height / 2,
+                            SinglePlayerScene.SPARK_PARTICLES, 300, 0.4, SinglePlayerScene.SPARK_COLOR,
+                            angle=0 if self.ball.speed_x > 0 else math.pi, spread=math.pi, size=3)
+        self.animations.cancel(pad)
+        self.animations.add(pad, Flash(Color(255, 64, 64), speed=500))
+        if pad_move:
+            self.animations.cancel(self.ball)
+            self.animations.add(self.ball, Flash(Color(64, 128, 255)))
+
+    def on_ball_gone(self, ball):
+        logger.debug("%s: game over animations finished", self)
+        self.animations.cancel(ball)
+        self.ball_gone = True
+
+    def move_ball(self, dt: float, pads: list, right: bool = True):
+        """ Move the ball for one tick with continuous collision detection
+
+        Instead of moving first and checking for overlaps afterwards (which lets a fast ball skip over a pad),
+        the ball is swept along its path: it's moved to the earliest hit with a pad or a wall, bounced, then moved
+        on for the rest of the tick, up to MAX_BOUNCES times. pads is a list of (pad, pad_move), right tells
+        whether the right wall is solid.
+        """
+        ball = self.ball
+
+        for pad, pad_move in pads:
+            # Pad moved into the ball: bounce right away, same as the old discrete check did
+            towards = ball.speed_x < 0 if pad.x < self.width / 2 else ball.speed_x > 0
+            if towards and ball.x <= pad.x + pad.width and ball.x + ball.width >= pad.x and \
+                    ball.y <= pad.y + pad.height and ball.y + ball.height >= pad.y:
+                self.hit_pad(pad, pad_move)
+
+        remaining = dt
+        for _ in range(SinglePlayerScene.MAX_BOUNCES):
+            dx, dy = ball.speed_x * remaining, ball.speed_y * remaining
+
+            # The left wall is not solid: that's where the ball gets missed
+            hit = swept_bounds(ball.x, ball.y, ball.width, ball.height, dx, dy, self.width, self.height, left=False,
+                               right=right)
+            hit_by = None
+            for pad, pad_move in pads:
+                pad_hit = swept_aabb(ball.x, ball.y, ball.width, ball.height, dx, dy, pad.x, pad.y, pad.width,
+                                     pad.height)
+                if pad_hit is not None and (hit is None or pad_hit[0] <= hit[0]):
+                    hit = pad_hit
+                    hit_by = (pad, pad_move)
+
+            if hit is None:
+                ball.move(remaining)
+                return
+
+            toi, (normal_x, normal_y) = hit
+            ball.move(remaining * toi)
+            remaining *= 1 - toi
+
+            if hit_by is not None and normal_x:
+                self.hit_pad(*hit_by)
+            elif normal_x:
+                ball.bounce_x()
             else:
-                # We hit the wall
-                if self.ball.x <= 0 and self.ended is not True:
-                    self.ended = True
-                    # how to detect if animations are over?
-                    self.ball.clear_animations()
-                    self.ball.add_animation(FadeOut(Color(255, 150, 150)))
-                    self.ball.add_animation(BallBounceOff(self))
-                    self.hud.update({"text": "Game over\nR to restart"})
+                ball.bounce_y()
 
-        if not self.ended and self.ball.x + self.ball.width > self.width:
-            self.ball.bounce_x()
+        # Out of bounces for this tick (ball stuck in a corner), drop the rest of the movement
 
-        if not self.ended and self.ball.y < 0 or self.ball.y + self.ball.height > self.height:
-            self.ball.bounce_y()
+    def draw(self, alpha: float):
+        with self.profiler.scope('entities'):
+            self.batch.begin()
+            self.particles.draw(self.batch, alpha)
+            self.ball.draw(self.batch, alpha)
+            self.pad.draw(self.batch, alpha)
+            self.batch.flush(self.width, self.height)
+
+        with self.profiler.scope('hud'):
+            self.hud.draw()
 
     def reshape(self, width: int, height: int):
-        print(f"{self}: received new resolution {width}x{height}")
+        logger.info("%s: received new resolution %dx%d", self, width, height)
         self.width = width
         self.height = height
 
         self.hud.reshape(width, height)
 
-        # Check if objects are out of screen after a resize
-        # Ball first
-        if self.ball.x + self.ball.width > self.width or self.ball.y + self.ball.height > self.height:
-            self.ended = True
-            self.hud.update({"text": "Ball out of bounds\nR to restart"})
-        # Then the pad
+        # Keep everything on screen after a resize, the game goes on
+        if not self.ended:
+            self.clamp_ball(self.width)
         if self.pad.y < 0:
             self.pad.y = 0
         elif self.pad.y + self.pad.height > self.height:
             self.pad.y = self.height - self.pad.height
 
+    def clamp_ball(self, right: float):
+        """ Move the ball back inside the arena (up to right), where it was cut off by a resize """
+        ball = self.ball
+        ball.x = max(min(ball.x, right - ball.width), 0)
+        ball.y = max(min(ball.y, self.height - ball.height), 0)
+        # Don't interpolate from where it was before
+        ball.snapshot()
+
+    def state_bytes(self) -> bytes:
+        ball, pad = self.ball, self.pad
+        return struct.pack('<8d3B2?', ball.x, ball.y, ball.speed_x, ball.speed_y, pad.x, pad.y, self.width,
+                           self.height, ball.color.r, ball.color.g, ball.color.b, self.paused, self.ended)
+
     def __repr__(self):
         return "<scenes.SinglePlayerScene>"
@@ -1,5 +1,11 @@
+import time
+
 from hud import Hud
 from interfaces import IScene
+from log import get_logger
+
+
+logger = get_logger(__name__)
 
 
 class TestScene(IScene):
@@ -9,6 +15,7 @@ class TestScene(IScene):
         self.keyboard = keyboard_manager
         self.hud = Hud()
         self.fullscreen_callback = None
+        self.last_draw = None
 
     def pause(self):
         pass
@@ -17,20 +24,30 @@ class TestScene(IScene):
         pass
 
     def set_display_dimensions(self, width: int, height: int):
-        print(f"{self}: received display dimensions {width}x{height}")
+        logger.info("%s: received display dimensions %dx%d", self, width, height)
         self.width = width
         self.height = height
+        self.hud.reshape(width, height)
 
     def update(self, dt):
+        pass
+
+    def draw(self, alpha: float):
+        # Simulation runs at a fixed rate, so measure the actual render rate here
+        now = time.time()
+        frame_time = now - self.last_draw if self.last_draw is not None else 0
+        self.last_draw = now
+
         self.hud.update({
-            'fps': f"{1 / dt if dt != 0 else 0:.2f}"
+            'text': f"{1 / frame_time if frame_time != 0 else 0:.2f} FPS"
         })
         self.hud.draw()
 
     def reshape(self, width: int, height: int):
-        print(f"{self}: received new resolution {width}x{height}")
+        logger.info("%s: received new resolution %dx%d", self, width, height)
         self.width = width
         self.height = height
+        self.hud.reshape(width, height)
 
     def __repr__(self):
         return "<scenes.TestScene>"
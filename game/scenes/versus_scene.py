@@ -0,0 +1,152 @@
+import struct
+
+from entities import Ball, Pad
+from interfaces import IKeyboardManager
+from log import get_logger
+from .prediction import PadAI
+from .single_player_scene import SinglePlayerScene
+
+
+logger = get_logger(__name__)
+
+
+class VersusScene(SinglePlayerScene):
+    """ Two pad arena, each side played from the keyboard or by a PadAI. Both sides AI is the attract mode.
+
+    Missing the ball gives the point to the other side, the next ball is served from the middle once the missed
+    one is gone.
+    """
+
+    HUMAN = 'human'
+    AI = 'ai'
+
+    # Keys (up, down) of each side when played by a human
+    LEFT_KEYS = ('q', 'a')
+    RIGHT_KEYS = ('o', 'l')
+
+    def __init__(self, keyboard_manager: IKeyboardManager, seed: int = None, left: str = HUMAN, right: str = AI,
+                 reaction_delay: float = PadAI.REACTION_DELAY, error: float = PadAI.ERROR):
+        self.players = (left, right)
+        self.reaction_delay = reaction_delay
+        self.error = error
+        self.scores = [0, 0]
+
+        self.right_pad = None
+        # PadAI per side, None where a human plays
+        self.ais = [None, None]
+
+        super().__init__(keyboard_manager, seed)
+
+    @property
+    def attract(self) -> bool:
+        return self.players == (VersusScene.AI, VersusScene.AI)
+
+    def init_hud(self):
+        if self.attract:
+            text = "Attract mode\nM: next game mode"
+        else:
+            controls = [f"{up.upper()}/{down.upper()}: move pad"
+                        for (player, (up, down)) in zip(self.players, (VersusScene.LEFT_KEYS, VersusScene.RIGHT_KEYS))
+                        if player == VersusScene.HUMAN]
+            text = "\n".join(controls + ["SPACE: pause", "F: toggle fullscreen"])
+        self.hud.update({"text": f"{self.scores[0]} : {self.scores[1]}\n{text}"})
+
+    def set_display_dimensions(self, width: int, height: int):
+        super().set_display_dimensions(width, height)
+
+        self.right_pad = Pad(self.width - 5 - SinglePlayerScene.PAD_XSIZE, self.pad.y, SinglePlayerScene.PAD_XSIZE,
+                             SinglePlayerScene.PAD_YSIZE, SinglePlayerScene.PAD_COLOR)
+        self.ais = [PadAI(pad, self.random, self.reaction_delay, self.error) if player == VersusScene.AI else None
+                    for (pad, player) in zip((self.pad, self.right_pad), self.players)]
+        self.serve()
+
+    def serve(self):
+        """ New ball from the middle, towards a random side """
+        self.ball.set_coords(self.width / 2 - self.ball.width / 2,
+                             self.random.randint(0, self.height - self.ball.height))
+        self.ball.set_speed(self.random.choice((-1, 1)) * SinglePlayerScene.BALL_SPEED_X,
+                            self.random.choice((-1, 1)) * SinglePlayerScene.BALL_SPEED_Y)
+
+    def restart(self):
+        super().restart()
+        self.serve()
+
+    def pad_move(self, side: int, keys: tuple, dt: float) -> int:
+        if self.ended:
+            return 0
+        if self.ais[side] is not None:
+            return self.ais[side].update(dt, self.ball, self.width, self.height)
+        up, down = keys
+        return self.keyboard.is_pressed(down) - self.keyboard.is_pressed(up)
+
+    def update(self, dt):
+        self.ball.snapshot()
+        self.pad.snapshot()
+        self.right_pad.snapshot()
+
+        self.handle_key(self.keyboard.next())
+
+        if self.paused:
+            return
+
+        left_move = self.pad_move(0, VersusScene.LEFT_KEYS, dt)
+        right_move = self.pad_move(1, VersusScene.RIGHT_KEYS, dt)
+        self.move_pad(self.pad, left_move, dt)
+        self.move_pad(self.right_pad, right_move, dt)
+
+        with self.profiler.scope('animations'):
+            self.animations.update(dt)
+        # Only a clock to advance, the particles are moved when drawn
+        self.particles.update(dt)
+
+        if self.ended:
+            self.ball.move(dt)
+            if self.ball_gone:
+                self.restart()
+            return
+
+        with self.profiler.scope('physics'):
+            self.move_ball(dt, [(self.pad, left_move), (self.right_pad, right_move)], right=False)
+        self.emit_trail()
+
+        if self.ball.x <= 0:
+            self.score(1)
+        elif self.ball.x + self.ball.width >= self.width:
+            self.score(0)
+
+    def score(self, side: int):
+        self.scores[side] += 1
+        logger.info("%s: %s side scores, %d : %d", self, ("left", "right")[side], *self.scores)
+        self.end_game(f"{self.scores[0]} : {self.scores[1]}")
+
+    def hit_pad(self, pad: Pad, pad_move: int):
+        super().hit_pad(pad, pad_move)
+        if pad is self.right_pad:
+            # increase_speed() speeds up a ball going right, mirror that for the right pad
+            self.ball.speed_x -= 2 * Ball.SPEED_STEP
+
+    def draw(self, alpha: float):
+        with self.profiler.scope('entities'):
+            self.batch.begin()
+            self.particles.draw(self.batch, alpha)
+            self.ball.draw(self.batch, alpha)
+            self.pad.draw(self.batch, alpha)
+            self.right_pad.draw(self.batch, alpha)
+            self.batch.flush(self.width, self.height)
+
+        with self.profiler.scope('hud'):
+            self.hud.draw()
+
+    def reshape(self, width: int, height: int):
+        super().reshape(width, height)
+        self.right_pad.x = self.width - 5 - self.right_pad.width
+        self.move_pad(self.right_pad, 0, 0)
+        if not self.ended:
+            # In front of the right pad, not behind it
+            self.clamp_ball(self.right_pad.x)
+
+    def state_bytes(self) -> bytes:
+        return super().state_bytes() + struct.pack('<2d2I', self.right_pad.x, self.right_pad.y, *self.scores)
+
+    def __repr__(self):
+        return f"<scenes.VersusScene {self.players[0]} vs {self.players[1]}>"
@@ -0,0 +1,38 @@
+from collections import deque
+
+from interfaces import IKeyboardManager
+
+
+class ScriptedKeyboardManager(IKeyboardManager):
+    """ Keyboard manager without any input device behind it, keys are pressed and released from code
+
+    Used by the headless display manager, tests and bots.
+    """
+
+    def __init__(self):
+        self.keys_pressed = set()
+        self.queue = deque()
+
+    def press(self, key: str):
+        if key not in self.keys_pressed:
+            self.keys_pressed.add(key)
+            self.queue.appendleft(key)
+
+    def release(self, key: str):
+        self.keys_pressed.discard(key)
+
+    def tap(self, key: str):
+        self.press(key)
+        self.release(key)
+
+    def next(self):
+        if len(self.queue):
+            return self.queue.pop()
+        else:
+            return None
+
+    def is_pressed(self, key: str) -> bool:
+        return key in self.keys_pressed
+
+    def get_keys(self):
+        return self.keys_pressed
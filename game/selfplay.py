@@ -0,0 +1,193 @@
+""" Windowless self-play: single player games with a computer-controlled pad, for tuning the game constants
+
+A game is one rally: the ball is served, the pad keeps it in play as long as it can, the game ends with the
+first miss (or after a tick limit, then the game counts as not missed). Parameter values override the
+balance constants for the duration of a game, so parameter sets can be run one after the other in the same
+process, and in many processes at once with run_sweep().
+"""
+
+import itertools
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from entities import Ball
+from log import get_logger
+from scenes import PadAI, SinglePlayerScene
+from scripted_keyboard import ScriptedKeyboardManager
+
+
+logger = get_logger(__name__)
+
+# Sweepable parameter name: (class, attribute). Controller knobs are passed to the controller instead.
+PARAMETERS = {
+    'BALL_SPEED_X': (SinglePlayerScene, 'BALL_SPEED_X'),
+    'BALL_SPEED_Y': (SinglePlayerScene, 'BALL_SPEED_Y'),
+    'PAD_MOVE_FACTOR': (SinglePlayerScene, 'PAD_MOVE_FACTOR'),
+    'PAD_YSIZE': (SinglePlayerScene, 'PAD_YSIZE'),
+    'SPEED_STEP': (Ball, 'SPEED_STEP'),
+}
+CONTROLLER_PARAMETERS = ('reaction_delay', 'error')
+
+WIDTH = 1280
+HEIGHT = 720
+TICK_RATE = 120
+# A game nobody missed in 5 minutes of play is over anyway
+MAX_TICKS = TICK_RATE * 300
+# Games per task sent to a worker, enough to make the inter-process traffic negligible
+CHUNK_SIZE = 25
+
+
+@contextmanager
+def overrides(params: dict):
+    """ Set the balance constants in params, restore them afterwards """
+    saved = []
+    try:
+        for name, value in params.items():
+            if name in PARAMETERS:
+                cls, attribute = PARAMETERS[name]
+                saved.append((cls, attribute, getattr(cls, attribute)))
+                setattr(cls, attribute, value)
+        yield
+    finally:
+        for cls, attribute, value in reversed(saved):
+            setattr(cls, attribute, value)
+
+
+class TrackingController:
+    """ Scripted pad: follows the ball's center, no prediction """
+
+    def __init__(self, scene: SinglePlayerScene, rng: random.Random, **knobs):
+        self.scene = scene
+
+    def update(self, dt: float) -> int:
+        ball, pad = self.scene.ball, self.scene.pad
+        distance = (ball.y + ball.height / 2) - (pad.y + pad.height / 2)
+        if abs(distance) <= PadAI.DEAD_ZONE:
+            return 0
+        return 1 if distance > 0 else -1
+
+
+class AIController:
+    """ PadAI aiming at where the ball crosses the pad, right wall bounce included """
+
+    def __init__(self, scene: SinglePlayerScene, rng: random.Random, **knobs):
+        self.scene = scene
+        self.ai = PadAI(scene.pad, rng, wall_x=scene.width - scene.ball.width, **knobs)
+
+    def update(self, dt: float) -> int:
+        return self.ai.update(dt, self.scene.ball, self.scene.width, self.scene.height)
+
+
+CONTROLLERS = {
+    'ai': AIController,
+    'track': TrackingController,
+}
+
+
+def play_game(params: dict, seed: int, controller: str = 'ai', max_ticks: int = MAX_TICKS) -> tuple:
+    """ Play one rally, returns (pad hits, seconds until the miss, missed) """
+    knobs = {name: value for (name, value) in params.items() if name in CONTROLLER_PARAMETERS}
+    with overrides(params):
+        keyboard = ScriptedKeyboardManager()
+        scene = SinglePlayerScene(keyboard, seed=seed)
+        scene.set_display_dimensions(WIDTH, HEIGHT)
+        # Nobody is watching
+        scene.particles.set_spawn_rate(0)
+        pad_controller = CONTROLLERS[controller](scene, scene.random, **knobs)
+
+        hits = 0
+        hit_pad = scene.hit_pad
+
+        def count_hit(pad, pad_move):
+            nonlocal hits
+            hits += 1
+            hit_pad(pad, pad_move)
+
+        scene.hit_pad = count_hit
+
+        dt = 1 / TICK_RATE
+        tick = 0
+        while tick < max_ticks and not scene.ended:
+            pad_move = pad_controller.update(dt)
+            for key, move in (('q', -1), ('a', 1)):
+                if pad_move == move:
+                    keyboard.press(key)
+                else:
+                    keyboard.release(key)
+            scene.update(dt)
+            tick += 1
+
+        return hits, tick * dt, scene.ended
+
+
+def play_chunk(params: dict, seeds: list, controller: str, max_ticks: int) -> dict:
+    """ Worker task: play a game per seed, with the stats of the worker that did it """
+    start = time.process_time()
+    games = [play_game(params, seed, controller, max_ticks) for seed in seeds]
+    return {
+        'params': params,
+        'games': games,
+        'ticks': sum(round(seconds * TICK_RATE) for (_, seconds, _) in games),
+        'cpu_time': time.process_time() - start,
+        'worker': os.getpid(),
+    }
+
+
+def grid(values: dict) -> list:
+    """ Every combination of the given {name: [values]} """
+    names = list(values)
+    return [dict(zip(names, combination)) for combination in itertools.product(*(values[name] for name in names))]
+
+
+def run_sweep(param_sets: list, games: int, controller: str = 'ai', workers: int = None, seed: int = 0,
+              max_ticks: int = MAX_TICKS, chunk_size: int = CHUNK_SIZE) -> tuple:
+    """ Play games games for each parameter set across a process pool
+
+    Every parameter set gets the same seeds, so they're compared on the same serves. Returns the results per
+    parameter set (in param_sets order, lists of (hits, seconds, missed)), the per worker stats
+    {pid: (ticks, cpu seconds)} and the wall clock time.
+    """
+    workers = workers or os.cpu_count()
+    results = [[] for _ in param_sets]
+    worker_stats = dict()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = dict()
+        for index, params in enumerate(param_sets):
+            for first in range(0, games, chunk_size):
+                seeds = [seed + n for n in range(first, min(first + chunk_size, games))]
+                future = executor.submit(play_chunk, params, seeds, controller, max_ticks)
+                futures[future] = index
+
+        for future in as_completed(futures):
+            chunk = future.result()
+            results[futures[future]].extend(chunk['games'])
+            ticks, cpu_time = worker_stats.get(chunk['worker'], (0, 0.0))
+            worker_stats[chunk['worker']] = (ticks + chunk['ticks'], cpu_time + chunk['cpu_time'])
+    elapsed = time.perf_counter() - start
+
+    logger.info("%d games of %d parameter sets in %.2fs on %d workers", games * len(param_sets), len(param_sets),
+                elapsed, workers)
+    return results, worker_stats, elapsed
+
+
+def summarize(games: list) -> dict:
+    """ Rally length distribution and time to miss of a list of (hits, seconds, missed) """
+    hits = sorted(game[0] for game in games)
+    missed = [seconds for (_, seconds, was_missed) in games if was_missed]
+    deciles = statistics.quantiles(hits, n=10, method='inclusive') if len(hits) > 1 else hits * 9
+    return {
+        'games': len(games),
+        'hits_mean': statistics.fmean(hits) if hits else 0.0,
+        'hits_p10': deciles[0],
+        'hits_p50': statistics.median(hits) if hits else 0,
+        'hits_p90': deciles[-1],
+        'hits_max': hits[-1] if hits else 0,
+        'miss_rate': len(missed) / len(games) if games else 0.0,
+        'time_to_miss': statistics.fmean(missed) if missed else float('inf'),
+    }
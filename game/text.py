@@ -0,0 +1,255 @@
+import ctypes
+import os
+from collections import OrderedDict
+
+import numpy
+from PIL import Image, ImageDraw, ImageFont
+
+from color import Color
+from log import get_logger
+from renderer import QuadBatch
+from resources import RESOURCES
+
+
+logger = get_logger(__name__)
+
+# Imported on first use, same as in the renderer
+gl = None
+
+
+def load_gl():
+    global gl
+    if gl is None:
+        import OpenGL.GL
+        gl = OpenGL.GL
+
+
+class GlyphAtlas:
+    """ All printable ASCII glyphs of a font rasterized once into a single texture, plus their metrics
+
+    Use GlyphAtlas.get() to share one atlas per (font, size) from the resource cache instead of constructing new
+    ones. Building one is CPU only, so it can happen on the loader thread; upload() needs the GL context.
+    """
+
+    FIRST_CHAR = 32
+    LAST_CHAR = 126
+    FALLBACK_CHAR = '?'
+
+    ATLAS_WIDTH = 512
+    PADDING = 1
+
+    # Extra pixels between lines, same as PIL's multiline_text() default
+    LINE_SPACING = 4
+
+    @staticmethod
+    def get(font_filename: str, font_size: int):
+        return RESOURCES.get(('atlas', font_filename, font_size), lambda: GlyphAtlas(font_filename, font_size))
+
+    def __init__(self, font_filename: str, font_size: int):
+        logger.info("building atlas for %s size %d", font_filename, font_size)
+        self.font_filename = font_filename
+        self.font_size = font_size
+        self.texture_id = None
+
+        font = RESOURCES.get(('font', font_filename, font_size), lambda: ImageFont.truetype(font_filename, font_size))
+        ascent, descent = font.getmetrics()
+        self.line_height = ascent + descent + GlyphAtlas.LINE_SPACING
+
+        # Per character code metrics, indexed by ord(char): advance, glyph box relative to the pen position
+        # (x offset, y offset from the top of the line, width, height) and texture coordinates (u0, v0, u1, v1)
+        self.advance = numpy.zeros(256, dtype=numpy.float32)
+        self.boxes = numpy.zeros((256, 4), dtype=numpy.float32)
+        self.uvs = numpy.zeros((256, 4), dtype=numpy.float32)
+
+        # Shelf-pack the glyphs into rows of the atlas
+        chars = [chr(code) for code in range(GlyphAtlas.FIRST_CHAR, GlyphAtlas.LAST_CHAR + 1)]
+        bboxes = [font.getbbox(char) for char in chars]
+        row_height = max(bottom - top for (left, top, right, bottom) in bboxes) + GlyphAtlas.PADDING
+
+        positions = []
+        x = y = GlyphAtlas.PADDING
+        for (left, top, right, bottom) in bboxes:
+            if x + (right - left) + GlyphAtlas.PADDING > GlyphAtlas.ATLAS_WIDTH:
+                x = GlyphAtlas.PADDING
+                y += row_height
+            positions.append((x, y))
+            x += (right - left) + GlyphAtlas.PADDING
+
+        self.width = GlyphAtlas.ATLAS_WIDTH
+        self.height = y + row_height
+
+        self.image = Image.new('L', (self.width, self.height), color=0)
+        draw = ImageDraw.Draw(self.image)
+
+        for char, (left, top, right, bottom), (x, y) in zip(chars, bboxes, positions):
+            code = ord(char)
+            draw.text((x - left, y - top), char, fill=255, font=font)
+
+            self.advance[code] = font.getlength(char)
+            self.boxes[code] = (left, top, right - left, bottom - top)
+            self.uvs[code] = (x / self.width, y / self.height, (x + right - left) / self.width,
+                              (y + bottom - top) / self.height)
+
+        # Anything outside the atlas renders as the fallback glyph
+        fallback = ord(GlyphAtlas.FALLBACK_CHAR)
+        for code in range(256):
+            if code < GlyphAtlas.FIRST_CHAR or code > GlyphAtlas.LAST_CHAR:
+                self.advance[code] = self.advance[fallback]
+                self.boxes[code] = self.boxes[fallback]
+                self.uvs[code] = self.uvs[fallback]
+
+    def upload(self):
+        """ Create the GL texture, needs a current context. Only ever done once per atlas """
+        if self.texture_id is not None:
+            return
+
+        load_gl()
+        self.texture_id = gl.glGenTextures(1)
+        logger.info("uploading %dx%d atlas as txid#%s", self.width, self.height, self.texture_id)
+
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.texture_id)
+        gl.glPixelStorei(gl.GL_UNPACK_ALIGNMENT, 1)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_S, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_WRAP_T, gl.GL_CLAMP_TO_EDGE)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MAG_FILTER, gl.GL_LINEAR)
+        gl.glTexParameteri(gl.GL_TEXTURE_2D, gl.GL_TEXTURE_MIN_FILTER, gl.GL_LINEAR)
+        gl.glTexImage2D(gl.GL_TEXTURE_2D, 0, gl.GL_R8, self.width, self.height, 0, gl.GL_RED, gl.GL_UNSIGNED_BYTE,
+                        numpy.asarray(self.image, dtype=numpy.uint8))
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+    def layout(self, text: str):
+        """ Returns glyph rectangles (N, 4) relative to the text origin and their texture coordinates (N, 4) """
+        codes = numpy.frombuffer(text.encode('latin-1', errors='replace'), dtype=numpy.uint8)
+        newlines = codes == ord('\n')
+
+        # Pen position of every character: running sum of advances, restarted on every new line
+        advances = numpy.where(newlines, 0, self.advance[codes])
+        pen_x = numpy.cumsum(advances) - advances
+        lines = numpy.cumsum(newlines)
+        line_start = numpy.concatenate(([0], pen_x[newlines] + advances[newlines]))
+        pen_x = pen_x - line_start[lines]
+
+        visible = ~newlines & (codes != ord(' '))
+        boxes = self.boxes[codes[visible]]
+        rects = numpy.empty_like(boxes)
+        rects[:, 0] = pen_x[visible] + boxes[:, 0]
+        rects[:, 1] = lines[visible] * self.line_height + boxes[:, 1]
+        rects[:, 2:4] = boxes[:, 2:4]
+
+        return rects, self.uvs[codes[visible]]
+
+    def __repr__(self):
+        return f"<GlyphAtlas {os.path.basename(self.font_filename)} size={self.font_size}>"
+
+
+class TextBatch(QuadBatch):
+    """ Draws any number of strings from one glyph atlas as textured quads in a single call """
+
+    # Layouts of the most recently drawn strings are kept, so unchanged text costs a dict lookup per frame
+    LAYOUT_CACHE_SIZE = 64
+
+    VERTEX_SHADER = """
+        #version 330 core
+        layout(location = 0) in vec2 position;
+        layout(location = 1) in vec4 color;
+        layout(location = 2) in vec2 uv;
+        uniform vec2 viewport;
+        out vec4 frag_color;
+        out vec2 frag_uv;
+
+        void main() {
+            gl_Position = vec4(position.x * 2.0 / viewport.x - 1.0, 1.0 - position.y * 2.0 / viewport.y, 0.0, 1.0);
+            frag_color = color;
+            frag_uv = uv;
+        }
+    """
+
+    FRAGMENT_SHADER = """
+        #version 330 core
+        in vec4 frag_color;
+        in vec2 frag_uv;
+        uniform sampler2D atlas;
+        out vec4 out_color;
+
+        void main() {
+            out_color = vec4(frag_color.rgb, frag_color.a * texture(atlas, frag_uv).r);
+        }
+    """
+
+    VERTEX_DTYPE = numpy.dtype([('position', numpy.float32, 2), ('color', numpy.uint8, 4), ('uv', numpy.float32, 2)])
+
+    def __init__(self, atlas: GlyphAtlas, capacity: int = QuadBatch.INITIAL_CAPACITY):
+        self.atlas = atlas
+        self.uvs = None
+        self.layouts = OrderedDict()
+        super().__init__(capacity)
+
+    def resize(self, capacity: int):
+        uvs = numpy.zeros((capacity, 4), dtype=numpy.float32)
+        if self.uvs is not None:
+            uvs[:self.count] = self.uvs[:self.count]
+        self.uvs = uvs
+        super().resize(capacity)
+
+    def get_layout(self, text: str):
+        layout = self.layouts.get(text)
+        if layout is None:
+            layout = self.layouts[text] = self.atlas.layout(text)
+            if len(self.layouts) > TextBatch.LAYOUT_CACHE_SIZE:
+                self.layouts.popitem(last=False)
+        else:
+            self.layouts.move_to_end(text)
+        return layout
+
+    def add_text(self, text: str, x: float, y: float, color: Color, alpha: int = 255):
+        """ Queue a (possibly multi-line) string with its top left corner at x, y """
+        rects, uvs = self.get_layout(text)
+        n = len(rects)
+        self.reserve(n)
+
+        self.rects[self.count:self.count + n] = rects
+        self.rects[self.count:self.count + n, 0] += x
+        self.rects[self.count:self.count + n, 1] += y
+        self.colors[self.count:self.count + n] = color.rgba(alpha)
+        self.uvs[self.count:self.count + n] = uvs
+        self.count += n
+
+    def measure(self, text: str):
+        """ Width and height of the given text in pixels """
+        rects, _ = self.get_layout(text)
+        lines = text.count('\n') + 1
+        width = float((rects[:, 0] + rects[:, 2]).max()) if len(rects) else 0.0
+        return width, lines * self.atlas.line_height
+
+    def build_vertices(self) -> numpy.ndarray:
+        vertices = super().build_vertices()
+
+        # Same corner pattern as the positions: pick u0/u1 and v0/v1 per vertex
+        n = self.count
+        uvs = self.uvs[:n, numpy.newaxis, :]
+        corners = QuadBatch.CORNERS
+        vertices.reshape(n, 6)['uv'] = uvs[:, :, 0:2] + corners * (uvs[:, :, 2:4] - uvs[:, :, 0:2])
+
+        return vertices
+
+    def init_gl(self):
+        load_gl()
+        super().init_gl()
+
+    def setup_attributes(self):
+        super().setup_attributes()
+        gl.glEnableVertexAttribArray(2)
+        gl.glVertexAttribPointer(2, 2, gl.GL_FLOAT, gl.GL_FALSE, self.VERTEX_DTYPE.itemsize,
+                                 ctypes.c_void_p(self.VERTEX_DTYPE.fields['uv'][1]))
+
+    def bind(self):
+        self.atlas.upload()
+        gl.glActiveTexture(gl.GL_TEXTURE0)
+        gl.glBindTexture(gl.GL_TEXTURE_2D, self.atlas.texture_id)
+        gl.glUniform1i(gl.glGetUniformLocation(self.program, "atlas"), 0)
+
+    def unbind(self):
+        gl.glBindTexture(gl.GL_TEXTURE_2D, 0)
+
+    def __repr__(self):
+        return f"<TextBatch atlas={self.atlas} count={self.count}>"
@@ -0,0 +1,219 @@
+""" Vectorized single player games for training pad controllers
+
+VecEnv holds N independent games as NumPy arrays and steps them all at once, with the same physics as
+SinglePlayerScene.update(): pad move and clamping, the pad pushed into the ball, then the ball swept against the
+walls (the left one open) and the pad with up to MAX_BOUNCES bounces per tick, hit_pad() doing bounce_x(pad_move)
+and increase_speed(). The arithmetic is done in the same order on the same float64 values, so a game played
+here stays identical to the same game played by the scene, tick by tick.
+
+The interface follows the Gym vector environments: reset() returns observations, step(actions) returns
+observations, rewards, terminated and truncated flags and an info dict, and finished games are reset
+automatically (their last observation is in info['final_observation']).
+"""
+
+import numpy
+
+from entities import Ball
+from scenes import SinglePlayerScene
+
+
+class VecEnv:
+    """ N single player games stepped together
+
+    Actions are 0 (pad up, the Q key), 1 (stay) or 2 (pad down, the A key). Each step runs frame_skip ticks with
+    the same action. Rewards are +1 for every pad hit and -1 for the miss that ends a game.
+
+    Observations are float32 rows of ball x, ball y, ball speed x, ball speed y and pad y, positions as a
+    fraction of the arena size and speeds as a fraction of it per second.
+    """
+
+    ACTIONS = numpy.array([-1, 0, 1], dtype=numpy.int64)
+    OBSERVATION_SIZE = 5
+
+    def __init__(self, num_envs: int, width: int = 1280, height: int = 720, tick_rate: int = 120,
+                 frame_skip: int = 1, max_ticks: int = None, seed: int = None):
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.dt = 1 / tick_rate
+        self.frame_skip = frame_skip
+        self.max_ticks = max_ticks
+        self.rng = numpy.random.default_rng(seed)
+
+        # Read once, like the scene does every tick
+        self.ball_width = SinglePlayerScene.BALL_XSIZE
+        self.ball_height = SinglePlayerScene.BALL_YSIZE
+        self.pad_x = 5
+        self.pad_width = SinglePlayerScene.PAD_XSIZE
+        self.pad_height = SinglePlayerScene.PAD_YSIZE
+        self.pad_speed = SinglePlayerScene.PAD_MOVE_FACTOR
+        self.speed_step = Ball.SPEED_STEP
+
+        self.ball_x = numpy.zeros(num_envs)
+        self.ball_y = numpy.zeros(num_envs)
+        self.speed_x = numpy.zeros(num_envs)
+        self.speed_y = numpy.zeros(num_envs)
+        self.pad_y = numpy.zeros(num_envs)
+        self.ended = numpy.zeros(num_envs, dtype=bool)
+        self.ticks = numpy.zeros(num_envs, dtype=numpy.int64)
+
+        self.rewards = numpy.zeros(num_envs, dtype=numpy.float32)
+        self.observations = numpy.zeros((num_envs, VecEnv.OBSERVATION_SIZE), dtype=numpy.float32)
+        self.scale = numpy.array([1 / width, 1 / height, 1 / width, 1 / height, 1 / height])
+
+    def reset_games(self, games: numpy.ndarray):
+        """ Serve a new ball in the given games, the way SinglePlayerScene sets up and restarts """
+        count = len(games)
+        self.ball_x[games] = self.rng.integers(50, self.width, count, endpoint=True)
+        self.ball_y[games] = self.rng.integers(0, self.height, count, endpoint=True)
+        self.speed_x[games] = SinglePlayerScene.BALL_SPEED_X
+        self.speed_y[games] = SinglePlayerScene.BALL_SPEED_Y
+        self.pad_y[games] = int(self.height / 2 - self.pad_height / 2)
+        self.ended[games] = False
+        self.ticks[games] = 0
+
+    def reset(self, seed: int = None) -> numpy.ndarray:
+        if seed is not None:
+            self.rng = numpy.random.default_rng(seed)
+        self.reset_games(numpy.arange(self.num_envs))
+        return self.observe()
+
+    def observe(self) -> numpy.ndarray:
+        observations = self.observations
+        observations[:, 0] = self.ball_x
+        observations[:, 1] = self.ball_y
+        observations[:, 2] = self.speed_x
+        observations[:, 3] = self.speed_y
+        observations[:, 4] = self.pad_y
+        observations *= self.scale
+        return observations
+
+    def step(self, actions) -> tuple:
+        pad_move = VecEnv.ACTIONS[actions]
+        rewards = self.rewards
+        rewards[:] = 0
+        for _ in range(self.frame_skip):
+            self.tick(pad_move, rewards)
+
+        terminated = self.ended.copy()
+        rewards[terminated] = -1
+        truncated = ~terminated & (self.ticks >= self.max_ticks) if self.max_ticks else numpy.zeros_like(terminated)
+
+        info = {}
+        done = terminated | truncated
+        if done.any():
+            info['final_observation'] = self.observe().copy()
+            self.reset_games(numpy.flatnonzero(done))
+        return self.observe(), rewards.copy(), terminated, truncated, info
+
+    def hit_pad(self, games, pad_move: numpy.ndarray, rewards: numpy.ndarray):
+        # Ball.bounce_x(pad_move), then Ball.increase_speed()
+        step = self.speed_step
+        self.speed_x[games] = -self.speed_x[games] + step
+        self.speed_y[games] = self.speed_y[games] + pad_move[games] * step + step
+        rewards[games] += 1
+
+    def tick(self, pad_move: numpy.ndarray, rewards: numpy.ndarray):
+        """ One SinglePlayerScene.update() of every game that's still on """
+        live = ~self.ended
+        self.ticks += live
+
+        # Pad, clamped to the arena
+        pad_y = numpy.where(live, self.pad_y + pad_move * self.pad_speed * self.dt, self.pad_y)
+        pad_y[pad_y < 0] = 0
+        pad_y[pad_y + self.pad_height > self.height] = self.height - self.pad_height
+        self.pad_y = pad_y
+
+        bx, by = self.ball_x, self.ball_y
+        pad_right, pad_bottom = self.pad_x + self.pad_width, pad_y + self.pad_height
+
+        # Pad moved into the ball
+        pushed = live & (self.speed_x < 0) & (bx <= pad_right) & (bx + self.ball_width >= self.pad_x) & \
+            (by <= pad_bottom) & (by + self.ball_height >= pad_y)
+        if pushed.any():
+            self.hit_pad(pushed, pad_move, rewards)
+
+        games = numpy.flatnonzero(live)
+        remaining = numpy.full(len(games), self.dt)
+        for _ in range(SinglePlayerScene.MAX_BOUNCES):
+            if not len(games):
+                break
+            games, remaining = self.sweep(games, remaining, pad_move, rewards)
+
+        self.ended |= live & (self.ball_x <= 0)
+
+    def sweep(self, games: numpy.ndarray, remaining: numpy.ndarray, pad_move: numpy.ndarray,
+              rewards: numpy.ndarray) -> tuple:
+        """ One round of SinglePlayerScene.move_ball()'s loop, returns the games that hit something and the time
+        they have left """
+        x, y = self.ball_x[games], self.ball_y[games]
+        speed_x, speed_y = self.speed_x[games], self.speed_y[games]
+        pad_y = self.pad_y[games]
+        width, height = self.ball_width, self.ball_height
+        dx, dy = speed_x * remaining, speed_y * remaining
+        inf = numpy.inf
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            # swept_bounds() with the left wall open: right, bottom, top, the first one on ties
+            walls = numpy.stack((
+                numpy.where(dx > 0, (self.width - (x + width)) / dx, inf),
+                numpy.where(dy > 0, (self.height - (y + height)) / dy, inf),
+                numpy.where(dy < 0, (0 - y) / dy, inf),
+            ))
+            walls[walls > 1] = inf
+            numpy.maximum(walls, 0.0, out=walls)
+            wall = walls.argmin(axis=0)
+            wall_toi = walls[wall, numpy.arange(len(games))]
+            wall_hit = wall_toi <= 1
+
+            # swept_aabb() against the pad
+            pad_x, pad_right = self.pad_x, self.pad_x + self.pad_width
+            entry_x = numpy.where(dx > 0, (pad_x - (x + width)) / dx, (pad_right - x) / dx)
+            exit_x = numpy.where(dx > 0, (pad_right - x) / dx, (pad_x - (x + width)) / dx)
+            apart_x = (x + width < pad_x) | (x > pad_right)
+            still_x = dx == 0
+            entry_x[still_x] = -inf
+            exit_x[still_x] = inf
+
+            pad_bottom = pad_y + self.pad_height
+            entry_y = numpy.where(dy > 0, (pad_y - (y + height)) / dy, (pad_bottom - y) / dy)
+            exit_y = numpy.where(dy > 0, (pad_bottom - y) / dy, (pad_y - (y + height)) / dy)
+            apart_y = (y + height < pad_y) | (y > pad_bottom)
+            still_y = dy == 0
+            entry_y[still_y] = -inf
+            exit_y[still_y] = inf
+
+        entry = numpy.maximum(entry_x, entry_y)
+        pad_hit = ~(still_x & apart_x) & ~(still_y & apart_y) & \
+            ~((entry > numpy.minimum(exit_x, exit_y)) | (entry > 1) | (entry < 0))
+        pad_hit &= ~wall_hit | (entry <= wall_toi)
+        pad_normal_x = entry_x > entry_y
+
+        hit = pad_hit | wall_hit
+        toi = numpy.where(pad_hit, entry, wall_toi)
+
+        # Nothing in the way: the whole remaining move
+        missed = ~hit
+        self.ball_x[games[missed]] = x[missed] + speed_x[missed] * remaining[missed]
+        self.ball_y[games[missed]] = y[missed] + speed_y[missed] * remaining[missed]
+
+        # Up to the hit, then bounce
+        games, remaining, toi = games[hit], remaining[hit], toi[hit]
+        pad_hit, pad_normal_x, wall = pad_hit[hit], pad_normal_x[hit], wall[hit]
+        move = remaining * toi
+        self.ball_x[games] = x[hit] + speed_x[hit] * move
+        self.ball_y[games] = y[hit] + speed_y[hit] * move
+        remaining = remaining * (1 - toi)
+
+        paddled = pad_hit & pad_normal_x
+        if paddled.any():
+            self.hit_pad(games[paddled], pad_move, rewards)
+        bounce_x = games[~pad_hit & (wall == 0)]
+        self.speed_x[bounce_x] = -self.speed_x[bounce_x]
+        bounce_y = games[(pad_hit & ~pad_normal_x) | (~pad_hit & (wall != 0))]
+        self.speed_y[bounce_y] = -self.speed_y[bounce_y]
+
+        return games, remaining
+
+    def __repr__(self):
+        return f"<VecEnv num_envs={self.num_envs}>"
@@ -1,14 +1,56 @@
 import os
+import sys
+
+from log import get_logger
+
+
+logger = get_logger(__name__)
+
+# Remembers where the virtualenv was found, so startup doesn't have to look for it again
+CACHE_FILENAME = ".venv-location"
+
+
+def find_activate_script(basedir: str):
+    """ Path of the first bin/activate_this.py in a direct subdirectory of basedir, None if there's none """
+    for dir_name in [f.path for f in os.scandir(basedir) if f.is_dir()]:
+        activate_script = os.path.join(basedir, dir_name, 'bin', 'activate_this.py')
+        if os.path.isfile(activate_script):
+            return activate_script
+    return None
+
+
+def cached_activate_script(basedir: str):
+    cache_file = os.path.join(basedir, CACHE_FILENAME)
+    try:
+        with open(cache_file) as f:
+            activate_script = f.read().strip()
+    except OSError:
+        return None
+
+    # The venv may have been moved or deleted since
+    return activate_script if os.path.isfile(activate_script) else None
 
 
 def activate(basedir: str) -> None:
     """ Look for and activate a virtualenv within the given base directory """
 
-    for dir_name in [f.path for f in os.scandir(basedir) if f.is_dir()]:
-        activate_dir = os.path.join(basedir, dir_name, 'bin', 'activate_this.py')
-        if os.path.isfile(activate_dir):
-            print(f'Activating virtualenv in {dir_name}')
-            try:
-                exec(open(activate_dir).read(), {'__file__': activate_dir})
-            except Exception as exc:
-                print('Could not run activate script. Module imports will most likely fail.', exc)
+    if sys.prefix != sys.base_prefix:
+        logger.debug("already running in a virtualenv (%s)", sys.prefix)
+        return
+
+    activate_script = cached_activate_script(basedir)
+    if activate_script is None:
+        activate_script = find_activate_script(basedir)
+        if activate_script is None:
+            return
+        try:
+            with open(os.path.join(basedir, CACHE_FILENAME), 'w') as f:
+                f.write(activate_script)
+        except OSError as exc:
+            logger.debug("could not cache the virtualenv location: %s", exc)
+
+    logger.info('activating virtualenv in %s', os.path.dirname(os.path.dirname(activate_script)))
+    try:
+        exec(open(activate_script).read(), {'__file__': activate_script})
+    except Exception as exc:
+        logger.warning('could not run activate script, module imports will most likely fail: %s', exc)
@@ -1,6 +1,6 @@
 #!/usr/bin/env python3
 
-""" Minimal "Pong" game with OpenGL (immediate mode) graphics """
+""" Minimal "Pong" game with OpenGL graphics """
 
 # https://stackabuse.com/brief-introduction-to-opengl-in-python-with-pyopengl/
 # https://pythonprogramming.net/opengl-rotating-cube-example-pyopengl-tutorial/
@@ -8,20 +8,135 @@
 import sys
 import os.path
 import argparse
+import atexit
 
 WIDTH = 1280
 HEIGHT = 720
 
 
+SCENES = ['single', 'versus', 'attract', 'multiball']
+
+
+def create_scene(name: str, keyboard_manager, balls: int, seed: int = None):
+    if name == 'multiball':
+        return MultiBallScene(keyboard_manager, balls, seed=seed)
+    if name == 'versus':
+        return VersusScene(keyboard_manager, seed=seed)
+    if name == 'attract':
+        return VersusScene(keyboard_manager, seed=seed, left=VersusScene.AI, right=VersusScene.AI)
+    return SinglePlayerScene(keyboard_manager, seed=seed)
+
+
+def replay(in_args: argparse.Namespace, replay_log):
+    """ Run a recorded game at full speed without rendering, checking it plays out the same """
+    from replay import Replayer, ReplayKeyboard, ReplayDivergence
+
+    keyboard_manager = ReplayKeyboard()
+    scene = create_scene(in_args.scene, keyboard_manager, in_args.balls, replay_log.seed)
+    try:
+        Replayer(replay_log, scene, keyboard_manager).run()
+    except ReplayDivergence as e:
+        logger.error("replay diverged: %s", e)
+        sys.exit(1)
+
+
+def parse_address(address: str, default_host: str) -> tuple:
+    """ [host:]port to (host, port) """
+    host, _, port = address.rpartition(':')
+    return host or default_host, int(port)
+
+
+def parse_render_scale(text: str):
+    """ 'auto' (None) or a fraction of the output resolution """
+    if text == 'auto':
+        return None
+    scale = float(text)
+    if not 0.1 <= scale <= 1:
+        raise argparse.ArgumentTypeError("render scale must be between 0.1 and 1, or auto")
+    return scale
+
+
+def parse_resolution(text: str) -> tuple:
+    """ WIDTHxHEIGHT to (width, height) """
+    width, _, height = text.partition('x')
+    try:
+        return int(width), int(height)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"resolution must be WIDTHxHEIGHT, not {text}")
+
+
+def net_channel(in_args: argparse.Namespace, host: str, port: int = 0):
+    from netplay import LossyChannel, open_socket
+
+    return LossyChannel(open_socket(host, port), in_args.net_latency / 1000, in_args.net_jitter / 1000,
+                        in_args.net_loss)
+
+
+def serve(in_args: argparse.Namespace):
+    """ Run the authoritative scene of a network game, no window """
+    from netplay import NetKeyboard, NetServer
+
+    keyboard_manager = NetKeyboard((VersusScene.LEFT_KEYS, VersusScene.RIGHT_KEYS))
+    scene = VersusScene(keyboard_manager, seed=in_args.seed, left=VersusScene.HUMAN, right=VersusScene.HUMAN)
+    # Nothing gets drawn on the server
+    scene.particles.set_spawn_rate(0)
+    host, port = parse_address(in_args.serve, '0.0.0.0')
+    server = NetServer(scene, keyboard_manager, net_channel(in_args, host, port), in_args.width, in_args.height)
+    server.run(in_args.duration)
+
+
 def main(in_args: argparse.Namespace):
-    display_manager = DisplayManager(in_args.width, in_args.height, "Poing!")
+    from particles import ParticleSystem
+    if in_args.particle_rate is not None:
+        ParticleSystem.SPAWN_RATE = in_args.particle_rate
+    elif in_args.display == 'headless' and not in_args.offscreen:
+        # Particles are only for the eye, don't spend time on them when nothing gets drawn
+        ParticleSystem.SPAWN_RATE = 0
+
+    if in_args.display == 'headless':
+        # No window to fit into, the scene gets the virtual resolution directly
+        width, height = in_args.virtual_resolution or (in_args.width, in_args.height)
+        display_manager = DisplayManager(width, height, "Poing!", offscreen=in_args.offscreen)
+        display_manager.max_ticks = in_args.ticks
+        display_manager.duration = in_args.duration
+    else:
+        display_manager = DisplayManager(in_args.width, in_args.height, "Poing!", target_fps=in_args.fps,
+                                         vsync=in_args.vsync, render_scale=in_args.render_scale,
+                                         virtual_size=in_args.virtual_resolution)
+    display_manager.exit_after_first_frame = in_args.exit_after_first_frame
+    if in_args.profile_csv:
+        # At exit, so it also happens when the window is closed from within GLUT's main loop
+        atexit.register(display_manager.profiler.dump_csv, in_args.profile_csv)
     keyboard_manager = KeyboardManager()
-    scene = Scene(keyboard_manager)
+    if in_args.display != 'headless' and in_args.input == 'native':
+        display_manager.set_keyboard(keyboard_manager)
+    if in_args.record:
+        from replay import InputRecorder
+        keyboard_manager = InputRecorder(keyboard_manager, in_args.record, in_args.scene,
+                                         in_args.balls if in_args.scene == 'multiball' else 0,
+                                         display_manager.clock.tick_rate)
+    if in_args.connect:
+        from netplay import NetClient
+        client = NetClient(net_channel(in_args, '0.0.0.0'), parse_address(in_args.connect, '127.0.0.1'))
+        scene = NetClientScene(keyboard_manager, client)
+    else:
+        scene = create_scene(in_args.scene, keyboard_manager, in_args.balls, in_args.seed)
+
+    scene_manager = SceneManager(keyboard_manager)
+    scene_manager.push(scene)
+    scene_manager.mode = in_args.scene
+    if in_args.record:
+        # A recording covers the scene it started with only, so no switching modes
+        keyboard_manager.attach(scene)
+        atexit.register(keyboard_manager.close)
+    elif not in_args.connect:
+        for name in SCENES:
+            scene_manager.register(name, lambda keyboard, name=name: create_scene(name, keyboard, in_args.balls))
+            if name != in_args.scene:
+                scene_manager.preload(name)
 
-    # This sets display update callbacks to the scene's own methods
-    # (multiple scenes supported this way). Will also allow the active scene
-    # to send callbacks
-    display_manager.set_scene(scene)
+    # This sets display update callbacks to the scene manager, which passes them on to the active scene
+    display_manager.set_scene(scene_manager)
 
     display_manager.main_loop()
 
@@ -30,9 +145,23 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description="A very simple OpenGL Pong game")
     parser.add_argument('--display',
                         type=str,
-                        choices=['glut', 'glfw'],
+                        choices=['glut', 'glfw', 'headless'],
                         default='glfw',
                         help='Display manager to use')
+    parser.add_argument('--scene',
+                        type=str,
+                        choices=SCENES,
+                        default='single',
+                        help='Game mode')
+    parser.add_argument('--balls',
+                        type=int,
+                        default=1000,
+                        help="Number of balls in multiball mode")
+    parser.add_argument('--input',
+                        type=str,
+                        choices=['native', 'pynput'],
+                        default='native',
+                        help="Keyboard input from the window's key events or from a global pynput listener")
     parser.add_argument('--width',
                         type=int,
                         default=WIDTH,
@@ -41,24 +170,129 @@ if __name__ == '__main__':
                         type=int,
                         default=HEIGHT,
                         help="Window height")
+    parser.add_argument('--fps',
+                        type=int,
+                        choices=[60, 120, 144, 0],
+                        default=60,
+                        help="Target frame rate, 0 for unlimited")
+    parser.add_argument('--vsync',
+                        action='store_true',
+                        help="Sync buffer swaps to the display refresh")
+    parser.add_argument('--render-scale',
+                        type=parse_render_scale,
+                        default=None,
+                        metavar='{auto,SCALE}',
+                        help="Render at this fraction of the window resolution and scale up, or auto to adjust it "
+                             "to hold the target frame rate (default: auto)")
+    parser.add_argument('--virtual-resolution',
+                        type=parse_resolution,
+                        default=None,
+                        metavar='WIDTHxHEIGHT',
+                        help="Fixed game area, scaled to fit the window (default: the window size)")
+    parser.add_argument('--ticks',
+                        type=int,
+                        default=0,
+                        help="Headless only: run this many ticks as fast as possible (0: run in real time)")
+    parser.add_argument('--duration',
+                        type=float,
+                        default=None,
+                        help="Headless only: stop after this many seconds of real time")
+    parser.add_argument('--offscreen',
+                        action='store_true',
+                        help="Headless only: also render every frame into a hidden window")
+    parser.add_argument('--profile-csv',
+                        type=str,
+                        default=None,
+                        help="Write the per-phase frame timings to this CSV file on exit")
+    parser.add_argument('--particle-rate',
+                        type=int,
+                        default=None,
+                        help="Most particles spawned per second, lower it on slow machines (0: no particles)")
+    parser.add_argument('--seed',
+                        type=int,
+                        default=None,
+                        help="Random seed of the scene (random by default)")
+    parser.add_argument('--record',
+                        type=str,
+                        default=None,
+                        help="Record the seed and all input to this file, for --replay")
+    parser.add_argument('--replay',
+                        type=str,
+                        default=None,
+                        help="Replay a recorded game headless at full speed and verify it plays out the same")
+    parser.add_argument('--serve',
+                        type=str,
+                        default=None,
+                        metavar='[HOST:]PORT',
+                        help="Run the server of a two player network game (in the terminal, no window)")
+    parser.add_argument('--connect',
+                        type=str,
+                        default=None,
+                        metavar='[HOST:]PORT',
+                        help="Join a network game as a player")
+    parser.add_argument('--net-latency',
+                        type=float,
+                        default=0,
+                        help="Simulated network latency of the packets we send, in milliseconds")
+    parser.add_argument('--net-jitter',
+                        type=float,
+                        default=0,
+                        help="Simulated random extra latency, up to this many milliseconds")
+    parser.add_argument('--net-loss',
+                        type=float,
+                        default=0,
+                        help="Simulated packet loss, 0..1")
+    parser.add_argument('--exit-after-first-frame',
+                        action='store_true',
+                        help="Quit as soon as the first frame is shown, for measuring startup time")
+    parser.add_argument('--log-level',
+                        type=str,
+                        choices=['debug', 'info', 'warning', 'error'],
+                        default='info',
+                        help="Log messages from this level up")
 
     args = parser.parse_args()
 
     app_dir = os.path.abspath(os.path.dirname(__file__))
     sys.path.append(os.path.join(app_dir, "game"))
 
+    import log
+    log.setup(args.log_level.upper())
+    logger = log.get_logger("main")
+
     from venvtools import activate
     activate(app_dir)
 
+    replay_log = None
+    if args.replay:
+        # The recording decides what to run
+        from replay import ReplayLog
+        replay_log = ReplayLog.load(args.replay)
+        args.display = 'headless'
+        args.scene = replay_log.scene
+        args.balls = replay_log.scene_param
+
     if args.display == 'glfw':
         from display import GLFWdm as DisplayManager
     elif args.display == 'glut':
         from display import GLUTdm as DisplayManager
+    elif args.display == 'headless':
+        from display import HeadlessDM as DisplayManager
     else:
-        print("I don't know what display manager to load, exiting")
+        logger.error("I don't know what display manager to load, exiting")
         sys.exit(-1)
 
-    from keyboard_manager import KeyboardManager
-    from scenes import SinglePlayerScene as Scene
+    if args.display == 'headless':
+        from scripted_keyboard import ScriptedKeyboardManager as KeyboardManager
+    elif args.input == 'native':
+        from native_keyboard import NativeKeyboardManager as KeyboardManager
+    else:
+        from keyboard_manager import KeyboardManager
+    from scenes import SceneManager, SinglePlayerScene, VersusScene, MultiBallScene, NetClientScene
 
-    main(args)
+    if replay_log is not None:
+        replay(args, replay_log)
+    elif args.serve:
+        serve(args)
+    else:
+        main(args)